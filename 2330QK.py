@@ -1,7 +1,8 @@
 # 安裝必要套件
 # !pip install yfinance mplfinance pandas --upgrade
 
-import yfinance as yf
+from price_store import load_bars
+from resample import load_resampled
 import mplfinance as mpf
 import matplotlib.pyplot as plt
 import matplotlib as mpl
@@ -23,26 +24,11 @@ if os.path.exists(cache_dir):
 
 # ==== 数据获取 ====
 STOCK_CODE = "2330.TW"
-tsmc = yf.download(
-    STOCK_CODE,
-    start="2005-02-01",
-    end='2025-02-21',
-    auto_adjust=False,
-    progress=False,
-    timeout=10
-)
-
-# 列名标准化
-tsmc.columns = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+# 从本地价格仓库读取（复权日线），只补抓缺少的部分
+tsmc = load_bars(STOCK_CODE, start="2005-02-01", end='2025-02-21')
 
-# 季度重采样
-quarterly = tsmc.resample('QE').agg({
-    'Open': 'first',
-    'High': 'max',
-    'Low': 'min',
-    'Close': 'last',
-    'Volume': 'sum'
-}).dropna()
+# 季度重采样（已保存的季线只重算最后一季）
+quarterly = load_resampled(STOCK_CODE, 'Q', start="2005-02-01", end='2025-02-21')
 
 # 自定义样式（强制指定字体）
 style = mpf.make_mpf_style(
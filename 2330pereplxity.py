@@ -1,45 +1,17 @@
-import yfinance as yf
+from price_store import load_bars
+from resample import resample_bars
 import pandas as pd
 import mplfinance as mpf
 import matplotlib.pyplot as plt
 
 # 下載台積電的歷史股價資料
-data = yf.download('2330.TW', period='20y')
+data = load_bars('2330.TW', start=pd.Timestamp.now() - pd.DateOffset(years=20))  # 從本地價格倉庫讀取，只補抓缺少的日線
 
 # 檢查資料欄位名稱
 print(data.columns)
 
-# 重塑資料結構（如果需要）
-close = data[('Close', '2330.TW')]
-high = data[('High', '2330.TW')]
-low = data[('Low', '2330.TW')]
-open_price = data[('Open', '2330.TW')]
-volume = data[('Volume', '2330.TW')]
-
-# 建立新的DataFrame
-data_new = pd.DataFrame({
-    'Close': close,
-    'High': high,
-    'Low': low,
-    'Open': open_price,
-    'Volume': volume
-})
-
-# 計算季度資料
-data_new['Quarter'] = data_new.index.to_period('Q')
-
-# 將資料轉換為季度資料
-quarterly_data = data_new.groupby('Quarter').agg({
-    'Open': 'first',
-    'High': 'max',
-    'Low': 'min',
-    'Close': 'last',
-    'Volume': 'sum'
-}).reset_index()
-
-# 設定正確的索引
-quarterly_data['Quarter'] = pd.to_datetime(quarterly_data['Quarter'].apply(lambda x: x.to_timestamp()))
-quarterly_data.set_index('Quarter', inplace=True)
+# 將資料轉換為季度資料，索引為每季第一天
+quarterly_data = resample_bars(data, 'Q', label='start')
 
 # 設定中文字型
 plt.rcParams['font.sans-serif'] = ['SimHei']
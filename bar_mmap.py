@@ -0,0 +1,155 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+# 文件格式：16字节文件头 + 定长记录
+#   文件头: b'BARS' + 版本(uint8) + 价格字段字节数(uint8, 4或8) + 10字节保留
+#   记录:   day(int32, 1970-01-01起的天数) open/high/low/close(float32或float64) volume(int64)
+MAGIC = b'BARS'
+VERSION = 1
+HEADER_SIZE = 16
+DEFAULT_BARS_DIR = './data/bars'
+
+
+def bar_dtype(price_dtype='f8'):
+    """
+    返回定长记录的numpy结构化类型（紧凑排列，无对齐填充）
+    """
+    price = np.dtype(price_dtype).newbyteorder('<')
+    return np.dtype([
+        ('day', '<i4'),
+        ('open', price),
+        ('high', price),
+        ('low', price),
+        ('close', price),
+        ('volume', '<i8'),
+    ])
+
+
+def write_bars(path, dates, open_, high, low, close, volume, price_dtype='f8'):
+    """
+    将OHLCV数组写成二进制行情文件（先写临时文件再替换）
+    """
+    dtype = bar_dtype(price_dtype)
+    records = np.empty(len(dates), dtype=dtype)
+    records['day'] = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    records['open'] = open_
+    records['high'] = high
+    records['low'] = low
+    records['close'] = close
+    records['volume'] = np.asarray(volume, dtype=np.float64).round()
+
+    header = np.zeros(HEADER_SIZE, dtype=np.uint8)
+    header[:4] = np.frombuffer(MAGIC, dtype=np.uint8)
+    header[4] = VERSION
+    header[5] = dtype['open'].itemsize
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(records.tobytes())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+def frame_to_bars(df, path, price_dtype='f8'):
+    """
+    将带DatetimeIndex和Open/High/Low/Close/Volume列的DataFrame写成二进制行情文件
+    """
+    return write_bars(path, df.index.values, df['Open'].values, df['High'].values,
+                      df['Low'].values, df['Close'].values, df['Volume'].values, price_dtype)
+
+
+def csv_to_bars(csv_path, out_path=None, price_dtype='f8'):
+    """
+    将twstock导出的 data/<code>.csv 转成二进制行情文件，成交量取Capacity（总成交股数）
+    """
+    if out_path is None:
+        code = os.path.splitext(os.path.basename(csv_path))[0]
+        out_path = os.path.join(DEFAULT_BARS_DIR, f"{code}.bars")
+
+    df = pd.read_csv(csv_path, usecols=['Date', 'Capacity', 'Open', 'High', 'Low', 'Close'],
+                     parse_dates=['Date'])
+    df = df.drop_duplicates('Date').sort_values('Date')
+    return write_bars(out_path, df['Date'].values, df['Open'].values, df['High'].values,
+                      df['Low'].values, df['Close'].values, df['Capacity'].values, price_dtype)
+
+
+def convert_directory(data_dir='./data', out_dir=DEFAULT_BARS_DIR, price_dtype='f8'):
+    """
+    批量转换 data_dir 下所有csv，返回 {代码: 记录数}
+    """
+    counts = {}
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, '*.csv'))):
+        code = os.path.splitext(os.path.basename(csv_path))[0]
+        counts[code] = csv_to_bars(csv_path, os.path.join(out_dir, f"{code}.bars"), price_dtype)
+    return counts
+
+
+def open_bars(path):
+    """
+    以只读内存映射方式打开二进制行情文件，返回结构化数组（不复制数据）
+
+    多个进程打开同一文件时共享操作系统的页缓存
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:4] != MAGIC:
+        raise ValueError(f"不是有效的行情文件: {path}")
+    if header[4] != VERSION:
+        raise ValueError(f"不支持的行情文件版本 {header[4]}: {path}")
+
+    dtype = bar_dtype('f4' if header[5] == 4 else 'f8')
+    if os.path.getsize(path) == HEADER_SIZE:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE)
+
+
+def open_code(code, data_dir='./data', bars_dir=DEFAULT_BARS_DIR):
+    """
+    打开某个代码的行情文件；二进制文件不存在或比csv旧时先重新转换
+    """
+    csv_path = os.path.join(data_dir, f"{code}.csv")
+    bars_path = os.path.join(bars_dir, f"{code}.bars")
+    if os.path.exists(csv_path) and (not os.path.exists(bars_path)
+                                     or os.path.getmtime(bars_path) < os.path.getmtime(csv_path)):
+        csv_to_bars(csv_path, bars_path)
+    return open_bars(bars_path)
+
+
+def open_universe(codes=None, bars_dir=DEFAULT_BARS_DIR):
+    """
+    打开多只股票的行情文件，codes为None时打开目录下全部文件，返回 {代码: 结构化数组}
+    """
+    if codes is None:
+        codes = sorted(os.path.splitext(os.path.basename(path))[0]
+                       for path in glob.glob(os.path.join(bars_dir, '*.bars')))
+    return {code: open_bars(os.path.join(bars_dir, f"{code}.bars")) for code in codes}
+
+
+def bar_dates(bars):
+    """
+    将day列转换为datetime64[D]日期数组
+    """
+    return bars['day'].astype('datetime64[D]')
+
+
+def bars_to_frame(bars):
+    """
+    转换为pandas DataFrame（会复制数据，列名与yfinance一致）
+    """
+    return pd.DataFrame({
+        'Open': bars['open'].astype(np.float64),
+        'High': bars['high'].astype(np.float64),
+        'Low': bars['low'].astype(np.float64),
+        'Close': bars['close'].astype(np.float64),
+        'Volume': bars['volume'],
+    }, index=pd.DatetimeIndex(bar_dates(bars), name='Date'))
+
+
+if __name__ == "__main__":
+    for code, count in convert_directory().items():
+        print(f"{code}: {count} 条记录")
@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import stock_backtesting_4strategy_comparison as comparison
+import stock_backtesting_final_optimixed as final_optimixed
+from data_provider import ReplayProvider, generate_gbm_bars
+
+# 手写循环 与 backtesting.Backtest 两种实现的基准测试
+#
+# 每组为同一策略的两种实现：native（手写循环/run_portfolio）和 library（backtesting库）
+# 在合成行情和录制行情上、按每种K线数各跑一次，记录 耗时（取repeat次中最快的一次）、
+# tracemalloc峰值内存（单独再跑一次，避免追踪开销计入耗时）以及两种实现结果的差异，
+# 输出JSON，附带各库版本和git提交号，便于跨版本对比。未安装backtesting时library一侧记为跳过
+
+SIZES = (1000, 10000, 100000)
+
+# 10万根日线约383年，从1800年开始编排日期，避免超出datetime64[ns]的上限（2262年）
+BENCH_START = '1800-01-01'
+
+# (组名, native实现, library实现)
+CASES = [
+    ('ma_cross_20_60', final_optimixed.backtest_ma_cross_optimized,
+     final_optimixed.backtest_ma_cross_with_backtesting),
+    ('ma_cross_50_200', comparison.backtest_ma_cross_improved, comparison.backtest_ma_cross_with_backtesting),
+    ('buy_hold', final_optimixed.calculate_buy_hold_manually, final_optimixed.backtest_buy_hold_with_backtesting),
+]
+
+DELTA_KEYS = ('final_value', 'total_return', 'annual_return', 'max_drawdown', 'num_trades')
+
+
+def synthetic_bars(n_bars, seed=0):
+    return generate_gbm_bars(pd.bdate_range(BENCH_START, periods=n_bars, name='Date'), seed=seed)
+
+
+def recorded_bars(code, n_bars, provider=None):
+    """
+    录制行情的最后n_bars根；不足时正序、倒序交替拼接（首尾价格相接，价格不会发散），日期重新按工作日编排
+    """
+    bars = (provider or ReplayProvider())(code)
+    if len(bars) >= n_bars:
+        return bars.iloc[-n_bars:].copy()
+
+    values = bars[['Open', 'High', 'Low', 'Close', 'Volume']].values
+    copies = -(-n_bars // len(values))
+    tiled = np.concatenate([values if k % 2 == 0 else values[::-1] for k in range(copies)])[:n_bars]
+    dates = pd.bdate_range(BENCH_START, periods=n_bars, name='Date')
+    return pd.DataFrame(tiled, columns=['Open', 'High', 'Low', 'Close', 'Volume'], index=dates)
+
+
+def _run(function, data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(data)
+
+
+def measure(function, data, repeat=1):
+    """
+    返回 (结果, 最快耗时秒, 峰值内存字节)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = _run(function, data)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        _run(function, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, min(times), peak
+
+
+def _summary(result):
+    return {key: float(result[key]) for key in DELTA_KEYS if key in result}
+
+
+def bench_case(name, native, library, data, repeat=1):
+    """
+    一组实现在一份行情上的测量结果（dict）
+    """
+    row = {'case': name, 'bars': len(data)}
+    native_result, row['native_seconds'], row['native_peak_bytes'] = measure(native, data, repeat)
+    row['native'] = _summary(native_result)
+
+    if final_optimixed.Backtest is None:
+        row['library'] = None
+        row['skipped'] = "未安装backtesting库"
+        return row
+
+    library_result, row['library_seconds'], row['library_peak_bytes'] = measure(library, data, repeat)
+    row['library'] = _summary(library_result)
+    # library实现结果异常时会退回手写计算（结果标记fallback、没有backtest_results），此时差异和加速比没有意义
+    row['library_fallback'] = bool(library_result.get('fallback')) or 'backtest_results' not in library_result
+    if row['library_fallback']:
+        row['deltas'] = None
+        row['speedup'] = None
+        return row
+    row['deltas'] = {key: row['library'][key] - row['native'][key]
+                     for key in DELTA_KEYS if key in row['native'] and key in row['library']}
+    row['speedup'] = row['library_seconds'] / row['native_seconds'] if row['native_seconds'] > 0 else None
+    return row
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=SIZES, code='2330.TW', repeat=1, provider=None, cases=None):
+    """
+    全部基准测试，返回可直接写成JSON的dict
+    """
+    selected = [case for case in CASES if cases is None or case[0] in cases]
+    sources = {'synthetic': lambda n: synthetic_bars(n)}
+    try:
+        recorded_bars(code, 1, provider)
+        sources['recorded'] = lambda n: recorded_bars(code, n, provider)
+    except FileNotFoundError as e:
+        print(f"跳过录制行情: {e}")
+
+    results = []
+    for source, load in sources.items():
+        for n_bars in sizes:
+            data = load(n_bars)
+            for name, native, library in selected:
+                row = bench_case(name, native, library, data, repeat)
+                row['source'] = source
+                results.append(row)
+                library_time = f"{row['library_seconds']:.3f}s" if 'library_seconds' in row else "跳过"
+                print(f"{source:<10} {n_bars:>7} {name:<16} native {row['native_seconds']:.3f}s "
+                      f"({row['native_peak_bytes'] / 1e6:.1f}MB), library {library_time}")
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'backtesting': getattr(final_optimixed.backtesting, '__version__', None),
+        'recorded_code': code if 'recorded' in sources else None,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="手写循环与backtesting库两种回测实现的基准测试")
+    parser.add_argument('--sizes', default=','.join(str(n) for n in SIZES), help="K线数，逗号分隔")
+    parser.add_argument('--code', default='2330.TW', help="录制行情的股票代码")
+    parser.add_argument('--repeat', type=int, default=1, help="每项重复次数（耗时取最快一次）")
+    parser.add_argument('--cases', default=None, help="只跑指定的组，逗号分隔")
+    parser.add_argument('--output', default='bench_results.json', help="JSON输出路径，'-'为标准输出")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks([int(n) for n in args.sizes.split(',')], args.code, args.repeat,
+                            cases=args.cases.split(',') if args.cases else None)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"基准测试结果已保存为: {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
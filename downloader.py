@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from price_store import load_bars, normalize_bars, yfinance_provider
+
+
+def read_ticker_list(file_path, suffix='.TW', code_column='代號'):
+    """
+    从twn50.xls / twn100.xls / ETF成分股文件读取股票代码，补上交易所后缀
+    """
+    df = pd.read_excel(file_path, dtype={code_column: str})
+    codes = df[code_column].dropna().str.strip()
+    return [f"{code}{suffix}" for code in codes if code]
+
+
+class RateLimiter:
+    """
+    按主机限速：同一主机两次请求之间至少间隔 1 / rate 秒（线程安全）
+    """
+
+    def __init__(self, rate=2.0):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_time = {}
+
+    def acquire(self, host='default'):
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next_time.get(host, now))
+            self._next_time[host] = scheduled + self.interval
+        wait = scheduled - now
+        if wait > 0:
+            time.sleep(wait)
+
+
+def with_retry(provider, limiter=None, host='default', max_retries=3, backoff=1.0):
+    """
+    包装数据源：每次请求前限速，失败时按 backoff * 2**n 秒指数退避重试
+    """
+
+    def fetch(code, start, end):
+        for attempt in range(max_retries + 1):
+            if limiter is not None:
+                limiter.acquire(host)
+            try:
+                return provider(code, start, end)
+            except Exception:
+                if attempt == max_retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+
+    return fetch
+
+
+def download_many(tickers, start=None, end=None, provider=yfinance_provider, max_workers=4,
+                  rate=2.0, max_retries=3, backoff=1.0, progress=None, use_store=True):
+    """
+    并发下载多只股票的日线
+
+    - max_workers: 线程池大小（同时进行的请求数上限）
+    - rate: 每个主机每秒最多请求次数，主机名取 provider.host（没有时为 'default'）
+    - progress: 回调 progress(code, ok, done, total, seconds)，可用于进度条或统计
+    - use_store: True时经由price_store.load_bars，只补本地仓库缺失的部分（重试用尽后同样记入errors）
+
+    返回 (results, errors)：{代码: DataFrame} 与 {代码: 异常}
+    """
+    limiter = RateLimiter(rate)
+    host = getattr(provider, 'host', 'default')
+    fetch = with_retry(provider, limiter, host, max_retries, backoff)
+
+    def task(code):
+        started = time.perf_counter()
+        if use_store:
+            bars = load_bars(code, start, end, provider=fetch, raise_errors=True)
+        else:
+            bars = normalize_bars(fetch(code, start, end))
+        return bars, time.perf_counter() - started
+
+    results = {}
+    errors = {}
+    total = len(tickers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(task, code): code for code in tickers}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                results[code], seconds = future.result()
+                ok = True
+            except Exception as e:
+                errors[code] = e
+                seconds = 0.0
+                ok = False
+            if progress is not None:
+                progress(code, ok, len(results) + len(errors), total, seconds)
+
+    return results, errors
+
+
+if __name__ == "__main__":
+    import sys
+
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'twn50.xls'
+    codes = read_ticker_list(file_path)
+
+    def print_progress(code, ok, done, total, seconds):
+        status = "完成" if ok else "失败"
+        print(f"[{done}/{total}] {code} {status} ({seconds:.2f}s)")
+
+    results, errors = download_many(codes, progress=print_progress)
+    print(f"成功 {len(results)} 只，失败 {len(errors)} 只")
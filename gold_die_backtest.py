@@ -1,9 +1,11 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import warnings
 import numpy as np
+from data_provider import fetch_bars
+import metrics
+from portfolio_engine import run_portfolio, trade_records
 
 # 过滤掉无害的警告
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -23,70 +25,29 @@ def backtest_strategy(data, initial_capital=1000000, transaction_cost=0.0015):
     """
     回测移动平均线交叉策略
     """
-    # 初始化变量
-    cash = initial_capital
-    shares = 0
-    trades = []
-    portfolio_values = []
-    buy_hold_values = []  # 买入持有策略的对比
-
-    # 买入持有策略的初始状态
-    bh_shares = initial_capital / data.iloc[0]['Close']  # 第一天就全仓买入
-    bh_value = bh_shares * data.iloc[0]['Close']
-
-    # 遍历每一天
-    for i, (date, row) in enumerate(data.iterrows()):
-        current_price = row['Close']
-        signal = row['Cross']
-
-        # 计算当前投资组合价值
-        current_value = cash + shares * current_price
-        portfolio_values.append(current_value)
-
-        # 计算买入持有策略的价值
-        bh_value = bh_shares * current_price
-        buy_hold_values.append(bh_value)
-
-        # 黄金交叉信号 - 买入
-        if signal == 1 and cash > 0:
-            # 计算可买入的股数（考虑交易成本）
-            available_cash = cash * (1 - transaction_cost)
-            shares_to_buy = available_cash // current_price
-
-            if shares_to_buy > 0:
-                # 执行买入
-                cost = shares_to_buy * current_price
-                cash -= cost * (1 + transaction_cost)  # 扣除交易成本
-                shares += shares_to_buy
-
-                trades.append({
-                    'date': date,
-                    'action': 'BUY',
-                    'price': current_price,
-                    'shares': shares_to_buy,
-                    'value': cost,
-                    'portfolio_value': current_value
-                })
-
-        # 死亡交叉信号 - 卖出
-        elif signal == -1 and shares > 0:
-            # 执行卖出
-            proceeds = shares * current_price
-            cash += proceeds * (1 - transaction_cost)  # 扣除交易成本
-
-            trades.append({
-                'date': date,
-                'action': 'SELL',
-                'price': current_price,
-                'shares': shares,
-                'value': proceeds,
-                'portfolio_value': cash + proceeds
-            })
-
-            shares = 0
+    close = data['Close'].values
+
+    # 黄金交叉信号买入（有现金即可加仓），死亡交叉信号卖出全部持股
+    # 资产按当天交易前计算
+    result = run_portfolio(close, data['Cross'].values == 1, data['Cross'].values == -1,
+                           initial_cash=initial_capital, commission=transaction_cost,
+                           sizing='net', pyramiding=True, mark='pre')
+
+    # 买入记录的组合价值为当天交易前的资产，卖出记录为卖出后的现金加成交金额
+    trades = result['trades']
+    portfolio_value = np.where(trades['action'] == 'BUY', result['equity'][trades['index']],
+                               trades['cash'] + trades['amount'])
+    trades = trade_records(data.index[trades['index']], trades['action'], trades['price'], trades['shares'],
+                           trades['amount'], portfolio_value)
+
+    portfolio_values = list(result['equity'])
+
+    # 买入持有策略：第一天就全仓买入
+    bh_shares = initial_capital / close[0]
+    buy_hold_values = list(bh_shares * close)
 
     # 回测结束，计算最终价值
-    final_value = cash + shares * data.iloc[-1]['Close']
+    final_value = result['final_value']
 
     # 计算回测指标
     total_return = (final_value - initial_capital) / initial_capital * 100
@@ -95,22 +56,14 @@ def backtest_strategy(data, initial_capital=1000000, transaction_cost=0.0015):
 
     # 计算年化回报率
     years = len(data) / 252  # 假设一年有252个交易日
-    annual_return = (final_value / initial_capital) ** (1 / years) - 1 if years > 0 else 0
-    annual_return_pct = annual_return * 100
+    annual_return_pct = metrics.cagr(final_value / initial_capital, years)
 
-    bh_annual_return = (bh_final_value / initial_capital) ** (1 / years) - 1 if years > 0 else 0
-    bh_annual_return_pct = bh_annual_return * 100
+    bh_annual_return_pct = metrics.cagr(bh_final_value / initial_capital, years)
 
     # 计算最大回撤
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
-    bh_series = pd.Series(buy_hold_values, index=data.index)
-    bh_rolling_max = bh_series.expanding().max()
-    bh_drawdowns = (bh_series - bh_rolling_max) / bh_rolling_max * 100
-    bh_max_drawdown = bh_drawdowns.min()
+    bh_max_drawdown = metrics.max_drawdown(buy_hold_values)
 
     return {
         'initial_capital': initial_capital,
@@ -119,7 +72,7 @@ def backtest_strategy(data, initial_capital=1000000, transaction_cost=0.0015):
         'annual_return': annual_return_pct,
         'max_drawdown': max_drawdown,
         'trades': trades,
-        'num_trades': len([t for t in trades if t['action'] == 'BUY']),
+        'num_trades': int((trades['action'] == 'BUY').sum()),
         'portfolio_values': portfolio_values,
         'buy_hold_final': bh_final_value,
         'buy_hold_return': bh_total_return,
@@ -129,7 +82,7 @@ def backtest_strategy(data, initial_capital=1000000, transaction_cost=0.0015):
     }
 
 
-def simple_stock_analysis():
+def simple_stock_analysis(provider=None):
     # 设置中文字体
     set_chinese_font()
 
@@ -143,7 +96,7 @@ def simple_stock_analysis():
     print("正在下载中信金历史数据...")
     try:
         # 明确设置auto_adjust参数以避免警告
-        data = yf.download(stock_code, start=start_date, end=end_date, auto_adjust=True)
+        data = fetch_bars(stock_code, start_date, end_date, provider)
         print(f"成功下载 {len(data)} 条数据")
     except Exception as e:
         print(f"下载数据时出错: {e}")
@@ -264,12 +217,14 @@ def simple_stock_analysis():
              label='买入持有策略', color='red', linewidth=2)
 
     # 标记买卖点
-    buy_dates = [t['date'] for t in backtest_results['trades'] if t['action'] == 'BUY']
-    sell_dates = [t['date'] for t in backtest_results['trades'] if t['action'] == 'SELL']
+    ma_trades = backtest_results['trades']
+    buy_dates = ma_trades['date'][ma_trades['action'] == 'BUY']
+    sell_dates = ma_trades['date'][ma_trades['action'] == 'SELL']
 
     # 获取买卖点的资产价值
-    buy_values = [backtest_results['portfolio_values'][data.index.get_loc(date)] for date in buy_dates]
-    sell_values = [backtest_results['portfolio_values'][data.index.get_loc(date)] for date in sell_dates]
+    ma_values = np.asarray(backtest_results['portfolio_values'])
+    buy_values = ma_values[data.index.get_indexer(buy_dates)]
+    sell_values = ma_values[data.index.get_indexer(sell_dates)]
 
     plt.scatter(buy_dates, buy_values, marker='^', color='green', s=100, label='买入点', zorder=5)
     plt.scatter(sell_dates, sell_values, marker='v', color='red', s=100, label='卖出点', zorder=5)
@@ -283,14 +238,14 @@ def simple_stock_analysis():
     plt.show()
 
     # 打印交易详情
-    if backtest_results['trades']:
+    if len(backtest_results['trades']):
         print(f"\n交易详情 (前10笔):")
         print("-" * 100)
         print(f"{'日期':<12} {'操作':<6} {'价格':<8} {'股数':<10} {'金额':<12} {'组合价值':<12}")
         print("-" * 100)
 
         for i, trade in enumerate(backtest_results['trades'][:10]):
-            print(f"{trade['date'].strftime('%Y-%m-%d'):<12} {trade['action']:<6} {trade['price']:<8.2f} "
+            print(f"{pd.Timestamp(trade['date']).strftime('%Y-%m-%d'):<12} {trade['action']:<6} {trade['price']:<8.2f} "
                   f"{trade['shares']:<10.0f} {trade['value']:<12.0f} {trade['portfolio_value']:<12.0f}")
 
         if len(backtest_results['trades']) > 10:
@@ -1,8 +1,8 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import warnings
+from data_provider import fetch_bars
 
 # 过滤掉无害的警告
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -18,7 +18,7 @@ def set_chinese_font():
         print("警告: 中文字体设置可能不完整，图表中的中文可能无法正常显示")
 
 
-def simple_stock_analysis():
+def simple_stock_analysis(provider=None):
     # 设置中文字体
     set_chinese_font()
 
@@ -32,7 +32,7 @@ def simple_stock_analysis():
     print("正在下载中信金历史数据...")
     try:
         # 明确设置auto_adjust参数以避免警告
-        data = yf.download(stock_code, start=start_date, end=end_date, auto_adjust=True)
+        data = fetch_bars(stock_code, start_date, end_date, provider)
         print(f"成功下载 {len(data)} 条数据")
     except Exception as e:
         print(f"下载数据时出错: {e}")
@@ -0,0 +1,225 @@
+import json
+import math
+import os
+
+import pandas as pd
+
+from data_provider import fetch_bars
+from metrics import cagr
+from portfolio_engine import COMMISSION
+from streaming_indicators import SMA, load_state, save_state
+
+# 可断点续跑的均线交叉回测（规则同backtest_ma_cross_optimized）
+#
+# 从第start根K线起：快线上穿慢线且收盘价在趋势线上方时用全部现金买入整数股，快线下穿慢线时全部卖出
+# 回测的期末状态（现金、持股、持仓标志、各均线的增量状态、前一天的快慢线、资产最高点和最大回撤、
+# 未平仓交易、成交记录）保存为JSON检查点；每晚新增一根或几根K线时从检查点继续，只计算新的K线，
+# 不重放历史。对同一段K线，续跑与从头跑的状态逐位相同，check=True时从头重跑一遍验证
+
+DEFAULT_STATE_DIR = './.backtest_state'
+
+PARAM_KEYS = ('fast', 'slow', 'trend', 'start', 'initial_cash', 'commission')
+
+
+class MACrossBacktest:
+    """
+    逐根K线推进的均线交叉回测，state()/from_state() 与streaming_indicators中的指标相同
+    """
+
+    def __init__(self, fast=20, slow=60, trend=200, start=200, initial_cash=1000000, commission=COMMISSION):
+        self.fast = fast
+        self.slow = slow
+        self.trend = trend
+        self.start = start
+        self.initial_cash = initial_cash
+        self.commission = commission
+
+        self.fast_ma = SMA(fast)
+        self.slow_ma = SMA(slow)
+        self.trend_ma = SMA(trend) if trend else None
+        self.prev_fast = math.nan
+        self.prev_slow = math.nan
+
+        self.bars = 0
+        self.cash = float(initial_cash)
+        self.shares = 0
+        self.holding = False
+        self.open_trade = None
+        self.trades = []
+        self.peak = math.nan
+        self.max_drawdown = 0.0
+        self.last_close = math.nan
+        self.last_date = None
+
+    def params(self):
+        return {key: getattr(self, key) for key in PARAM_KEYS}
+
+    def update(self, date, close):
+        """
+        推进一根K线（按收盘价成交），返回当天收盘后的资产
+        """
+        fast = self.fast_ma.update(close)
+        slow = self.slow_ma.update(close)
+        trend = self.trend_ma.update(close) if self.trend_ma else math.nan
+
+        # 交叉判断与signal_kernel一致：含NaN的比较为False
+        ready = self.bars >= self.start
+        golden = fast > slow and self.prev_fast <= self.prev_slow
+        death = fast < slow and self.prev_fast >= self.prev_slow
+        buy = ready and golden and (not self.trend_ma or close > trend)
+        sell = ready and death
+
+        date = str(pd.Timestamp(date))
+        if buy and not self.holding and self.cash > 0:
+            quantity = int(self.cash // (close * (1 + self.commission)))
+            cost = quantity * close * (1 + self.commission)
+            if quantity > 0 and cost <= self.cash:
+                self.cash -= cost
+                self.shares = quantity
+                self.holding = True
+                self.open_trade = {'date': date, 'price': close, 'shares': quantity}
+                self.trades.append({'date': date, 'action': 'BUY', 'price': close, 'shares': quantity})
+        elif sell and self.holding:
+            self.cash += self.shares * close * (1 - self.commission)
+            self.trades.append({'date': date, 'action': 'SELL', 'price': close, 'shares': self.shares})
+            self.shares = 0
+            self.holding = False
+            self.open_trade = None
+
+        self.prev_fast, self.prev_slow = fast, slow
+        self.bars += 1
+        self.last_close = close
+        self.last_date = date
+
+        equity = self.cash + self.shares * close
+        if not equity <= self.peak:
+            self.peak = equity
+        self.max_drawdown = min(self.max_drawdown, (equity - self.peak) / self.peak * 100)
+        return equity
+
+    def advance(self, data):
+        """
+        只推进last_date之后的K线（data为含Close列、以日期为索引的DataFrame），返回新增的K线数
+        """
+        if self.last_date is not None:
+            data = data[data.index > pd.Timestamp(self.last_date)]
+        for date, close in zip(data.index, data['Close'].values.astype(float).tolist()):
+            self.update(date, close)
+        return len(data)
+
+    def result(self):
+        """
+        当前的回测结果，字段同backtest_ma_cross_optimized（不含逐日资产）
+        """
+        final_value = self.cash + self.shares * self.last_close if self.bars else float(self.initial_cash)
+        return {
+            'final_value': final_value,
+            'total_return': (final_value - self.initial_cash) / self.initial_cash * 100,
+            'annual_return': cagr(final_value / self.initial_cash, self.bars / 252),
+            'max_drawdown': self.max_drawdown,
+            'num_trades': len(self.trades),
+            'trades': self.trades,
+            'open_trade': self.open_trade,
+            'bars': self.bars,
+            'last_date': self.last_date,
+        }
+
+    def state(self):
+        return {'params': self.params(),
+                'fast_ma': self.fast_ma.state(), 'slow_ma': self.slow_ma.state(),
+                'trend_ma': self.trend_ma.state() if self.trend_ma else None,
+                'prev_fast': self.prev_fast, 'prev_slow': self.prev_slow,
+                'bars': self.bars, 'cash': self.cash, 'shares': self.shares, 'holding': self.holding,
+                'open_trade': self.open_trade, 'trades': self.trades,
+                'peak': self.peak, 'max_drawdown': self.max_drawdown,
+                'last_close': self.last_close, 'last_date': self.last_date}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(**state['params'])
+        obj.fast_ma = SMA.from_state(state['fast_ma'])
+        obj.slow_ma = SMA.from_state(state['slow_ma'])
+        obj.trend_ma = SMA.from_state(state['trend_ma']) if state['trend_ma'] else None
+        obj.prev_fast = state['prev_fast']
+        obj.prev_slow = state['prev_slow']
+        obj.bars = state['bars']
+        obj.cash = state['cash']
+        obj.shares = state['shares']
+        obj.holding = state['holding']
+        obj.open_trade = state['open_trade']
+        obj.trades = state['trades']
+        obj.peak = state['peak']
+        obj.max_drawdown = state['max_drawdown']
+        obj.last_close = state['last_close']
+        obj.last_date = state['last_date']
+        return obj
+
+
+def checkpoint_path(code, state_dir=DEFAULT_STATE_DIR):
+    return os.path.join(state_dir, f"ma_cross_{code}.json")
+
+
+def _same_state(a, b):
+    # JSON文本比较：浮点按repr逐位比较，NaN也视为相等
+    return json.dumps(a.state(), sort_keys=True) == json.dumps(b.state(), sort_keys=True)
+
+
+def incremental_backtest(code, data=None, state_dir=DEFAULT_STATE_DIR, check=False, provider=None, **params):
+    """
+    从检查点续跑一只股票的均线交叉回测，跑完后保存新的检查点，返回result()
+
+    data: 含Close列、以日期为索引的完整行情（默认用fetch_bars读取）；续跑时只用其中检查点之后的K线
+    params: MACrossBacktest的参数；与检查点不一致、或检查点最后一根K线的收盘价已被修订时从头重跑
+    check=True: 再用全部K线从头跑一遍，状态不一致时抛出RuntimeError
+    """
+    path = checkpoint_path(code, state_dir)
+    backtest = None
+    if os.path.exists(path):
+        backtest = load_state(MACrossBacktest, path)
+        if backtest.last_date is None:
+            backtest = None
+        elif backtest.params() != MACrossBacktest(**params).params():
+            print(f"{code}: 参数与检查点不一致，从头回测")
+            backtest = None
+
+    # 续跑且不做检查时只需读取检查点最后一天及之后的K线
+    partial = data is None and backtest is not None and not check
+    if data is None:
+        data = fetch_bars(code, pd.Timestamp(backtest.last_date) if partial else None, None, provider)
+
+    if backtest is not None and pd.Timestamp(backtest.last_date) in data.index:
+        if float(data.loc[pd.Timestamp(backtest.last_date), 'Close']) != backtest.last_close:
+            print(f"{code}: {backtest.last_date} 的收盘价已修订，从头回测")
+            backtest = None
+            if partial:
+                data = fetch_bars(code, None, None, provider)
+
+    if backtest is None:
+        backtest = MACrossBacktest(**params)
+    new_bars = backtest.advance(data)
+    print(f"{code}: 新增{new_bars}根K线，共{backtest.bars}根，最后日期 {backtest.last_date}")
+
+    if check:
+        fresh = MACrossBacktest(**params)
+        fresh.advance(data)
+        if not _same_state(backtest, fresh):
+            raise RuntimeError(f"{code}: 续跑结果与从头回测不一致")
+        print(f"{code}: 一致性检查通过（续跑与从头回测的状态完全相同）")
+
+    os.makedirs(state_dir, exist_ok=True)
+    save_state(backtest, path)
+    return backtest.result()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 用法: python incremental_backtest.py 2330.TW 2317.TW [--check]
+    args = sys.argv[1:]
+    check = '--check' in args
+    codes = [a for a in args if a != '--check'] or ['2330.TW']
+
+    for stock_code in codes:
+        report = incremental_backtest(stock_code, check=check)
+        print(f"{stock_code}: 最终资产 {report['final_value']:,.0f}, 总收益率 {report['total_return']:.2f}%, "
+              f"最大回撤 {report['max_drawdown']:.2f}%, 交易次数 {report['num_trades']}")
@@ -0,0 +1,140 @@
+import weakref
+
+import pandas as pd
+
+# 指标缓存：(输入对象id, 指标名, 参数) -> (输入对象的弱引用, 结果)
+# 输入对象被回收时自动清除对应条目；同一个行情DataFrame在多个策略间重复计算时直接命中
+_cache = {}
+
+
+def clear_cache():
+    """
+    清空指标缓存（原地修改了行情数据后需要调用）
+    """
+    _cache.clear()
+
+
+def cache_size():
+    return len(_cache)
+
+
+def _memoize(data, name, params, compute):
+    key = (id(data), name, params)
+    entry = _cache.get(key)
+    if entry is not None and entry[0]() is data:
+        return entry[1]
+
+    value = compute()
+    _cache[key] = (weakref.ref(data, lambda _, key=key: _cache.pop(key, None)), value)
+    return value
+
+
+def _column(data, column):
+    """
+    取出某一列为Series；兼容yfinance的MultiIndex列名，传入Series时直接返回
+    """
+    if isinstance(data, pd.Series):
+        return data
+    values = data[column]
+    if isinstance(values, pd.DataFrame):
+        values = values.iloc[:, 0]
+    return values
+
+
+def sma(data, window, column='Close'):
+    """
+    简单移动平均
+    """
+    return _memoize(data, 'sma', (window, column),
+                    lambda: _column(data, column).rolling(window=window).mean())
+
+
+def rolling_std(data, window, column='Close'):
+    """
+    滚动标准差（样本标准差，ddof=1）
+    """
+    return _memoize(data, 'std', (window, column),
+                    lambda: _column(data, column).rolling(window=window).std())
+
+
+def ema(data, span, column='Close'):
+    """
+    指数移动平均（adjust=False）
+    """
+    return _memoize(data, 'ema', (span, column),
+                    lambda: _column(data, column).ewm(span=span, adjust=False).mean())
+
+
+def calculate_macd(data, fast_period=12, slow_period=26, signal_period=9):
+    """
+    计算MACD指标
+    """
+    def compute():
+        macd_line = ema(data, fast_period) - ema(data, slow_period)
+        signal_line = macd_line.ewm(span=signal_period, adjust=False).mean()
+        macd_histogram = macd_line - signal_line
+        return macd_line, signal_line, macd_histogram
+
+    return _memoize(data, 'macd', (fast_period, slow_period, signal_period), compute)
+
+
+def calculate_rsi(data, period=14):
+    """
+    计算RSI指标（涨跌幅的简单移动平均）
+    """
+    def compute():
+        delta = _column(data, 'Close').diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+    return _memoize(data, 'rsi', (period,), compute)
+
+
+def calculate_bollinger(data, window=20, num_std=2):
+    """
+    计算布林带，返回 (中轨, 上轨, 下轨)
+    """
+    def compute():
+        middle = sma(data, window)
+        std = rolling_std(data, window)
+        return middle, middle + std * num_std, middle - std * num_std
+
+    return _memoize(data, 'bollinger', (window, num_std), compute)
+
+
+def calculate_technical_indicators(stock_data):
+    """
+    计算所有技术指标
+
+    返回stock_data的副本，增加MA5/20/60/200、MACD、RSI、布林带、Trend_Strength、
+    Volatility和Volume_MA20列；同一个stock_data对象的指标只计算一次
+    """
+    df = stock_data.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+
+    # 计算移动平均线
+    for window in (5, 20, 60, 200):
+        df[f'MA{window}'] = sma(stock_data, window)
+
+    # 计算MACD
+    df['MACD'], df['MACD_Signal'], df['MACD_Histogram'] = calculate_macd(stock_data)
+
+    # 计算RSI
+    df['RSI'] = calculate_rsi(stock_data)
+
+    # 计算布林带
+    df['BB_Middle'], df['BB_Upper'], df['BB_Lower'] = calculate_bollinger(stock_data)
+
+    # 计算市场状态指标
+    df['Trend_Strength'] = abs(df['Close'] - df['MA200']) / df['MA200']
+    df['Volatility'] = rolling_std(stock_data, 20) / sma(stock_data, 20)
+
+    # 计算成交量均线（用于成交量确认）
+    if 'Volume' in df.columns:
+        df['Volume_MA20'] = sma(stock_data, 20, 'Volume')
+
+    return df
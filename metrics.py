@@ -0,0 +1,286 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 资产曲线的绩效指标（全部向量化）
+#
+# 所有函数沿最后一个轴（时间轴）计算：一维为单条资产曲线，二维为 策略数 × 交易日数 的矩阵，
+# 二维时返回每行一个结果。收益率、回撤类指标为百分比，回撤为负数。
+# 年化统一经由cagr，年数按数据的计时方式换算：
+#   按K线计数（回测脚本、滚动指标）用 K线数/252，K线只含交易日；
+#   只有起止日期（trade_ledger按交易日期、years_between）用 日历天数/365.25，日期间隔包含周末和假日。
+# 两者对同一段行情给出的年数基本一致，差别只来自每年实际交易日数与252的偏差
+
+TRADING_DAYS = 252
+
+
+def _values(equity):
+    return np.asarray(equity, dtype=np.float64)
+
+
+def cagr(growth, years):
+    """
+    年化收益率%：growth为期末/期初的倍数
+    """
+    growth = np.asarray(growth, dtype=np.float64)
+    if np.ndim(years) == 0 and years <= 0:
+        return np.zeros(growth.shape) if growth.ndim else 0.0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (growth ** (1 / np.asarray(years, dtype=np.float64)) - 1) * 100
+
+
+def years_between(start, end):
+    """
+    两个日期之间的年数（日历日/365.25）
+    """
+    return (np.datetime64(end, 'D') - np.datetime64(start, 'D')) / np.timedelta64(1, 'D') / 365.25
+
+
+def daily_returns(equity):
+    """
+    逐日收益率（小数），第一天为0
+    """
+    equity = _values(equity)
+    result = np.zeros(equity.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result[..., 1:] = equity[..., 1:] / equity[..., :-1] - 1
+    return np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def drawdown_series(equity, initial=None):
+    """
+    每天相对此前最高点的回撤%；initial给出时把期初资金也算作最高点
+    """
+    equity = _values(equity)
+    peak = np.maximum.accumulate(equity, axis=-1)
+    if initial is not None:
+        peak = np.maximum(peak, initial)
+    return (equity - peak) / peak * 100
+
+
+def max_drawdown(equity, initial=None):
+    """
+    最大回撤%（负数），等同 (series - series.expanding().max()) / series.expanding().max() 的最小值
+    """
+    equity = _values(equity)
+    if equity.shape[-1] == 0:
+        return np.zeros(equity.shape[:-1]) if equity.ndim > 1 else 0.0
+    return drawdown_series(equity, initial).min(axis=-1)
+
+
+def drawdown_duration(equity):
+    """
+    最长水下天数：从创新高到重新回到该高点之间的交易日数（至今未恢复的也计入）
+    """
+    equity = _values(equity)
+    n = equity.shape[-1]
+    if n == 0:
+        return np.zeros(equity.shape[:-1], dtype=np.int64) if equity.ndim > 1 else 0
+    at_peak = equity >= np.maximum.accumulate(equity, axis=-1)
+    last_peak = np.maximum.accumulate(np.where(at_peak, np.arange(n), 0), axis=-1)
+    return (np.arange(n) - last_peak).max(axis=-1)
+
+
+def annualized_return(equity, initial=None, periods_per_year=TRADING_DAYS):
+    """
+    年化收益率%：期数/periods_per_year为年数；initial为期初资金（默认为第一天的资产）
+    """
+    equity = _values(equity)
+    start = equity[..., 0] if initial is None else initial
+    return cagr(equity[..., -1] / start, equity.shape[-1] / periods_per_year)
+
+
+def sharpe_ratio(equity, risk_free=0.0, periods_per_year=TRADING_DAYS):
+    """
+    年化夏普比率：日超额收益均值 / 标准差 × sqrt(periods_per_year)；risk_free为年化无风险利率（小数）
+    """
+    excess = daily_returns(equity)[..., 1:] - risk_free / periods_per_year
+    std = excess.std(axis=-1, ddof=1) if excess.shape[-1] > 1 else np.zeros(excess.shape[:-1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(std > 0, excess.mean(axis=-1) / std * np.sqrt(periods_per_year), 0.0)
+
+
+def sortino_ratio(equity, risk_free=0.0, periods_per_year=TRADING_DAYS):
+    """
+    年化索提诺比率：只用下跌日的波动（下行标准差）作分母
+    """
+    excess = daily_returns(equity)[..., 1:] - risk_free / periods_per_year
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2, axis=-1)) if excess.shape[-1] else \
+        np.zeros(excess.shape[:-1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(downside > 0, excess.mean(axis=-1) / downside * np.sqrt(periods_per_year), 0.0)
+
+
+def calmar_ratio(equity, initial=None, periods_per_year=TRADING_DAYS):
+    """
+    卡玛比率：年化收益率 / |最大回撤|
+    """
+    drawdown = np.abs(max_drawdown(equity, initial))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(drawdown > 0, annualized_return(equity, initial, periods_per_year) / drawdown, 0.0)
+
+
+def return_drawdown_ratio(total_return, max_drawdown_pct, no_drawdown=None):
+    """
+    简化的风险调整后收益：收益率 / |最大回撤|；没有回撤时返回no_drawdown（默认为收益率本身）
+    """
+    if max_drawdown_pct >= 0:
+        return total_return if no_drawdown is None else no_drawdown
+    return total_return / abs(max_drawdown_pct)
+
+
+def exposure(positions):
+    """
+    持仓时间占比%：positions为每天的持股数或仓位，非0即视为在场
+    """
+    positions = np.asarray(positions)
+    return np.mean(positions != 0, axis=-1) * 100
+
+
+def turnover(traded_value, equity, periods_per_year=TRADING_DAYS):
+    """
+    年化换手率：成交金额合计 / 平均资产 / 年数
+    """
+    traded_value = np.abs(np.asarray(traded_value, dtype=np.float64))
+    equity = _values(equity)
+    years = equity.shape[-1] / periods_per_year
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(years > 0, traded_value.sum(axis=-1) / equity.mean(axis=-1) / years, 0.0)
+
+
+def performance_summary(equity, positions=None, traded_value=None, initial=None, risk_free=0.0,
+                        periods_per_year=TRADING_DAYS):
+    """
+    一次算出全部指标：逐日收益率和历史最高点只计算一次，各指标共用
+    """
+    equity = _values(equity)
+    start = equity[..., 0] if initial is None else initial
+    growth = equity[..., -1] / start
+    years = equity.shape[-1] / periods_per_year
+
+    drawdowns = drawdown_series(equity, initial)
+    worst = drawdowns.min(axis=-1)
+    annual = cagr(growth, years)
+
+    excess = daily_returns(equity)[..., 1:] - risk_free / periods_per_year
+    mean = excess.mean(axis=-1)
+    std = excess.std(axis=-1, ddof=1) if excess.shape[-1] > 1 else np.zeros(excess.shape[:-1])
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2, axis=-1))
+    scale = np.sqrt(periods_per_year)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary = {
+            'total_return': (growth - 1) * 100,
+            'annualized_return': annual,
+            'max_drawdown': worst,
+            'drawdown_duration': drawdown_duration(equity),
+            'volatility': std * scale * 100,
+            'sharpe': np.where(std > 0, mean / std * scale, 0.0),
+            'sortino': np.where(downside > 0, mean / downside * scale, 0.0),
+            'calmar': np.where(worst < 0, annual / np.abs(worst), 0.0),
+        }
+    if positions is not None:
+        summary['exposure'] = exposure(positions)
+    if traded_value is not None:
+        summary['turnover'] = turnover(traded_value, equity, periods_per_year)
+    return summary
+
+
+def _rolling_sum(values, window):
+    """
+    沿最后一个轴的滑动窗口和，前window-1天为NaN
+    """
+    sums = np.cumsum(values, axis=-1)
+    result = np.full(values.shape, np.nan)
+    if window <= values.shape[-1]:
+        result[..., window - 1] = sums[..., window - 1]
+        result[..., window:] = sums[..., window:] - sums[..., :-window]
+    return result
+
+
+def rolling_sharpe(equity, window=TRADING_DAYS, risk_free=0.0, periods_per_year=TRADING_DAYS):
+    """
+    滚动夏普比率（最近window天的日收益率），前window天为NaN
+    """
+    excess = daily_returns(equity) - risk_free / periods_per_year
+    mean = _rolling_sum(excess, window) / window
+    square = _rolling_sum(excess ** 2, window) / window
+    std = np.sqrt(np.maximum(square - mean ** 2, 0) * window / max(window - 1, 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(std > 0, mean / std * np.sqrt(periods_per_year), 0.0)
+    result[..., :window] = np.nan
+    return result
+
+
+def rolling_sortino(equity, window=TRADING_DAYS, risk_free=0.0, periods_per_year=TRADING_DAYS):
+    """
+    滚动索提诺比率，前window天为NaN
+    """
+    excess = daily_returns(equity) - risk_free / periods_per_year
+    mean = _rolling_sum(excess, window) / window
+    downside = np.sqrt(_rolling_sum(np.minimum(excess, 0) ** 2, window) / window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(downside > 0, mean / downside * np.sqrt(periods_per_year), 0.0)
+    result[..., :window] = np.nan
+    return result
+
+
+def rolling_max_drawdown(equity, window=TRADING_DAYS, max_elements=2 ** 22):
+    """
+    滚动最大回撤%：每天只看最近window天的资产，前window-1天为NaN
+
+    每个窗口都要重新累计最高点，展开全部窗口需要 窗口数 × window 个元素；
+    这里按窗口分块计算，每块最多展开max_elements个元素（默认约32MB），内存与序列长度无关
+    """
+    equity = _values(equity)
+    result = np.full(equity.shape, np.nan)
+    n = equity.shape[-1]
+    if window > n:
+        return result
+    windows = sliding_window_view(equity, window, axis=-1)
+    step = max(1, max_elements // (window * max(1, equity.size // n)))
+    for start in range(0, n - window + 1, step):
+        block = windows[..., start:start + step, :]
+        peaks = np.maximum.accumulate(block, axis=-1)
+        end = start + block.shape[-2]
+        result[..., window - 1 + start:window - 1 + end] = ((block - peaks) / peaks).min(axis=-1) * 100
+    return result
+
+
+def rolling_annualized_return(equity, window=TRADING_DAYS, periods_per_year=TRADING_DAYS):
+    """
+    滚动年化收益率%：最近window天的涨幅按年化换算
+    """
+    equity = _values(equity)
+    result = np.full(equity.shape, np.nan)
+    if window < equity.shape[-1]:
+        result[..., window:] = cagr(equity[..., window:] / equity[..., :-window], window / periods_per_year)
+    return result
+
+
+def rolling_calmar(equity, window=TRADING_DAYS, periods_per_year=TRADING_DAYS):
+    """
+    滚动卡玛比率：滚动年化收益率 / |滚动最大回撤|
+    """
+    annual = rolling_annualized_return(equity, window, periods_per_year)
+    drawdown = np.abs(rolling_max_drawdown(_values(equity), window + 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(drawdown > 0, annual / drawdown, 0.0)
+    result[np.isnan(annual) | np.isnan(drawdown)] = np.nan
+    return result
+
+
+def rolling_exposure(positions, window=TRADING_DAYS):
+    """
+    滚动持仓时间占比%
+    """
+    return _rolling_sum((np.asarray(positions) != 0).astype(np.float64), window) / window * 100
+
+
+def rolling_turnover(traded_value, equity, window=TRADING_DAYS, periods_per_year=TRADING_DAYS):
+    """
+    滚动年化换手率
+    """
+    traded = _rolling_sum(np.abs(np.asarray(traded_value, dtype=np.float64)), window)
+    average = _rolling_sum(_values(equity), window) / window
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return traded / average / (window / periods_per_year)
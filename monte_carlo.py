@@ -0,0 +1,95 @@
+import numpy as np
+
+import metrics
+
+# 回测结果的蒙特卡洛重抽样（全部向量化）
+#
+# bootstrap_trades: 对每笔交易的（按仓位调整后）收益率有放回抽样，重排出n_bootstrap条交易序列
+# block_bootstrap:  对策略的每日收益率按连续区块抽样，保留波动聚集等短期相关性
+# 两者都返回每条样本路径的 累计收益率、年化收益率、最大回撤（百分比），
+# 再由confidence_intervals给出置信区间，prob_better比较两个策略
+
+CI_LEVELS = (5, 50, 95)
+
+
+def path_stats(returns, years):
+    """
+    returns为 样本数 × 期数 的收益率矩阵（小数），返回 (累计收益率%, 年化收益率%, 最大回撤%)
+    """
+    equity = np.cumprod(1 + returns, axis=1)
+    final = equity[:, -1] if equity.shape[1] else np.ones(len(equity))
+
+    # 回撤从初始资金1.0开始计算
+    drawdown = metrics.max_drawdown(equity, initial=1.0) if equity.shape[1] else np.zeros(len(equity))
+
+    # 资产归零（或为负）的路径年化记为-100%
+    annual = np.where(final > 0, metrics.cagr(final, years), -100.0) if years > 0 else np.zeros(len(equity))
+    return (final - 1) * 100, annual, np.minimum(drawdown, 0)
+
+
+def _chunks(n_bootstrap, chunk_size):
+    for start in range(0, n_bootstrap, chunk_size):
+        yield min(chunk_size, n_bootstrap - start)
+
+
+def bootstrap_trades(trade_returns, years, n_bootstrap=5000, seed=None, chunk_size=2000):
+    """
+    交易收益率（百分比）的有放回抽样，每条路径的交易笔数与原始相同
+
+    返回 {'total_return', 'annualized_return', 'max_drawdown'}，每项为长度n_bootstrap的数组
+    """
+    returns = np.asarray(trade_returns, dtype=np.float64) / 100
+    rng = np.random.default_rng(seed)
+    parts = []
+    for size in _chunks(n_bootstrap, chunk_size):
+        samples = returns[rng.integers(0, len(returns), (size, len(returns)))]
+        parts.append(path_stats(samples, years))
+    return _collect(parts)
+
+
+def block_bootstrap(daily_returns, n_bootstrap=5000, block_size=20, seed=None, chunk_size=500):
+    """
+    每日收益率（小数）的移动区块抽样：随机选取长度为block_size的连续区块拼接到原始长度
+
+    返回格式同bootstrap_trades，年化按每年252个交易日计算
+    """
+    returns = np.asarray(daily_returns, dtype=np.float64)
+    returns = returns[~np.isnan(returns)]
+    n = len(returns)
+    block_size = max(1, min(block_size, n))
+    n_blocks = -(-n // block_size)
+    offsets = np.arange(block_size)
+
+    rng = np.random.default_rng(seed)
+    parts = []
+    for size in _chunks(n_bootstrap, chunk_size):
+        starts = rng.integers(0, n - block_size + 1, (size, n_blocks))
+        index = (starts[:, :, np.newaxis] + offsets).reshape(size, -1)[:, :n]
+        parts.append(path_stats(returns[index], n / 252))
+    return _collect(parts)
+
+
+def _collect(parts):
+    total, annual, drawdown = (np.concatenate(values) for values in zip(*parts))
+    return {'total_return': total, 'annualized_return': annual, 'max_drawdown': drawdown}
+
+
+def confidence_intervals(samples, levels=CI_LEVELS):
+    """
+    各指标的分位数 {指标: (下限, 中位数, 上限)}
+    """
+    return {key: tuple(np.percentile(values, levels)) for key, values in samples.items()}
+
+
+def prob_better(samples_a, samples_b, key='total_return'):
+    """
+    两个策略独立重抽样后，A的指标高于B的概率
+
+    两组样本须来自不同的随机数流（如 np.random.SeedSequence(seed).spawn 派生的种子）；
+    用同一个种子抽样时两边的抽样下标相同，得到的是配对比较而不是独立比较
+    """
+    a = np.asarray(samples_a[key])
+    b = np.asarray(samples_b[key])
+    size = min(len(a), len(b))
+    return float(np.mean(a[:size] > b[:size]))
+
@@ -0,0 +1,180 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics import cagr, max_drawdown
+from portfolio_engine import run_portfolio
+from signal_kernel import cross_above, cross_below
+from universe_indicators import rolling_mean
+
+# 均线交叉策略的参数网格扫描
+#
+# 参数组合：(快线, 慢线, 趋势线) 窗口 × 手续费率 × 趋势过滤阈值
+#   快线上穿慢线且 收盘价 > 趋势线*(1+阈值) 时全仓买入，快线下穿慢线时全部卖出（同backtest_ma_cross_optimized）
+#   趋势线窗口为0表示不过滤
+# 每个窗口的均线只计算一次，所有组合共用；按(快线, 慢线)分组交给进程池，
+# 同一组内交叉信号只算一次，再遍历趋势线、阈值、手续费率
+
+RESULT_COLUMNS = ['fast', 'slow', 'trend', 'threshold', 'commission', 'final_value', 'total_return',
+                  'annual_return', 'max_drawdown', 'num_trades']
+
+# 子进程中的收盘价和各窗口均线（由进程池initializer设置一次）
+_sweep_state = {}
+
+
+def moving_averages(close, windows):
+    """
+    每个窗口只计算一次的均线表 {窗口: 数组}
+    """
+    close = np.asarray(close, dtype=np.float64)
+    return {w: rolling_mean(close[np.newaxis, :], w)[0] for w in sorted(set(windows)) if w > 0}
+
+
+def _init_sweep(close, averages, initial_cash, start):
+    _sweep_state.clear()
+    _sweep_state.update(close=close, averages=averages, initial_cash=initial_cash, start=start)
+
+
+def cross_masks(averages, fast, slow, start, lo=0, hi=None):
+    """
+    [lo, hi)区间内的 (金叉买入, 死叉卖出) 掩码，区间第一天的交叉也和前一天比较
+    """
+    base = max(lo - 1, 0)
+    ready = np.arange(base, hi if hi is not None else len(averages[fast])) >= start
+    golden = ready & cross_above(averages[fast][base:hi], averages[slow][base:hi])
+    sell = ready & cross_below(averages[fast][base:hi], averages[slow][base:hi])
+    return golden[lo - base:], sell[lo - base:]
+
+
+def trend_filter(close, averages, trend, threshold, lo=0, hi=None):
+    """
+    收盘价 > 趋势线*(1+阈值)；trend为0时不过滤
+    """
+    if not trend:
+        return np.ones(len(close[lo:hi]), dtype=bool)
+    return close[lo:hi] > averages[trend][lo:hi] * (1 + threshold)
+
+
+def pair_results(close, averages, fast, slow, trends, thresholds, commissions, initial_cash, start,
+                 lo=0, hi=None):
+    """
+    一组(快线, 慢线)下所有趋势线/阈值/手续费组合的结果行，只在[lo, hi)区间内交易和计算资产
+    """
+    golden, sell = cross_masks(averages, fast, slow, start, lo, hi)
+    prices = close[lo:hi]
+    years = len(prices) / 252
+
+    rows = []
+    for trend in trends:
+        for threshold in thresholds:
+            buy = golden & trend_filter(close, averages, trend, threshold, lo, hi)
+            for commission in commissions:
+                result = run_portfolio(prices, buy, sell, initial_cash=initial_cash, commission=commission,
+                                       sizing='gross')
+                final_value = result['final_value']
+                rows.append((fast, slow, trend, threshold, commission, final_value,
+                             (final_value - initial_cash) / initial_cash * 100,
+                             cagr(final_value / initial_cash, years),
+                             max_drawdown(result['equity']), len(result['trades'])))
+    return rows
+
+
+def evaluate_pair(fast, slow, trends, thresholds, commissions):
+    """
+    在子进程中计算一组(快线, 慢线)下所有趋势线/阈值/手续费组合的结果行
+    """
+    return pair_results(_sweep_state['close'], _sweep_state['averages'], fast, slow, trends, thresholds,
+                        commissions, _sweep_state['initial_cash'], _sweep_state['start'])
+
+
+def sweep(data, fast_windows=range(5, 55), slow_windows=range(20, 270, 5), trend_windows=(0, 200),
+          commissions=(0.0015,), thresholds=(0.0,), initial_cash=1000000, start=200, sort_by='total_return',
+          max_workers=None):
+    """
+    扫描参数网格，返回按sort_by从高到低排序、带rank列的DataFrame
+
+    data: 含Close列的DataFrame或收盘价数组；只保留 快线 < 慢线 的组合
+    max_workers: 进程数，1时在当前进程中运行
+    """
+    close = np.asarray(data['Close'] if isinstance(data, pd.DataFrame) else data, dtype=np.float64)
+    trends = list(trend_windows)
+    thresholds = list(thresholds)
+    commissions = list(commissions)
+    pairs = [(fast, slow) for fast, slow in itertools.product(fast_windows, slow_windows) if fast < slow]
+    if not pairs:
+        raise ValueError("没有有效的参数组合（快线窗口必须小于慢线窗口）")
+
+    averages = moving_averages(close, list(fast_windows) + list(slow_windows) + trends)
+    print(f"参数组合数: {len(pairs) * len(trends) * len(thresholds) * len(commissions)}, "
+          f"均线窗口数: {len(averages)}")
+
+    rows = []
+    if max_workers == 1:
+        _init_sweep(close, averages, initial_cash, start)
+        for fast, slow in pairs:
+            rows.extend(evaluate_pair(fast, slow, trends, thresholds, commissions))
+    else:
+        workers = min(max_workers or os.cpu_count() or 1, len(pairs))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep,
+                                 initargs=(close, averages, initial_cash, start)) as executor:
+            chunksize = max(1, len(pairs) // (workers * 4))
+            for pair_rows in executor.map(evaluate_pair, *zip(*pairs), itertools.repeat(trends),
+                                          itertools.repeat(thresholds), itertools.repeat(commissions),
+                                          chunksize=chunksize):
+                rows.extend(pair_rows)
+
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    results = results.sort_values(sort_by, ascending=False, kind='stable').reset_index(drop=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
+
+
+def plot_heatmap(results, x='fast', y='slow', value='total_return', filename=None):
+    """
+    画出参数热力图；其余参数取每个(x, y)格子中的最好结果。filename为None时直接显示
+    """
+    import matplotlib.pyplot as plt
+
+    table = results.pivot_table(index=y, columns=x, values=value, aggfunc='max')
+
+    fig, ax = plt.subplots(figsize=(12, 9))
+    image = ax.imshow(table.values, origin='lower', aspect='auto', cmap='RdYlGn')
+    ax.set_xticks(range(len(table.columns)))
+    ax.set_xticklabels(table.columns, rotation=90, fontsize=7)
+    ax.set_yticks(range(len(table.index)))
+    ax.set_yticklabels(table.index, fontsize=7)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.set_title(f'{value} ({y} × {x})')
+    fig.colorbar(image, ax=ax)
+    plt.tight_layout()
+
+    if filename:
+        plt.savefig(filename, dpi=150, bbox_inches='tight')
+        plt.close(fig)
+        print(f"热力图已保存为: {filename}")
+    else:
+        plt.show()
+    return table
+
+
+if __name__ == "__main__":
+    import sys
+    from datetime import datetime, timedelta
+
+    from data_provider import fetch_bars
+
+    # 用法: python param_sweep.py 2330.TW
+    stock_code = sys.argv[1] if len(sys.argv) > 1 else '2330.TW'
+    end_date = datetime.now()
+    stock_data = fetch_bars(stock_code, end_date - timedelta(days=365 * 20), end_date)
+
+    table = sweep(stock_data, commissions=(0.001, 0.0015), thresholds=(0.0, 0.02))
+    pd.set_option('display.width', 200)
+    print(table.head(20).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    plot_heatmap(table, filename=f'param_sweep_{stock_code}_{timestamp}.png')
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from data_provider import fetch_bars
+from metrics import cagr, max_drawdown
+from universe_indicators import rolling_mean, universe_matrix
+
+# 多股票组合回测：所有股票共用一个资金池，定期按目标权重调仓
+#
+# 价格面板为 股票数 × 交易日数 的矩阵（未上市/停牌处为NaN，估值时沿用最近收盘价）
+# 目标权重可以直接给出（同形状矩阵），也可以由选股函数得到（被选中的股票等权）
+# 调仓日以收盘价成交，整数股（lot_size的整数倍），买卖都按成交金额收取手续费；
+# 调仓日之间持股不变，每天的资产 = 现金 + 持股矩阵·价格矩阵，全部用矩阵运算得到
+
+COMMISSION = 0.0015
+
+
+def load_universe(source, start=None, end=None, provider=None):
+    """
+    读取组合的行情，返回 {代码: DataFrame}
+
+    source: twn50.xls / twn100.xls / ETF成分股文件路径、代码列表，或已经取好的 {代码: DataFrame}
+    """
+    if isinstance(source, dict):
+        return source
+    if isinstance(source, str):
+        from downloader import read_ticker_list
+        source = read_ticker_list(source)
+
+    frames = {}
+    for code in source:
+        df = fetch_bars(code, start, end, provider)
+        if df.empty:
+            print(f"{code}: 没有行情数据，跳过")
+            continue
+        frames[code] = df
+    return frames
+
+
+def forward_fill(matrix):
+    """
+    沿时间轴用最近的有效值填充NaN（上市前仍为NaN）
+    """
+    n = matrix.shape[1]
+    valid = ~np.isnan(matrix)
+    last = np.maximum.accumulate(np.where(valid, np.arange(n), -1), axis=1)
+    filled = np.take_along_axis(matrix, np.maximum(last, 0), axis=1)
+    filled[last < 0] = np.nan
+    return filled
+
+
+def rebalance_days(dates, rebalance='M'):
+    """
+    调仓日序号：'W'/'M'/'Q'/'Y' 为每周/月/季/年第一个交易日，整数N为每N个交易日
+    """
+    if isinstance(rebalance, (int, np.integer)):
+        return np.arange(0, len(dates), max(1, int(rebalance)))
+    periods = pd.DatetimeIndex(dates).to_period(rebalance)
+    first = np.ones(len(dates), dtype=bool)
+    first[1:] = periods[1:] != periods[:-1]
+    return np.flatnonzero(first)
+
+
+def equal_weights(selected):
+    """
+    每天在被选中的股票间等权分配
+    """
+    selected = np.asarray(selected, dtype=bool)
+    counts = selected.sum(axis=0)
+    return np.where(selected, 1.0 / np.maximum(counts, 1), 0.0)
+
+
+def trend_signal(close, window=200):
+    """
+    默认选股函数：收盘价在window日均线上方
+
+    均线只用每只股票自己的交易日计算；停牌日沿用最近收盘价和均线，不会因为停牌被剔除，上市前不选
+    """
+    return forward_fill(np.asarray(close, dtype=np.float64)) > rolling_mean(close, window)
+
+
+def run_backtest(close, weights, dates, rebalance='M', initial_cash=1000000, commission=COMMISSION,
+                 lot_size=1):
+    """
+    按目标权重矩阵定期调仓的组合回测
+
+    close / weights: 股票数 × 交易日数 的矩阵；每天权重之和超过1时按比例缩小；dates为对应的交易日
+    返回 {'equity', 'cash', 'shares', 'rebalance_days', 'turnover', 'fees', 'final_value',
+          'total_return', 'annual_return', 'max_drawdown'}
+    """
+    close = np.asarray(close, dtype=np.float64)
+    weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))
+    n_codes, n_days = close.shape
+    prices = forward_fill(close)
+
+    total = weights.sum(axis=0)
+    weights = weights / np.maximum(total, 1.0)
+
+    days = rebalance_days(dates, rebalance)
+
+    cash = float(initial_cash)
+    shares = np.zeros(n_codes)
+    held = np.zeros((n_codes, len(days)))
+    cash_after = np.zeros(len(days))
+    turnover = np.zeros(len(days))
+    fees = np.zeros(len(days))
+
+    for k, day in enumerate(days):
+        price = close[:, day]
+        tradable = ~np.isnan(price)
+        value = np.where(np.isnan(prices[:, day]), 0.0, prices[:, day]) * shares
+        equity = cash + value.sum()
+
+        # 停牌/已下市的持股无法交易，权重只分配可交易部分（现金 + 可交易持股）
+        # 预留两倍的预估手续费，保证整数股取整后现金不为负
+        investable = cash + value[tradable].sum()
+        fee_estimate = commission * np.abs(weights[tradable, day] * investable - value[tradable]).sum()
+        budget = investable - 2 * fee_estimate
+        target = shares.copy()
+        target[tradable] = np.floor(weights[tradable, day] * budget / price[tradable] / lot_size) * lot_size
+
+        orders = target - shares
+        traded = np.abs(orders[tradable] * price[tradable]).sum()
+        fees[k] = traded * commission
+        cash -= (orders[tradable] * price[tradable]).sum() + fees[k]
+        shares = target
+
+        held[:, k] = shares
+        cash_after[k] = cash
+        turnover[k] = traded / equity if equity > 0 else 0.0
+
+    # 每天适用的调仓：最近一次（含当天）调仓后的持股和现金；第一次调仓前为初始状态
+    latest = np.searchsorted(days, np.arange(n_days), side='right') - 1
+    before = latest < 0
+    daily_shares = held[:, np.maximum(latest, 0)]
+    daily_shares[:, before] = 0.0
+    daily_cash = np.where(before, float(initial_cash), cash_after[np.maximum(latest, 0)])
+
+    equity = daily_cash + np.nansum(daily_shares * prices, axis=0)
+    final_value = equity[-1] if n_days else float(initial_cash)
+    return {
+        'equity': pd.Series(equity, index=dates),
+        'cash': daily_cash,
+        'shares': daily_shares,
+        'rebalance_days': days,
+        'turnover': turnover,
+        'fees': fees,
+        'final_value': final_value,
+        'total_return': (final_value - initial_cash) / initial_cash * 100,
+        'annual_return': cagr(final_value / initial_cash, n_days / 252),
+        'max_drawdown': max_drawdown(equity),
+    }
+
+
+def portfolio_backtest(universe, signal_function=trend_signal, weights=None, rebalance='M', start=None, end=None,
+                       provider=None, initial_cash=1000000, commission=COMMISSION, lot_size=1):
+    """
+    组合回测入口
+
+    universe: 见load_universe
+    weights: 目标权重，DataFrame（行为代码、列为日期）或与价格面板同形状的矩阵；给出时不使用signal_function
+    signal_function: signal_function(收盘价矩阵) -> 选股矩阵（布尔，等权）或权重矩阵（浮点）
+    """
+    frames = load_universe(universe, start, end, provider)
+    if not frames:
+        raise ValueError("组合中没有可用的行情数据")
+    codes, dates, close = universe_matrix(frames)
+
+    if weights is None:
+        signal = np.asarray(signal_function(close))
+        weights = equal_weights(signal) if signal.dtype == bool else signal
+    elif isinstance(weights, pd.DataFrame):
+        weights = weights.reindex(index=codes, columns=dates).fillna(0.0).values
+
+    result = run_backtest(close, weights, dates, rebalance, initial_cash, commission, lot_size)
+    result['codes'] = codes
+    result['dates'] = dates
+
+    print(f"组合回测: {len(codes)}只股票, {len(dates)}个交易日, 调仓{len(result['rebalance_days'])}次")
+    print(f"最终资产: {result['final_value']:,.0f}, 总收益率: {result['total_return']:.2f}%, "
+          f"年化: {result['annual_return']:.2f}%, 最大回撤: {result['max_drawdown']:.2f}%, "
+          f"手续费合计: {result['fees'].sum():,.0f}")
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+    from datetime import datetime, timedelta
+
+    # 用法: python portfolio_backtest.py twn50.xls [M|W|Q|天数]
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'twn50.xls'
+    schedule = sys.argv[2] if len(sys.argv) > 2 else 'M'
+    schedule = int(schedule) if schedule.isdigit() else schedule
+
+    end_date = datetime.now()
+    portfolio_backtest(file_path, rebalance=schedule, start=end_date - timedelta(days=365 * 10), end=end_date)
@@ -0,0 +1,199 @@
+import numpy as np
+
+# 统一的资金账户计算：手续费0.15%，整数股
+#
+# apply_orders  已知每天的下单股数（正数买入、负数卖出）时，现金、持股、资产全部用累加运算得到
+# run_portfolio 按买卖信号和资金情况决定下单股数（只在有事件的日子循环），再交给apply_orders
+# dated_records 把成交（以及投入资金）整理成带日期的结构化数组，供脚本打印、绘图
+
+COMMISSION = 0.0015
+
+# run_portfolio的成交记录：NumPy结构化数组，一笔成交一行（index为交易日序号，cash为交易后现金）
+TRADE_DTYPE = np.dtype([
+    ('index', 'i8'),
+    ('action', 'U4'),
+    ('price', 'f8'),
+    ('shares', 'i8'),
+    ('amount', 'f8'),
+    ('fee', 'f8'),
+    ('cash', 'f8'),
+])
+
+# 脚本打印、绘图用的带日期记录：action为BUY/SELL，或投入资金的PHASE_IN/MONTHLY_IN（shares为0、value为投入金额）
+RECORD_DTYPE = np.dtype([
+    ('date', 'datetime64[ns]'),
+    ('action', 'U10'),
+    ('price', 'f8'),
+    ('shares', 'f8'),
+    ('value', 'f8'),
+    ('portfolio_value', 'f8'),
+])
+
+
+def apply_orders(close, orders, deposits=None, initial_cash=0.0, commission=COMMISSION):
+    """
+    由每天的下单股数得到每天收盘后的 现金、持股、资产
+
+    买入花费 股数*价格*(1+手续费率)，卖出所得 股数*价格*(1-手续费率)，deposits为每天存入的资金
+    """
+    close = np.asarray(close, dtype=np.float64)
+    orders = np.asarray(orders, dtype=np.int64)
+    n = len(close)
+
+    trade_value = np.zeros(n)
+    traded = orders != 0
+    trade_value[traded] = orders[traded] * close[traded]
+    fees = np.abs(trade_value) * commission
+
+    flows = -trade_value - fees
+    if deposits is not None:
+        flows = flows + np.asarray(deposits, dtype=np.float64)
+
+    cash = initial_cash + np.cumsum(flows)
+    shares = np.cumsum(orders)
+    equity = cash + shares * close
+    return {'cash': cash, 'shares': shares, 'equity': equity}
+
+
+def apply_targets(close, target_shares, deposits=None, initial_cash=0.0, commission=COMMISSION):
+    """
+    由每天的目标持股数得到每天的 现金、持股、资产
+    """
+    target_shares = np.asarray(target_shares, dtype=np.int64)
+    orders = np.diff(target_shares, prepend=0)
+    return apply_orders(close, orders, deposits, initial_cash, commission)
+
+
+def _affordable(close, cash, commission, sizing):
+    """
+    资金至少能买1股的价格上限判断
+    """
+    if sizing == 'gross':
+        return close * (1 + commission) <= cash
+    return close <= cash * (1 - commission)
+
+
+def run_portfolio(close, buy=None, sell=None, deposits=None, initial_cash=0.0, commission=COMMISSION,
+                  sizing='gross', pyramiding=False, mark='post'):
+    """
+    按信号全仓买入、全部卖出的账户回测
+
+    每天依次：存入deposits，然后
+      买入条件成立（且未持仓，pyramiding=True时允许加仓）且有现金 -> 用全部现金买入整数股
+      否则卖出条件成立且有持股 -> 全部卖出
+    sizing='gross': 股数 = 现金 // (价格*(1+手续费率))
+    sizing='net':   股数 = 现金*(1-手续费率) // 价格
+    mark='post' 资产按当天交易后计算，'pre' 按交易前（开盘时的持仓）计算
+
+    只在存款日、可能成交的买入日、卖出日上循环，其余日子不进入Python循环。
+    返回 {'cash', 'shares', 'equity', 'orders', 'trades', 'final_value'}，
+    trades为TRADE_DTYPE结构化数组
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    buy = np.zeros(n, dtype=bool) if buy is None else np.asarray(buy, dtype=bool)
+    sell = np.zeros(n, dtype=bool) if sell is None else np.asarray(sell, dtype=bool)
+    deposits = np.zeros(n) if deposits is None else np.asarray(deposits, dtype=np.float64)
+
+    buy_days = np.flatnonzero(buy)
+    sell_days = np.flatnonzero(sell)
+    deposit_days = np.flatnonzero(deposits)
+
+    orders = np.zeros(n, dtype=np.int64)
+    # 每笔成交都发生在买入日或卖出日，成交笔数不超过两者之和
+    trades = np.zeros(len(buy_days) + len(sell_days), dtype=TRADE_DTYPE)
+    count = 0
+    cash = float(initial_cash)
+    shares = 0
+
+    def next_day(days, start):
+        k = np.searchsorted(days, start)
+        return days[k] if k < len(days) else n
+
+    i = 0
+    while i < n:
+        # 下一个存款日、卖出日，以及在此之前第一个买得起的买入日
+        j = next_day(deposit_days, i)
+        if shares > 0:
+            j = min(j, next_day(sell_days, i))
+        if cash > 0 and (pyramiding or shares == 0):
+            lo = np.searchsorted(buy_days, i, side='left')
+            hi = np.searchsorted(buy_days, min(j, n - 1), side='right')
+            candidates = buy_days[lo:hi]
+            hits = candidates[_affordable(close[candidates], cash, commission, sizing)]
+            if len(hits):
+                j = min(j, hits[0])
+        if j >= n:
+            break
+
+        price = close[j]
+        cash += deposits[j]
+        if buy[j] and (pyramiding or shares == 0) and cash > 0:
+            if sizing == 'gross':
+                quantity = int(cash // (price * (1 + commission)))
+            else:
+                quantity = int(cash * (1 - commission) // price)
+            cost = quantity * price * (1 + commission)
+            if quantity > 0 and cost <= cash:
+                cash -= cost
+                shares += quantity
+                orders[j] = quantity
+                trades[count] = (j, 'BUY', price, quantity, quantity * price, quantity * price * commission, cash)
+                count += 1
+        elif sell[j] and shares > 0:
+            cash += shares * price * (1 - commission)
+            orders[j] = -shares
+            trades[count] = (j, 'SELL', price, shares, shares * price, shares * price * commission, cash)
+            count += 1
+            shares = 0
+        i = j + 1
+
+    result = apply_orders(close, orders, deposits, initial_cash, commission)
+    result['final_value'] = result['equity'][-1] if n else float(initial_cash)
+    if mark == 'pre':
+        # 交易前资产 = 前一天收盘后的现金和持股按今天收盘价计算
+        prev_cash = np.r_[initial_cash, result['cash'][:-1]]
+        prev_shares = np.r_[0, result['shares'][:-1]]
+        result['equity'] = prev_cash + prev_shares * close
+    result['orders'] = orders
+    result['trades'] = trades[:count]
+    return result
+
+
+def trade_records(dates, action, price, shares, value, portfolio_value):
+    """
+    由各列（等长数组，action可以是单个字符串）组成RECORD_DTYPE记录，按日期排序；同一天的记录保持传入顺序
+    """
+    records = np.zeros(len(dates), dtype=RECORD_DTYPE)
+    records['date'] = np.asarray(dates, dtype='datetime64[ns]')
+    records['action'] = action
+    records['price'] = price
+    records['shares'] = shares
+    records['value'] = value
+    records['portfolio_value'] = portfolio_value
+    return records[np.argsort(records['date'], kind='stable')]
+
+
+def dated_records(dates, close, result, deposits=None, deposit_action=None, initial_cash=0.0):
+    """
+    run_portfolio结果的带日期记录（RECORD_DTYPE）
+
+    买卖记录的value为成交金额，portfolio_value为交易后的资产；
+    给出deposit_action时每次投入资金也记一行（排在当天的买卖之前），portfolio_value为投入后、交易前的资产
+    """
+    close = np.asarray(close, dtype=np.float64)
+    trades = result['trades']
+    days = trades['index']
+    records = trade_records(np.asarray(dates)[days], trades['action'], trades['price'], trades['shares'],
+                            trades['amount'], trades['cash'] + result['shares'][days] * trades['price'])
+    if deposit_action is None:
+        return records
+
+    deposits = np.asarray(deposits, dtype=np.float64)
+    days = np.flatnonzero(deposits)
+    prev_cash = np.r_[initial_cash, result['cash'][:-1]][days]
+    prev_shares = np.r_[0, result['shares'][:-1]][days]
+    deposited = trade_records(np.asarray(dates)[days], deposit_action, close[days], 0.0, deposits[days],
+                              prev_cash + deposits[days] + prev_shares * close[days])
+    combined = np.concatenate([deposited, records])
+    return combined[np.argsort(combined['date'], kind='stable')]
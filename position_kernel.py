@@ -0,0 +1,174 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# 依赖路径的持仓状态机：冷却期、止损、止盈、最长持有天数、按信号日给定仓位
+#
+# 每天（从start开始）：
+#   未持仓且不在冷却期、买入条件成立 -> 以收盘价买入，仓位取sizes[i]
+#   已持仓且（卖出条件成立 或 收盘价触及止损/止盈 或 持有满max_holding天）-> 卖出
+# 买入当天不会卖出，卖出当天不会再买入；卖出后cooldown天内不买入
+#
+# 安装了numba时用编译后的逐日循环；否则按交易逐笔跳转（用searchsorted找下一个事件），
+# Python层的循环次数只与交易笔数有关
+
+EXIT_SIGNAL = 0
+EXIT_STOP_LOSS = 1
+EXIT_TAKE_PROFIT = 2
+EXIT_MAX_HOLDING = 3
+
+EXIT_REASONS = {
+    EXIT_SIGNAL: '卖出信号',
+    EXIT_STOP_LOSS: '止损',
+    EXIT_TAKE_PROFIT: '止盈',
+    EXIT_MAX_HOLDING: '持有到期',
+}
+
+
+def _state_machine(entries, exits, close, stop_loss, take_profit, cooldown, start, max_holding,
+                   entry_idx, exit_idx, exit_reason):
+    """
+    逐日状态机（numba编译的版本，也是逐笔跳转版本的参照实现）；参数不用时传0
+    """
+    n_entries = 0
+    n_exits = 0
+    holding = False
+    entry_price = 0.0
+    entry_day = 0
+    next_allowed = start
+
+    for i in range(start, len(entries)):
+        if not holding:
+            if entries[i] and i >= next_allowed:
+                entry_idx[n_entries] = i
+                n_entries += 1
+                holding = True
+                entry_price = close[i]
+                entry_day = i
+            continue
+
+        reason = -1
+        if exits[i]:
+            reason = EXIT_SIGNAL
+        elif stop_loss > 0 and close[i] <= entry_price * (1 - stop_loss):
+            reason = EXIT_STOP_LOSS
+        elif take_profit > 0 and close[i] >= entry_price * (1 + take_profit):
+            reason = EXIT_TAKE_PROFIT
+        elif max_holding > 0 and i - entry_day >= max_holding:
+            reason = EXIT_MAX_HOLDING
+
+        if reason >= 0:
+            exit_idx[n_exits] = i
+            exit_reason[n_exits] = reason
+            n_exits += 1
+            holding = False
+            next_allowed = i + 1 + cooldown
+
+    return n_entries, n_exits
+
+
+_compiled_state_machine = njit(cache=True)(_state_machine) if njit is not None else None
+
+
+def _first(mask, offset):
+    hits = np.flatnonzero(mask)
+    return offset + hits[0] if len(hits) else -1
+
+
+def _event_driven(entries, exits, close, stop_loss, take_profit, cooldown, start, max_holding):
+    """
+    逐笔跳转：每笔交易只做几次向量化查找
+    """
+    n = len(entries)
+    entry_days = np.flatnonzero(entries)
+    exit_days = np.flatnonzero(exits)
+    entry_idx, exit_idx, exit_reason = [], [], []
+
+    i = start
+    while i < n:
+        k = np.searchsorted(entry_days, i)
+        if k == len(entry_days):
+            break
+        entry = entry_days[k]
+        entry_idx.append(entry)
+
+        # 卖出信号、持有到期中较早者为上限，再在区间内找止损/止盈
+        k = np.searchsorted(exit_days, entry + 1)
+        limit, reason = (exit_days[k], EXIT_SIGNAL) if k < len(exit_days) else (n, -1)
+        if max_holding > 0 and entry + max_holding < limit:
+            limit, reason = entry + max_holding, EXIT_MAX_HOLDING
+
+        window = close[entry + 1:min(limit, n - 1) + 1]
+        hit = -1
+        if stop_loss > 0 or take_profit > 0:
+            stop_hit = _first(window <= close[entry] * (1 - stop_loss), entry + 1) if stop_loss > 0 else -1
+            take_hit = _first(window >= close[entry] * (1 + take_profit), entry + 1) if take_profit > 0 else -1
+            hits = [h for h in (stop_hit, take_hit) if h >= 0]
+            if hits:
+                hit = min(hits)
+
+        # 同一天卖出信号优先于止损/止盈，止损/止盈优先于持有到期
+        if hit >= 0 and (hit < limit or (hit == limit and reason == EXIT_MAX_HOLDING)):
+            limit = hit
+            reason = EXIT_STOP_LOSS if hit == stop_hit else EXIT_TAKE_PROFIT
+
+        if limit >= n:
+            break
+        exit_idx.append(limit)
+        exit_reason.append(reason)
+        i = limit + 1 + cooldown
+
+    return (np.array(entry_idx, dtype=np.int64), np.array(exit_idx, dtype=np.int64),
+            np.array(exit_reason, dtype=np.int64))
+
+
+def run_positions(entries, exits, close=None, sizes=None, stop_loss=0.0, take_profit=0.0, cooldown=0,
+                  start=0, max_holding=0):
+    """
+    运行持仓状态机
+
+    entries/exits为每天的买入/卖出条件（布尔数组），close在使用止损/止盈时必须给出，
+    sizes为每天的仓位（标量或数组，默认1.0）；stop_loss/take_profit为比例（0.1即10%），0表示不启用
+    返回 {'entry_idx', 'exit_idx', 'exit_reason', 'sizes'}，最后一笔未平仓时entry_idx比exit_idx多一个
+    """
+    entries = np.asarray(entries, dtype=bool)
+    exits = np.asarray(exits, dtype=bool)
+    n = len(entries)
+    if close is None:
+        if stop_loss or take_profit:
+            raise ValueError("使用止损/止盈时必须提供收盘价")
+        close = np.zeros(n)
+    close = np.asarray(close, dtype=np.float64)
+
+    if _compiled_state_machine is not None:
+        entry_idx = np.empty(n, dtype=np.int64)
+        exit_idx = np.empty(n, dtype=np.int64)
+        exit_reason = np.empty(n, dtype=np.int64)
+        n_entries, n_exits = _compiled_state_machine(entries, exits, close, float(stop_loss), float(take_profit),
+                                                     int(cooldown), int(start), int(max_holding),
+                                                     entry_idx, exit_idx, exit_reason)
+        entry_idx, exit_idx, exit_reason = entry_idx[:n_entries], exit_idx[:n_exits], exit_reason[:n_exits]
+    else:
+        entry_idx, exit_idx, exit_reason = _event_driven(entries, exits, close, float(stop_loss), float(take_profit),
+                                                         int(cooldown), int(start), int(max_holding))
+
+    sizes = np.broadcast_to(np.asarray(1.0 if sizes is None else sizes, dtype=np.float64), (n,))
+    return {
+        'entry_idx': entry_idx,
+        'exit_idx': exit_idx,
+        'exit_reason': exit_reason,
+        'sizes': sizes[entry_idx],
+    }
+
+
+def holding_mask(n, entry_idx, exit_idx):
+    """
+    由买卖日序号得到每天收盘后的持仓状态
+    """
+    change = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(change, entry_idx, 1)
+    np.add.at(change, exit_idx, -1)
+    return np.cumsum(change[:n]) > 0
@@ -0,0 +1,125 @@
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# 本地行情仓库目录：每个代码一个Parquet文件（./data/store/2330.TW.parquet）
+DEFAULT_STORE_DIR = './data/store'
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def normalize_bars(data):
+    """
+    统一行情格式：单层列名、DatetimeIndex、按日期排序去重，只保留OHLCV列
+    """
+    if data is None or len(data) == 0:
+        return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype='float64')
+
+    df = data.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.index)).tz_localize(None)
+    df.index.name = 'Date'
+    df = df[[col for col in BAR_COLUMNS if col in df.columns]]
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df.astype('float64')
+
+
+def yfinance_provider(code, start, end):
+    """
+    默认数据源：通过yfinance下载 [start, end) 区间的复权日线
+    """
+    import yfinance as yf
+
+    data = yf.download(code, start=start, end=end, auto_adjust=True, progress=False)
+    return normalize_bars(data)
+
+
+def store_path(code, store_dir=DEFAULT_STORE_DIR):
+    """
+    返回某个代码在本地仓库中的文件路径
+    """
+    return os.path.join(store_dir, f"{code}.parquet")
+
+
+def read_store(code, store_dir=DEFAULT_STORE_DIR):
+    """
+    读取本地仓库中某个代码的全部日线，不存在时返回空表
+    """
+    path = store_path(code, store_dir)
+    if not os.path.exists(path):
+        return normalize_bars(None)
+    return pd.read_parquet(path)
+
+
+def write_store(code, bars, store_dir=DEFAULT_STORE_DIR):
+    """
+    原子写入：先写临时文件再替换，避免中断时留下半个文件
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    path = store_path(code, store_dir)
+    tmp_path = path + '.tmp'
+    bars.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _has_trading_days(start, end):
+    """
+    判断 [start, end) 之间是否存在工作日（粗略判断是否需要补数据）
+    """
+    if start >= end:
+        return False
+    return len(pd.bdate_range(start, end, inclusive='left')) > 0
+
+
+def _fetch(provider, code, start, end, raise_errors=False):
+    """
+    调用数据源补数据，失败时打印警告并返回空表（离线时仍可使用本地数据）；raise_errors=True时直接抛出
+    """
+    try:
+        return normalize_bars(provider(code, start, end))
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"警告: 从数据源获取{code} {start.date()} 至 {end.date()} 的数据失败: {e}")
+        return normalize_bars(None)
+
+
+def load_bars(code, start=None, end=None, provider=yfinance_provider, store_dir=DEFAULT_STORE_DIR,
+              raise_errors=False):
+    """
+    从本地行情仓库读取 [start, end) 区间的日线
+
+    本地没有覆盖的区间（缺失的开头或最新的尾部）才会通过provider补抓并写回仓库。
+    provider为任意可调用对象 provider(code, start, end) -> DataFrame；
+    传入 provider=None 时只读本地文件，适合离线批处理主机。
+    补数据失败时默认打印警告后继续使用本地数据；raise_errors=True时抛出数据源的异常（本地仓库不变）
+    """
+    end = pd.Timestamp(end if end is not None else datetime.now() + timedelta(days=1)).normalize()
+    start = pd.Timestamp(start).normalize() if start is not None else None
+
+    bars = read_store(code, store_dir)
+
+    if provider is not None:
+        pieces = [bars]
+        if bars.empty:
+            fetch_start = start if start is not None else end - timedelta(days=365 * 20)
+            pieces.append(_fetch(provider, code, fetch_start, end, raise_errors))
+        else:
+            first_date = bars.index[0]
+            last_date = bars.index[-1]
+            if start is not None and _has_trading_days(start, first_date):
+                pieces.append(_fetch(provider, code, start, first_date, raise_errors))
+            tail_start = last_date + timedelta(days=1)
+            if _has_trading_days(tail_start, end):
+                pieces.append(_fetch(provider, code, tail_start, end, raise_errors))
+
+        if len(pieces) > 1 and any(len(piece) for piece in pieces[1:]):
+            bars = normalize_bars(pd.concat([piece for piece in pieces if len(piece)]))
+            write_store(code, bars, store_dir)
+
+    if start is not None:
+        bars = bars[bars.index >= start]
+    return bars[bars.index < end]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from price_store import DEFAULT_STORE_DIR, normalize_bars, read_store, write_store
+
+# 周期代码 -> pandas Period频率（W为周日结束的周，与resample('W')一致）
+PERIOD_FREQS = {'W': 'W-SUN', 'M': 'M', 'Q': 'Q', 'Y': 'Y'}
+
+
+def period_bounds(index, freq):
+    """
+    预先计算周期边界：返回每个周期的起始行号、结束行号（不含）以及周期序号
+    """
+    ordinals = pd.DatetimeIndex(index).to_period(PERIOD_FREQS[freq]).asi8
+    if len(ordinals) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    starts = np.r_[0, np.flatnonzero(np.diff(ordinals)) + 1]
+    ends = np.r_[starts[1:], len(ordinals)]
+    return starts, ends, ordinals[starts]
+
+
+def resample_bars(daily, freq='Q', label='end'):
+    """
+    将日线一次性向量化聚合为周/月/季/年线（Open取首、High取最大、Low取最小、Close取末、Volume求和）
+
+    label='end' 时索引为周期最后一天（等同 resample('QE')），'start' 时为周期第一天
+    """
+    daily = normalize_bars(daily)
+    starts, ends, ordinals = period_bounds(daily.index, freq)
+    if len(starts) == 0:
+        return daily.iloc[:0]
+
+    periods = pd.PeriodIndex.from_ordinals(ordinals, freq=PERIOD_FREQS[freq])
+    index = periods.to_timestamp(how=label).normalize()
+    index.name = 'Date'
+
+    result = {
+        'Open': daily['Open'].values[starts],
+        'High': np.maximum.reduceat(daily['High'].values, starts),
+        'Low': np.minimum.reduceat(daily['Low'].values, starts),
+        'Close': daily['Close'].values[ends - 1],
+    }
+    if 'Volume' in daily.columns:
+        result['Volume'] = np.add.reduceat(daily['Volume'].values, starts)
+    return pd.DataFrame(result, index=index)
+
+
+def load_resampled(code, freq='Q', start=None, end=None, store_dir=DEFAULT_STORE_DIR):
+    """
+    读取价格仓库中日线派生的周期K线，结果保存在日线旁边（如 2330.TW.Q.parquet）
+
+    已保存的周期线只重算最后一个（可能未走完的）周期及之后新增的周期，更早的周期直接复用；
+    日线在开头补入了更早的数据（第一个周期重算后与保存的不同）时全部重建；
+    给出end时，end所在的周期只用end之前的日线重算（同先截取日线再重采样）
+    """
+    daily = read_store(code, store_dir)
+    key = f"{code}.{freq}"
+    derived = read_store(key, store_dir)
+
+    if not derived.empty and not daily.empty:
+        first_period = derived.index[0].to_period(PERIOD_FREQS[freq])
+        head = resample_bars(daily[daily.index <= first_period.end_time], freq)
+        if not head.equals(derived.iloc[:1]):
+            derived = derived.iloc[:0]
+
+    if derived.empty:
+        derived = resample_bars(daily, freq)
+        write_store(key, derived, store_dir)
+    elif not daily.empty:
+        last_period = derived.index[-1].to_period(PERIOD_FREQS[freq])
+        tail = daily[daily.index >= last_period.start_time]
+        updated = resample_bars(tail, freq)
+        if len(updated) and not updated.equals(derived.iloc[-1:]):
+            derived = pd.concat([derived.iloc[:-1], updated])
+            write_store(key, derived, store_dir)
+
+    if end is not None:
+        open_period = pd.Timestamp(end).to_period(PERIOD_FREQS[freq])
+        head = derived[derived.index.to_period(PERIOD_FREQS[freq]) < open_period]
+        tail = daily[(daily.index >= open_period.start_time) & (daily.index < pd.Timestamp(end))]
+        derived = pd.concat([head, resample_bars(tail, freq)]) if len(tail) else head
+    if start is not None:
+        derived = derived[derived.index >= pd.Timestamp(start)]
+    return derived
@@ -0,0 +1,115 @@
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+
+import pandas as pd
+
+# 回测结果的本地缓存（内容寻址，Pickle）
+#
+# 键 = 行情内容（日期索引和各列数值的哈希）+ 策略身份（模块.函数名 + 源代码哈希 + 声明的依赖函数/模块的
+# 源代码哈希 + 额外的version）+ 参数
+# 行情和参数都没变时直接读回上次的结果；行情新增K线、参数、策略或其依赖的代码改动后键不同，自动重新计算，
+# 旧条目不再命中，随后被淘汰。缓存目录超过max_bytes时按最近使用时间（命中时更新文件mtime）淘汰最旧的条目
+# 结果中 'fallback' 为True（可选依赖缺失等原因退回了其它实现）时不写缓存，避免以后命中退回的结果
+
+DEFAULT_CACHE_DIR = './.result_cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _digest(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:16]
+
+
+def data_digest(data):
+    """
+    行情内容的哈希：列名、日期索引和全部数值，任何一根K线变动都会改变
+    """
+    values = pd.util.hash_pandas_object(data, index=True).values
+    return _digest(list(data.columns), hashlib.sha1(values.tobytes()).hexdigest())
+
+
+def _source(obj):
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return obj.__code__.co_code.hex() if hasattr(obj, '__code__') else repr(obj)
+
+
+def strategy_version(function, version='', dependencies=()):
+    """
+    策略版本：函数及dependencies（函数或模块）源代码的哈希（取不到源代码时用字节码），
+    version用于标记源代码之外的依赖变化（如第三方库版本）
+    """
+    return _digest(_source(function), *[_source(dependency) for dependency in dependencies], version)
+
+
+def cache_key(function, data, params, version='', dependencies=()):
+    return _digest(f"{function.__module__}.{function.__qualname__}",
+                   strategy_version(function, version, dependencies), data_digest(data), sorted(params.items()))
+
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    缓存总大小超过max_bytes时，从最久未使用的条目开始删除，返回删除的条目数
+    """
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, '*.pkl')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def cached_result(function, data, *, version='', dependencies=(), refresh=False, cache_dir=DEFAULT_CACHE_DIR,
+                  max_bytes=DEFAULT_MAX_BYTES, **params):
+    """
+    返回 function(data, **params) 的结果，优先读缓存
+
+    只在缓存缺失、行情/参数/策略或dependencies的代码变动或 refresh=True 时调用function；
+    结果为None、标记了fallback或无法序列化时不写缓存
+    """
+    path = os.path.join(cache_dir, cache_key(function, data, params, version, dependencies) + '.pkl')
+    if not refresh and os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)
+            print(f"使用缓存结果: {function.__name__}")
+            return result
+        except Exception as e:
+            print(f"读取缓存失败，重新计算: {e}")
+
+    result = function(data, **params)
+    if result is None or (isinstance(result, dict) and result.get('fallback')):
+        return result
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"写入缓存失败，本次不缓存: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return result
+
+    evict(cache_dir, max_bytes)
+    return result
@@ -0,0 +1,57 @@
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+# 清洗后的选股表缓存目录（Parquet）
+DEFAULT_CACHE_DIR = './.screener_cache'
+
+
+def _digest(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:16]
+
+
+def cache_path(file_path, loader, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    缓存文件路径：<文件+解析函数>_<修改时间+大小>.parquet，Excel改动后自动失效
+    """
+    stat = os.stat(file_path)
+    owner = _digest(os.path.abspath(file_path), loader.__module__, loader.__qualname__)
+    version = _digest(stat.st_mtime_ns, stat.st_size)
+    return os.path.join(cache_dir, f"{owner}_{version}.parquet")
+
+
+def cached_frame(file_path, loader, refresh=False, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    读取选股Excel并缓存清洗后的结果
+
+    loader(file_path) 负责Excel解析和类型转换，只在缓存缺失、文件变动或 refresh=True 时调用；
+    loader返回None（读取失败）时不写缓存。
+    """
+    if not os.path.exists(file_path):
+        return loader(file_path)
+
+    path = cache_path(file_path, loader, cache_dir)
+    if not refresh and os.path.exists(path):
+        print(f"使用缓存数据: {file_path}")
+        return pd.read_parquet(path)
+
+    df = loader(file_path)
+    if df is None:
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    owner = os.path.basename(path).split('_')[0]
+    for stale in glob.glob(os.path.join(cache_dir, f"{owner}_*.parquet")):
+        os.remove(stale)
+
+    tmp_path = path + '.tmp'
+    try:
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"写入缓存失败，本次不缓存: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return df
@@ -0,0 +1,95 @@
+import numpy as np
+
+# 均线交叉信号的向量化内核
+# 与原先 for i in range(200, len(df)) 的逐日循环逐笔一致：
+#   if 买入条件 and not holding: 买入
+#   elif 卖出条件 and holding: 卖出
+# 所有函数都沿最后一个轴（时间轴）计算，一维单只股票和二维 股票数 × 交易日数 都适用
+
+
+def _values(series):
+    return np.asarray(series, dtype=np.float64)
+
+
+def shift(values, periods=1):
+    """
+    沿时间轴后移periods天，前面补NaN
+    """
+    values = _values(values)
+    result = np.full(values.shape, np.nan)
+    if periods < values.shape[-1]:
+        result[..., periods:] = values[..., :values.shape[-1] - periods]
+    return result
+
+
+def cross_above(fast, slow):
+    """
+    黄金交叉：今天 fast > slow 且昨天 fast <= slow（含NaN的比较为False）
+    """
+    fast, slow = _values(fast), _values(slow)
+    return (fast > slow) & (shift(fast) <= shift(slow))
+
+
+def cross_below(fast, slow):
+    """
+    死亡交叉：今天 fast < slow 且昨天 fast >= slow
+    """
+    fast, slow = _values(fast), _values(slow)
+    return (fast < slow) & (shift(fast) >= shift(slow))
+
+
+def resolve_holding(entries, exits, start=200):
+    """
+    不用循环求出每天收盘后的持仓状态
+
+    只有买入条件的日子持仓必为1，只有卖出条件的日子必为0，两者同时满足的日子持仓翻转
+    （未持仓则买入，已持仓则卖出），其余日子保持不变。
+    因此某天的持仓 = 最近一次确定状态 XOR 之后翻转次数的奇偶
+    """
+    entries = np.asarray(entries, dtype=bool).copy()
+    exits = np.asarray(exits, dtype=bool).copy()
+    entries[..., :start] = False
+    exits[..., :start] = False
+
+    toggle = entries & exits
+    definite = entries ^ exits
+
+    n = entries.shape[-1]
+    positions = np.broadcast_to(np.arange(n), entries.shape)
+    last_definite = np.maximum.accumulate(np.where(definite, positions, -1), axis=-1)
+    has_definite = last_definite >= 0
+    last_definite = np.maximum(last_definite, 0)
+
+    definite_value = np.take_along_axis(entries, last_definite, axis=-1) & has_definite
+
+    toggle_count = np.cumsum(toggle, axis=-1)
+    toggles_before = np.where(has_definite, np.take_along_axis(toggle_count, last_definite, axis=-1), 0)
+    flips = (toggle_count - toggles_before) & 1
+
+    return definite_value ^ flips.astype(bool)
+
+
+def signal_masks(entries, exits, start=200):
+    """
+    返回 (买入日掩码, 卖出日掩码, 买入前是否持仓)
+    """
+    holding = resolve_holding(entries, exits, start)
+    was_holding = np.zeros(holding.shape, dtype=bool)
+    was_holding[..., 1:] = holding[..., :-1]
+    return holding & ~was_holding, ~holding & was_holding, was_holding
+
+
+def to_signals(df, mask, column='Close'):
+    """
+    将一维掩码转换为 [(日期, 价格)] 列表
+    """
+    idx = np.flatnonzero(mask)
+    return list(zip(df.index[idx], df[column].values[idx]))
+
+
+def crossover_signals(df, entries, exits, start=200):
+    """
+    由买入条件和卖出条件得到 (buy_signals, sell_signals)
+    """
+    buys, sells, _ = signal_masks(entries, exits, start)
+    return to_signals(df, buys), to_signals(df, sells)
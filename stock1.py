@@ -1,21 +1,6 @@
-import twstock
-import pandas as pd
-# 導入twstock及pandas模組，pandas模組縮寫為pd
+from twstock_updater import update_csv
+# 導入增量更新函式
 
 target_stock = '2891'  #股票代號變數
-stock = twstock.Stock(target_stock)  #告訴twstock我們要查詢的股票
-target_price = stock.fetch_from(2023, 5)  #取用2020/05至今每天的交易資料
-
-name_attribute = [
-    'Date', 'Capacity', 'Turnover', 'Open', 'High', 'Low', 'Close', 'Change',
-    'Transcation'
-]  #幫收集到的資料設定表頭[日期 總成交股數 總成交金額(Volume) 開 高 低 收 漲跌幅 成交量]
-
-df = pd.DataFrame(columns=name_attribute, data=target_price)
-#將twstock抓到的清單轉成Data Frame格式的資料表
-
-filename = f'./data/{target_stock}.csv'
-#指定Data Frame轉存csv檔案的檔名與路徑
-
-df.to_csv(filename)
-#將Data Frame轉存為csv檔案
\ No newline at end of file
+update_csv(target_stock)
+#只抓./data/<代號>.csv最後日期之後的交易資料並附加到檔案中，沒有舊檔案時從2023/05開始抓
\ No newline at end of file
@@ -1,7 +1,8 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+from data_provider import fetch_bars
+from signal_kernel import cross_above, cross_below, crossover_signals
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Microsoft JhengHei', 'SimHei']
@@ -31,37 +32,12 @@ def calculate_ma_signals(stock_data):
     df['MA60'] = df['Close'].rolling(window=60).mean()
     df['MA200'] = df['Close'].rolling(window=200).mean()
 
-    # 初始化持仓状态和信号列表
-    holding = False
-    buy_signals = []
-    sell_signals = []
-
-    # 找出买卖信号
-    for i in range(200, len(df)):
-        # 使用.iloc确保获取标量值
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-
-        # 前一天的MA值
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        # 计算黄金交叉和死亡交叉
-        golden_cross_20_60 = (ma20 > ma60) and (ma20_prev <= ma60_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        # 买入条件：20MA与60MA黄金交叉且在200MA之上且未持仓
-        if golden_cross_20_60 and close_price > ma200 and not holding:
-            buy_signals.append((date, close_price))
-            holding = True
-
-        # 卖出条件：20MA与60MA死亡交叉且已持仓
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
+    # 买入条件：20MA与60MA黄金交叉且在200MA之上且未持仓
+    # 卖出条件：20MA与60MA死亡交叉且已持仓
+    golden_cross_20_60 = cross_above(df['MA20'], df['MA60'])
+    death_cross_20_60 = cross_below(df['MA20'], df['MA60'])
+    buy_signals, sell_signals = crossover_signals(
+        df, golden_cross_20_60 & (df['Close'].values > df['MA200'].values), death_cross_20_60)
 
     return df, buy_signals, sell_signals
 
@@ -106,9 +82,11 @@ def plot_stock_chart(stock_data, buy_signals, sell_signals, stack_code):
     plt.show()
 
 
-def main():
+def main(provider=None):
     """
     主函数
+
+    provider: 行情数据源，None时使用本地价格仓库；传入ReplayProvider/SyntheticProvider可离线回测
     """
     stack_code = "2330.TW"
     # 设置时间范围（近10年）
@@ -120,7 +98,7 @@ def main():
 
     try:
         # 获取台积电股价数据（台股代码：2330.TW）
-        stock = yf.download(stack_code, start=start_date, end=end_date, auto_adjust=True)
+        stock = fetch_bars(stack_code, start_date, end_date, provider)
 
         if stock.empty:
             print("无法获取数据，请检查网络连接或股票代码")
@@ -1,8 +1,11 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import numpy as np
+from data_provider import fetch_bars
+from indicators import calculate_technical_indicators
+from signal_kernel import cross_above, cross_below, shift, signal_masks, to_signals
+from trade_ledger import build_ledger, ledger_stats, print_ledger
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Microsoft JhengHei', 'SimHei']
@@ -20,61 +23,6 @@ def fix_dataframe_columns(stock_data):
     return stock_data
 
 
-def calculate_macd(data, fast_period=12, slow_period=26, signal_period=9):
-    """
-    计算MACD指标
-    """
-    # 计算快慢EMA
-    fast_ema = data['Close'].ewm(span=fast_period, adjust=False).mean()
-    slow_ema = data['Close'].ewm(span=slow_period, adjust=False).mean()
-
-    # 计算MACD线和信号线
-    macd_line = fast_ema - slow_ema
-    signal_line = macd_line.ewm(span=signal_period, adjust=False).mean()
-    macd_histogram = macd_line - signal_line
-
-    return macd_line, signal_line, macd_histogram
-
-
-def calculate_rsi(data, period=14):
-    """
-    计算RSI指标
-    """
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-
-    return rsi
-
-
-def calculate_technical_indicators(stock_data):
-    """
-    计算所有技术指标
-    """
-    # 修复列名问题
-    df = fix_dataframe_columns(stock_data.copy())
-
-    # 计算移动平均线
-    df['MA5'] = df['Close'].rolling(window=5).mean()
-    df['MA20'] = df['Close'].rolling(window=20).mean()
-    df['MA60'] = df['Close'].rolling(window=60).mean()
-    df['MA200'] = df['Close'].rolling(window=200).mean()
-
-    # 计算MACD
-    df['MACD'], df['MACD_Signal'], df['MACD_Histogram'] = calculate_macd(df)
-
-    # 计算RSI
-    df['RSI'] = calculate_rsi(df)
-
-    # 计算成交量均线（用于成交量确认）
-    df['Volume_MA20'] = df['Volume'].rolling(window=20).mean()
-
-    return df
-
-
 def optimized_ma_signals(stock_data):
     """
     优化后的移动平均线信号，使用改进的MACD和RSI过滤条件
@@ -82,105 +30,79 @@ def optimized_ma_signals(stock_data):
     # 计算技术指标
     df = calculate_technical_indicators(stock_data)
 
-    # 初始化持仓状态和信号列表
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    signal_details = []  # 存储信号详情用于分析
-
-    # 找出买卖信号
-    for i in range(200, len(df)):
-        # 使用.iloc确保获取标量值
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        macd = df['MACD'].iloc[i]
-        macd_signal = df['MACD_Signal'].iloc[i]
-        macd_histogram = df['MACD_Histogram'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        volume = df['Volume'].iloc[i]
-        volume_ma20 = df['Volume_MA20'].iloc[i]
-
-        # 前一天的MA值
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        # 计算黄金交叉和死亡交叉
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        # ========== 优化后的过滤条件 ==========
-
-        # 1. MACD条件优化：更宽松但有效的条件
-        # - MACD在零轴上方或刚刚金叉
-        # - 或者MACD柱状图正在改善（当前值大于前一天）
-        macd_prev = df['MACD'].iloc[i - 1] if i > 0 else 0
-        macd_signal_prev = df['MACD_Signal'].iloc[i - 1] if i > 0 else 0
-        macd_histogram_prev = df['MACD_Histogram'].iloc[i - 1] if i > 0 else 0
-
-        macd_golden_cross = (macd > macd_signal) and (macd_prev <= macd_signal_prev)
-        macd_improving = macd_histogram > macd_histogram_prev
-
-        # 优化后的MACD条件：允许在零轴附近且趋势向上
-        macd_optimized = (macd > -0.5) and (macd_improving or macd_golden_cross or macd > 0)
-
-        # 2. RSI条件优化：动态调整阈值
-        # - 在强势市场中允许更高的RSI
-        # - 考虑价格相对200MA的位置来调整RSI阈值
-        price_vs_200ma = (close_price - ma200) / ma200 * 100
-
-        if price_vs_200ma > 20:  # 远高于200MA，强势市场
-            rsi_min, rsi_max = 40, 80  # 允许更高的RSI
-        elif price_vs_200ma > 10:  # 中等强势
-            rsi_min, rsi_max = 35, 78
-        elif price_vs_200ma > -5:  # 正常范围
-            rsi_min, rsi_max = 30, 75
-        else:  # 弱势市场
-            rsi_min, rsi_max = 25, 70
-
-        rsi_optimized = (rsi > rsi_min) and (rsi < rsi_max)
-
-        # 3. 成交量确认：突破时成交量放大
-        volume_confirm = volume > volume_ma20 * 0.8  # 成交量不低于均线的80%
-
-        # 买入条件：5MA与20MA黄金交叉且在200MA之上 + 优化后的过滤条件 + 未持仓
-        if (golden_cross_5_20 and close_price > ma200 and
-                macd_optimized and rsi_optimized and volume_confirm and not holding):
-
-            buy_signals.append((date, close_price))
-            holding = True
-
-            # 记录信号详情
+    close_price = df['Close'].values
+    ma200 = df['MA200'].values
+    macd = df['MACD'].values
+    macd_signal = df['MACD_Signal'].values
+    rsi = df['RSI'].values
+    volume = df['Volume'].values
+    volume_ma20 = df['Volume_MA20'].values
+
+    # 计算黄金交叉和死亡交叉
+    golden_cross_5_20 = cross_above(df['MA5'], df['MA20'])
+    death_cross_20_60 = cross_below(df['MA20'], df['MA60'])
+
+    # ========== 优化后的过滤条件 ==========
+
+    # 1. MACD条件优化：更宽松但有效的条件
+    # - MACD在零轴上方或刚刚金叉
+    # - 或者MACD柱状图正在改善（当前值大于前一天）
+    macd_golden_cross = cross_above(macd, macd_signal)
+    macd_histogram = df['MACD_Histogram'].values
+    macd_improving = macd_histogram > shift(macd_histogram)
+
+    # 优化后的MACD条件：允许在零轴附近且趋势向上
+    macd_optimized = (macd > -0.5) & (macd_improving | macd_golden_cross | (macd > 0))
+
+    # 2. RSI条件优化：动态调整阈值
+    # - 在强势市场中允许更高的RSI
+    # - 考虑价格相对200MA的位置来调整RSI阈值
+    price_vs_200ma = (close_price - ma200) / ma200 * 100
+
+    regimes = [
+        price_vs_200ma > 20,  # 远高于200MA，强势市场，允许更高的RSI
+        price_vs_200ma > 10,  # 中等强势
+        price_vs_200ma > -5,  # 正常范围
+    ]
+    rsi_min = np.select(regimes, [40, 35, 30], default=25)  # 弱势市场
+    rsi_max = np.select(regimes, [80, 78, 75], default=70)
+
+    rsi_optimized = (rsi > rsi_min) & (rsi < rsi_max)
+
+    # 3. 成交量确认：突破时成交量放大
+    volume_confirm = volume > volume_ma20 * 0.8  # 成交量不低于均线的80%
+
+    # 买入条件：5MA与20MA黄金交叉且在200MA之上 + 优化后的过滤条件 + 未持仓
+    # 卖出条件：20MA与60MA死亡交叉且已持仓
+    buys, sells, _ = signal_masks(
+        golden_cross_5_20 & (close_price > ma200) & macd_optimized & rsi_optimized & volume_confirm,
+        death_cross_20_60)
+    buy_signals, sell_signals = to_signals(df, buys), to_signals(df, sells)
+
+    # 记录信号详情（只遍历发生交易的日子）
+    signal_details = []
+    for i in np.flatnonzero(buys | sells):
+        if buys[i]:
             signal_details.append({
-                'date': date,
+                'date': df.index[i],
                 'type': 'BUY',
-                'price': close_price,
-                'ma5': ma5,
-                'ma20': ma20,
-                'ma200': ma200,
-                'macd': macd,
-                'macd_signal': macd_signal,
-                'rsi': rsi,
-                'volume_ratio': volume / volume_ma20,
-                'price_vs_200ma': price_vs_200ma
+                'price': close_price[i],
+                'ma5': df['MA5'].values[i],
+                'ma20': df['MA20'].values[i],
+                'ma200': ma200[i],
+                'macd': macd[i],
+                'macd_signal': macd_signal[i],
+                'rsi': rsi[i],
+                'volume_ratio': volume[i] / volume_ma20[i],
+                'price_vs_200ma': price_vs_200ma[i]
             })
-
-        # 卖出条件：20MA与60MA死亡交叉且已持仓
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-            # 记录信号详情
+        else:
             signal_details.append({
-                'date': date,
+                'date': df.index[i],
                 'type': 'SELL',
-                'price': close_price,
-                'ma20': ma20,
-                'ma60': ma60
+                'price': close_price[i],
+                'ma20': df['MA20'].values[i],
+                'ma60': df['MA60'].values[i]
             })
 
     return df, buy_signals, sell_signals, signal_details
@@ -194,113 +116,36 @@ def backtest_analysis(buy_signals, sell_signals, signal_details=None):
     print("回测统计分析")
     print("=" * 50)
 
-    # 确保买卖信号数量匹配
-    min_signals = min(len(buy_signals), len(sell_signals))
-    buy_signals = buy_signals[:min_signals]
-    sell_signals = sell_signals[:min_signals]
+    # 按买卖信号配对建账（多出的买入信号忽略）
+    trades = build_ledger(buy_signals, sell_signals)
 
-    if min_signals == 0:
+    if len(trades) == 0:
         print("没有完整的交易对进行回测分析")
         return
 
-    # 计算每笔交易的收益率
-    trades = []
-    total_return = 1.0
-    cumulative_returns = []
-
-    for i in range(min_signals):
-        buy_date, buy_price = buy_signals[i]
-        sell_date, sell_price = sell_signals[i]
-
-        # 计算持有期和收益率
-        holding_days = (sell_date - buy_date).days
-        return_rate = (sell_price - buy_price) / buy_price * 100
-        profit = sell_price - buy_price
-
-        trade_info = {
-            '序号': i + 1,
-            '买入日期': buy_date.strftime('%Y-%m-%d'),
-            '买入价格': buy_price,
-            '卖出日期': sell_date.strftime('%Y-%m-%d'),
-            '卖出价格': sell_price,
-            '持有天数': holding_days,
-            '收益率%': return_rate,
-            '盈亏金额': profit
-        }
-        trades.append(trade_info)
-
-        # 计算累计收益率
-        total_return *= (1 + return_rate / 100)
-        cumulative_returns.append((total_return - 1) * 100)
-
-    # 计算统计指标
-    returns = [trade['收益率%'] for trade in trades]
-    profits = [trade['盈亏金额'] for trade in trades]
-    holding_periods = [trade['持有天数'] for trade in trades]
-
-    # 基本统计
-    total_trades = len(trades)
-    winning_trades = len([r for r in returns if r > 0])
-    losing_trades = len([r for r in returns if r < 0])
-    win_rate = winning_trades / total_trades * 100
-
-    avg_return = np.mean(returns)
-    max_return = np.max(returns)
-    min_return = np.min(returns)
-
-    total_profit = sum(profits)
-    avg_profit = np.mean(profits)
-
-    avg_holding_days = np.mean(holding_periods)
-
-    # 年化收益率（假设平均每年有250个交易日）
-    first_buy_date = datetime.strptime(trades[0]['买入日期'], '%Y-%m-%d')
-    last_sell_date = datetime.strptime(trades[-1]['卖出日期'], '%Y-%m-%d')
-    total_days = (last_sell_date - first_buy_date).days
-    total_years = total_days / 365.25
-
-    annualized_return = (total_return ** (1 / total_years) - 1) * 100 if total_years > 0 else 0
-
-    # 最大回撤计算
-    equity_curve = [1.0]  # 初始资金为1
-    for ret in returns:
-        equity_curve.append(equity_curve[-1] * (1 + ret / 100))
-
-    running_max = np.maximum.accumulate(equity_curve)
-    drawdowns = (equity_curve - running_max) / running_max * 100
-    max_drawdown = np.min(drawdowns)
+    stats = ledger_stats(trades)
+    cumulative_returns = stats['cumulative_returns'].tolist()
 
     # 打印详细交易记录
-    print(f"\n详细交易记录 (共{total_trades}笔交易):")
-    print("-" * 120)
-    print(
-        f"{'序号':<4} {'买入日期':<12} {'买入价':<8} {'卖出日期':<12} {'卖出价':<8} {'持有天数':<8} {'收益率%':<10} {'盈亏金额':<10}")
-    print("-" * 120)
-
-    for trade in trades:
-        color = '\033[92m' if trade['收益率%'] > 0 else '\033[91m'  # 绿色表示盈利，红色表示亏损
-        reset = '\033[0m'
-        print(f"{trade['序号']:<4} {trade['买入日期']:<12} {trade['买入价格']:<8.2f} "
-              f"{trade['卖出日期']:<12} {trade['卖出价格']:<8.2f} {trade['持有天数']:<8} "
-              f"{color}{trade['收益率%']:<10.2f}{reset} {color}{trade['盈亏金额']:<10.2f}{reset}")
+    print_ledger(trades)
 
     # 打印统计摘要
     print("\n" + "=" * 50)
     print("回测统计摘要")
     print("=" * 50)
-    print(f"总交易次数: {total_trades}")
-    print(f"盈利交易: {winning_trades}次")
-    print(f"亏损交易: {losing_trades}次")
-    print(f"胜率: {win_rate:.2f}%")
-    print(f"平均持有天数: {avg_holding_days:.1f}天")
-    print(f"单次交易平均收益率: {avg_return:.2f}%")
-    print(f"最佳单次收益率: {max_return:.2f}%")
-    print(f"最差单次收益率: {min_return:.2f}%")
-    print(f"累计总收益率: {(total_return - 1) * 100:.2f}%")
-    print(f"年化收益率: {annualized_return:.2f}%")
-    print(f"总盈亏金额: {total_profit:.2f} TWD")
-    print(f"平均每笔盈亏: {avg_profit:.2f} TWD")
-    print(f"最大回撤: {max_drawdown:.2f}%")
+    print(f"总交易次数: {stats['total_trades']}")
+    print(f"盈利交易: {stats['winning_trades']}次")
+    print(f"亏损交易: {stats['losing_trades']}次")
+    print(f"胜率: {stats['win_rate']:.2f}%")
+    print(f"平均持有天数: {stats['avg_holding_days']:.1f}天")
+    print(f"单次交易平均收益率: {stats['avg_return']:.2f}%")
+    print(f"最佳单次收益率: {stats['max_return']:.2f}%")
+    print(f"最差单次收益率: {stats['min_return']:.2f}%")
+    print(f"累计总收益率: {stats['total_return']:.2f}%")
+    print(f"年化收益率: {stats['annualized_return']:.2f}%")
+    print(f"总盈亏金额: {stats['total_profit']:.2f} TWD")
+    print(f"平均每笔盈亏: {stats['avg_profit']:.2f} TWD")
+    print(f"最大回撤: {stats['max_drawdown']:.2f}%")
 
     # 打印过滤条件效果
     if signal_details:
@@ -448,9 +293,11 @@ def plot_technical_analysis(stock_data, buy_signals, sell_signals, stack_code, c
     plt.show()
 
 
-def main():
+def main(provider=None):
     """
     主函数
+
+    provider: 行情数据源，None时使用本地价格仓库；传入ReplayProvider/SyntheticProvider可离线回测
     """
     stack_code = "2330.TW"
     # 设置时间范围（近10年）
@@ -462,7 +309,7 @@ def main():
 
     try:
         # 获取台积电股价数据（台股代码：2330.TW）
-        stock = yf.download(stack_code, start=start_date, end=end_date, auto_adjust=True)
+        stock = fetch_bars(stack_code, start_date, end_date, provider)
 
         if stock.empty:
             print("无法获取数据，请检查网络连接或股票代码")
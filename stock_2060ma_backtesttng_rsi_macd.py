@@ -1,8 +1,11 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import numpy as np
+from data_provider import fetch_bars
+from indicators import calculate_technical_indicators
+from signal_kernel import cross_above, cross_below, crossover_signals
+from trade_ledger import build_ledger, ledger_stats, print_ledger
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Microsoft JhengHei', 'SimHei']
@@ -20,58 +23,6 @@ def fix_dataframe_columns(stock_data):
     return stock_data
 
 
-def calculate_macd(data, fast_period=12, slow_period=26, signal_period=9):
-    """
-    计算MACD指标
-    """
-    # 计算快慢EMA
-    fast_ema = data['Close'].ewm(span=fast_period, adjust=False).mean()
-    slow_ema = data['Close'].ewm(span=slow_period, adjust=False).mean()
-
-    # 计算MACD线和信号线
-    macd_line = fast_ema - slow_ema
-    signal_line = macd_line.ewm(span=signal_period, adjust=False).mean()
-    macd_histogram = macd_line - signal_line
-
-    return macd_line, signal_line, macd_histogram
-
-
-def calculate_rsi(data, period=14):
-    """
-    计算RSI指标
-    """
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-
-    return rsi
-
-
-def calculate_technical_indicators(stock_data):
-    """
-    计算所有技术指标
-    """
-    # 修复列名问题
-    df = fix_dataframe_columns(stock_data.copy())
-
-    # 计算移动平均线
-    df['MA5'] = df['Close'].rolling(window=5).mean()
-    df['MA20'] = df['Close'].rolling(window=20).mean()
-    df['MA60'] = df['Close'].rolling(window=60).mean()
-    df['MA200'] = df['Close'].rolling(window=200).mean()
-
-    # 计算MACD
-    df['MACD'], df['MACD_Signal'], df['MACD_Histogram'] = calculate_macd(df)
-
-    # 计算RSI
-    df['RSI'] = calculate_rsi(df)
-
-    return df
-
-
 def calculate_ma_signals(stock_data):
     """
     计算移动平均线和买卖信号 5MA,20MA黃金交叉 60MA,20MA死亡交叉
@@ -80,49 +31,25 @@ def calculate_ma_signals(stock_data):
     # 计算技术指标
     df = calculate_technical_indicators(stock_data)
 
-    # 初始化持仓状态和信号列表
-    holding = False
-    buy_signals = []
-    sell_signals = []
-
-    # 找出买卖信号
-    for i in range(200, len(df)):
-        # 使用.iloc确保获取标量值
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        macd = df['MACD'].iloc[i]
-        macd_signal = df['MACD_Signal'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-
-        # 前一天的MA值
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        # 计算黄金交叉和死亡交叉
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        # MACD条件：MACD在信号线之上或刚刚金叉
-        macd_bullish = (macd > macd_signal) or (macd > 0 and macd_signal > 0)
-
-        # RSI条件：RSI在合理区间（30-70），避免超买超卖
-        rsi_ok = (rsi > 30) and (rsi < 70)
-
-        # 买入条件：5MA与20MA黄金交叉且在200MA之上 + MACD和RSI过滤 + 未持仓
-        if (golden_cross_5_20 and close_price > ma200 and
-                macd_bullish and rsi_ok and not holding):
-            buy_signals.append((date, close_price))
-            holding = True
-
-        # 卖出条件：20MA与60MA死亡交叉且已持仓
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
+    close = df['Close'].values
+    macd = df['MACD'].values
+    macd_signal = df['MACD_Signal'].values
+    rsi = df['RSI'].values
+
+    # 计算黄金交叉和死亡交叉
+    golden_cross_5_20 = cross_above(df['MA5'], df['MA20'])
+    death_cross_20_60 = cross_below(df['MA20'], df['MA60'])
+
+    # MACD条件：MACD在信号线之上或刚刚金叉
+    macd_bullish = (macd > macd_signal) | ((macd > 0) & (macd_signal > 0))
+
+    # RSI条件：RSI在合理区间（30-70），避免超买超卖
+    rsi_ok = (rsi > 30) & (rsi < 70)
+
+    # 买入条件：5MA与20MA黄金交叉且在200MA之上 + MACD和RSI过滤 + 未持仓
+    # 卖出条件：20MA与60MA死亡交叉且已持仓
+    buy_signals, sell_signals = crossover_signals(
+        df, golden_cross_5_20 & (close > df['MA200'].values) & macd_bullish & rsi_ok, death_cross_20_60)
 
     return df, buy_signals, sell_signals
 
@@ -135,113 +62,36 @@ def backtest_analysis(buy_signals, sell_signals):
     print("回测统计分析")
     print("=" * 50)
 
-    # 确保买卖信号数量匹配
-    min_signals = min(len(buy_signals), len(sell_signals))
-    buy_signals = buy_signals[:min_signals]
-    sell_signals = sell_signals[:min_signals]
+    # 按买卖信号配对建账（多出的买入信号忽略）
+    trades = build_ledger(buy_signals, sell_signals)
 
-    if min_signals == 0:
+    if len(trades) == 0:
         print("没有完整的交易对进行回测分析")
         return
 
-    # 计算每笔交易的收益率
-    trades = []
-    total_return = 1.0
-    cumulative_returns = []
-
-    for i in range(min_signals):
-        buy_date, buy_price = buy_signals[i]
-        sell_date, sell_price = sell_signals[i]
-
-        # 计算持有期和收益率
-        holding_days = (sell_date - buy_date).days
-        return_rate = (sell_price - buy_price) / buy_price * 100
-        profit = sell_price - buy_price
-
-        trade_info = {
-            '序号': i + 1,
-            '买入日期': buy_date.strftime('%Y-%m-%d'),
-            '买入价格': buy_price,
-            '卖出日期': sell_date.strftime('%Y-%m-%d'),
-            '卖出价格': sell_price,
-            '持有天数': holding_days,
-            '收益率%': return_rate,
-            '盈亏金额': profit
-        }
-        trades.append(trade_info)
-
-        # 计算累计收益率
-        total_return *= (1 + return_rate / 100)
-        cumulative_returns.append((total_return - 1) * 100)
-
-    # 计算统计指标
-    returns = [trade['收益率%'] for trade in trades]
-    profits = [trade['盈亏金额'] for trade in trades]
-    holding_periods = [trade['持有天数'] for trade in trades]
-
-    # 基本统计
-    total_trades = len(trades)
-    winning_trades = len([r for r in returns if r > 0])
-    losing_trades = len([r for r in returns if r < 0])
-    win_rate = winning_trades / total_trades * 100
-
-    avg_return = np.mean(returns)
-    max_return = np.max(returns)
-    min_return = np.min(returns)
-
-    total_profit = sum(profits)
-    avg_profit = np.mean(profits)
-
-    avg_holding_days = np.mean(holding_periods)
-
-    # 年化收益率（假设平均每年有250个交易日）
-    first_buy_date = datetime.strptime(trades[0]['买入日期'], '%Y-%m-%d')
-    last_sell_date = datetime.strptime(trades[-1]['卖出日期'], '%Y-%m-%d')
-    total_days = (last_sell_date - first_buy_date).days
-    total_years = total_days / 365.25
-
-    annualized_return = (total_return ** (1 / total_years) - 1) * 100 if total_years > 0 else 0
-
-    # 最大回撤计算
-    equity_curve = [1.0]  # 初始资金为1
-    for ret in returns:
-        equity_curve.append(equity_curve[-1] * (1 + ret / 100))
-
-    running_max = np.maximum.accumulate(equity_curve)
-    drawdowns = (equity_curve - running_max) / running_max * 100
-    max_drawdown = np.min(drawdowns)
+    stats = ledger_stats(trades)
+    cumulative_returns = stats['cumulative_returns'].tolist()
 
     # 打印详细交易记录
-    print(f"\n详细交易记录 (共{total_trades}笔交易):")
-    print("-" * 120)
-    print(
-        f"{'序号':<4} {'买入日期':<12} {'买入价':<8} {'卖出日期':<12} {'卖出价':<8} {'持有天数':<8} {'收益率%':<10} {'盈亏金额':<10}")
-    print("-" * 120)
-
-    for trade in trades:
-        color = '\033[92m' if trade['收益率%'] > 0 else '\033[91m'  # 绿色表示盈利，红色表示亏损
-        reset = '\033[0m'
-        print(f"{trade['序号']:<4} {trade['买入日期']:<12} {trade['买入价格']:<8.2f} "
-              f"{trade['卖出日期']:<12} {trade['卖出价格']:<8.2f} {trade['持有天数']:<8} "
-              f"{color}{trade['收益率%']:<10.2f}{reset} {color}{trade['盈亏金额']:<10.2f}{reset}")
+    print_ledger(trades)
 
     # 打印统计摘要
     print("\n" + "=" * 50)
     print("回测统计摘要")
     print("=" * 50)
-    print(f"总交易次数: {total_trades}")
-    print(f"盈利交易: {winning_trades}次")
-    print(f"亏损交易: {losing_trades}次")
-    print(f"胜率: {win_rate:.2f}%")
-    print(f"平均持有天数: {avg_holding_days:.1f}天")
-    print(f"单次交易平均收益率: {avg_return:.2f}%")
-    print(f"最佳单次收益率: {max_return:.2f}%")
-    print(f"最差单次收益率: {min_return:.2f}%")
-    print(f"累计总收益率: {(total_return - 1) * 100:.2f}%")
-    print(f"年化收益率: {annualized_return:.2f}%")
-    print(f"总盈亏金额: {total_profit:.2f} TWD")
-    print(f"平均每笔盈亏: {avg_profit:.2f} TWD")
-    print(f"最大回撤: {max_drawdown:.2f}%")
+    print(f"总交易次数: {stats['total_trades']}")
+    print(f"盈利交易: {stats['winning_trades']}次")
+    print(f"亏损交易: {stats['losing_trades']}次")
+    print(f"胜率: {stats['win_rate']:.2f}%")
+    print(f"平均持有天数: {stats['avg_holding_days']:.1f}天")
+    print(f"单次交易平均收益率: {stats['avg_return']:.2f}%")
+    print(f"最佳单次收益率: {stats['max_return']:.2f}%")
+    print(f"最差单次收益率: {stats['min_return']:.2f}%")
+    print(f"累计总收益率: {stats['total_return']:.2f}%")
+    print(f"年化收益率: {stats['annualized_return']:.2f}%")
+    print(f"总盈亏金额: {stats['total_profit']:.2f} TWD")
+    print(f"平均每笔盈亏: {stats['avg_profit']:.2f} TWD")
+    print(f"最大回撤: {stats['max_drawdown']:.2f}%")
 
     return trades, cumulative_returns
 
@@ -355,9 +205,11 @@ def plot_technical_analysis(stock_data, buy_signals, sell_signals, stack_code, c
     plt.show()
 
 
-def main():
+def main(provider=None):
     """
     主函数
+
+    provider: 行情数据源，None时使用本地价格仓库；传入ReplayProvider/SyntheticProvider可离线回测
     """
     stack_code = "2330.TW"
     # 设置时间范围（近10年）
@@ -369,7 +221,7 @@ def main():
 
     try:
         # 获取台积电股价数据（台股代码：2330.TW）
-        stock = yf.download(stack_code, start=start_date, end=end_date, auto_adjust=True)
+        stock = fetch_bars(stack_code, start_date, end_date, provider)
 
         if stock.empty:
             print("无法获取数据，请检查网络连接或股票代码")
@@ -1,9 +1,11 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import warnings
 import numpy as np
+from data_provider import fetch_bars
+import metrics
+from portfolio_engine import dated_records, run_portfolio, trade_records
 
 # 过滤掉无害的警告
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -23,70 +25,29 @@ def backtest_strategy(data, initial_capital=1000000, transaction_cost=0.0015):
     """
     回测移动平均线交叉策略
     """
-    # 初始化变量
-    cash = initial_capital
-    shares = 0
-    trades = []
-    portfolio_values = []
-    buy_hold_values = []  # 买入持有策略的对比
-
-    # 买入持有策略的初始状态
-    bh_shares = initial_capital / data.iloc[0]['Close']  # 第一天就全仓买入
-    bh_value = bh_shares * data.iloc[0]['Close']
-
-    # 遍历每一天
-    for i, (date, row) in enumerate(data.iterrows()):
-        current_price = row['Close']
-        signal = row['Cross']
-
-        # 计算当前投资组合价值
-        current_value = cash + shares * current_price
-        portfolio_values.append(current_value)
-
-        # 计算买入持有策略的价值
-        bh_value = bh_shares * current_price
-        buy_hold_values.append(bh_value)
-
-        # 黄金交叉信号 - 买入
-        if signal == 1 and cash > 0:
-            # 计算可买入的股数（考虑交易成本）
-            available_cash = cash * (1 - transaction_cost)
-            shares_to_buy = available_cash // current_price
-
-            if shares_to_buy > 0:
-                # 执行买入
-                cost = shares_to_buy * current_price
-                cash -= cost * (1 + transaction_cost)  # 扣除交易成本
-                shares += shares_to_buy
-
-                trades.append({
-                    'date': date,
-                    'action': 'BUY',
-                    'price': current_price,
-                    'shares': shares_to_buy,
-                    'value': cost,
-                    'portfolio_value': current_value
-                })
-
-        # 死亡交叉信号 - 卖出
-        elif signal == -1 and shares > 0:
-            # 执行卖出
-            proceeds = shares * current_price
-            cash += proceeds * (1 - transaction_cost)  # 扣除交易成本
-
-            trades.append({
-                'date': date,
-                'action': 'SELL',
-                'price': current_price,
-                'shares': shares,
-                'value': proceeds,
-                'portfolio_value': cash + proceeds
-            })
-
-            shares = 0
+    close = data['Close'].values
+
+    # 黄金交叉信号买入（有现金即可加仓），死亡交叉信号卖出全部持股
+    # 资产按当天交易前计算
+    result = run_portfolio(close, data['Cross'].values == 1, data['Cross'].values == -1,
+                           initial_cash=initial_capital, commission=transaction_cost,
+                           sizing='net', pyramiding=True, mark='pre')
+
+    # 买入记录的组合价值为当天交易前的资产，卖出记录为卖出后的现金加成交金额
+    trades = result['trades']
+    portfolio_value = np.where(trades['action'] == 'BUY', result['equity'][trades['index']],
+                               trades['cash'] + trades['amount'])
+    trades = trade_records(data.index[trades['index']], trades['action'], trades['price'], trades['shares'],
+                           trades['amount'], portfolio_value)
+
+    portfolio_values = list(result['equity'])
+
+    # 买入持有策略：第一天就全仓买入
+    bh_shares = initial_capital / close[0]
+    buy_hold_values = list(bh_shares * close)
 
     # 回测结束，计算最终价值
-    final_value = cash + shares * data.iloc[-1]['Close']
+    final_value = result['final_value']
 
     # 计算回测指标
     total_return = (final_value - initial_capital) / initial_capital * 100
@@ -95,22 +56,14 @@ def backtest_strategy(data, initial_capital=1000000, transaction_cost=0.0015):
 
     # 计算年化回报率
     years = len(data) / 252  # 假设一年有252个交易日
-    annual_return = (final_value / initial_capital) ** (1 / years) - 1 if years > 0 else 0
-    annual_return_pct = annual_return * 100
+    annual_return_pct = metrics.cagr(final_value / initial_capital, years)
 
-    bh_annual_return = (bh_final_value / initial_capital) ** (1 / years) - 1 if years > 0 else 0
-    bh_annual_return_pct = bh_annual_return * 100
+    bh_annual_return_pct = metrics.cagr(bh_final_value / initial_capital, years)
 
     # 计算最大回撤
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
-    bh_series = pd.Series(buy_hold_values, index=data.index)
-    bh_rolling_max = bh_series.expanding().max()
-    bh_drawdowns = (bh_series - bh_rolling_max) / bh_rolling_max * 100
-    bh_max_drawdown = bh_drawdowns.min()
+    bh_max_drawdown = metrics.max_drawdown(buy_hold_values)
 
     return {
         'initial_capital': initial_capital,
@@ -119,7 +72,7 @@ def backtest_strategy(data, initial_capital=1000000, transaction_cost=0.0015):
         'annual_return': annual_return_pct,
         'max_drawdown': max_drawdown,
         'trades': trades,
-        'num_trades': len([t for t in trades if t['action'] == 'BUY']),
+        'num_trades': int((trades['action'] == 'BUY').sum()),
         'portfolio_values': portfolio_values,
         'buy_hold_final': bh_final_value,
         'buy_hold_return': bh_total_return,
@@ -137,81 +90,33 @@ def backtest_phased_strategy(data, total_investment=1000000, phases=10, transact
     # 计算每期投入金额
     phase_amount = total_investment / phases
 
-    # 初始化变量
-    cash = 0  # 开始时没有现金，每期投入
-    shares = 0
-    trades = []
-    portfolio_values = []
-    phases_executed = 0
-    next_phase_date = data.index[0]  # 从第一天开始第一期投入
-
-    # 计算投入间隔（按交易日计算）
+    # 投入日：从第一天开始每隔 总天数//期数 个交易日投入一期，最晚在最后一个交易日
     total_days = len(data)
-    days_between_phases = total_days // phases
-
-    # 遍历每一天
-    for i, (date, row) in enumerate(data.iterrows()):
-        current_price = row['Close']
-
-        # 执行分期投入
-        if date >= next_phase_date and phases_executed < phases:
-            # 投入一期资金
-            cash += phase_amount
-            phases_executed += 1
-            # 计算下一期投入日期
-            next_phase_date = data.index[min(i + days_between_phases, len(data) - 1)]
-
-            # 记录投入
-            trades.append({
-                'date': date,
-                'action': 'PHASE_IN',
-                'price': current_price,
-                'shares': 0,
-                'value': phase_amount,
-                'portfolio_value': cash + shares * current_price
-            })
-
-        # 用可用现金买入股票
-        if cash > 0:
-            # 计算可买入的股数（考虑交易成本）
-            available_cash = cash * (1 - transaction_cost)
-            shares_to_buy = available_cash // current_price
-
-            if shares_to_buy > 0:
-                # 执行买入
-                cost = shares_to_buy * current_price
-                cash -= cost * (1 + transaction_cost)  # 扣除交易成本
-                shares += shares_to_buy
-
-                trades.append({
-                    'date': date,
-                    'action': 'BUY',
-                    'price': current_price,
-                    'shares': shares_to_buy,
-                    'value': cost,
-                    'portfolio_value': cash + shares * current_price
-                })
-
-        # 计算当前投资组合价值
-        current_value = cash + shares * current_price
-        portfolio_values.append(current_value)
+    days_between_phases = max(1, total_days // phases)
+    phase_days = np.unique(np.minimum(np.arange(phases) * days_between_phases, total_days - 1))
+    deposits = np.zeros(total_days)
+    deposits[phase_days] = phase_amount
+    phases_executed = len(phase_days)
+
+    # 有现金就用可用现金买入股票（考虑交易成本）
+    close = data['Close'].values
+    result = run_portfolio(close, np.ones(total_days, dtype=bool), deposits=deposits, commission=transaction_cost,
+                           sizing='net', pyramiding=True)
+    trades = dated_records(data.index, close, result, deposits, 'PHASE_IN')
+    portfolio_values = list(result['equity'])
 
     # 回测结束，计算最终价值
-    final_value = cash + shares * data.iloc[-1]['Close']
+    final_value = result['final_value']
 
     # 计算回测指标
     total_return = (final_value - total_investment) / total_investment * 100
 
     # 计算年化回报率
     years = len(data) / 252  # 假设一年有252个交易日
-    annual_return = (final_value / total_investment) ** (1 / years) - 1 if years > 0 else 0
-    annual_return_pct = annual_return * 100
+    annual_return_pct = metrics.cagr(final_value / total_investment, years)
 
     # 计算最大回撤
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
     return {
         'total_investment': total_investment,
@@ -231,85 +136,31 @@ def backtest_monthly_dca_strategy(data, monthly_investment=10000, transaction_co
     回测每月定期定额策略
     每月固定投入固定金额，持续投入直到回测结束
     """
-    # 初始化变量
-    cash = 0
-    shares = 0
-    trades = []
-    portfolio_values = []
-    total_invested = 0
-
-    # 获取数据的月份信息
-    data['YearMonth'] = data.index.to_period('M')
-    unique_months = data['YearMonth'].unique()
-
-    # 记录已处理的月份
-    processed_months = set()
-
-    # 遍历每一天
-    for i, (date, row) in enumerate(data.iterrows()):
-        current_price = row['Close']
-        current_month = row['YearMonth']
-
-        # 检查是否是新月份的第一个交易日
-        if current_month not in processed_months:
-            # 投入本月资金
-            cash += monthly_investment
-            total_invested += monthly_investment
-            processed_months.add(current_month)
-
-            # 记录投入
-            trades.append({
-                'date': date,
-                'action': 'MONTHLY_IN',
-                'price': current_price,
-                'shares': 0,
-                'value': monthly_investment,
-                'portfolio_value': cash + shares * current_price,
-                'total_invested': total_invested
-            })
-
-        # 用可用现金买入股票
-        if cash > 0:
-            # 计算可买入的股数（考虑交易成本）
-            available_cash = cash * (1 - transaction_cost)
-            shares_to_buy = available_cash // current_price
-
-            if shares_to_buy > 0:
-                # 执行买入
-                cost = shares_to_buy * current_price
-                cash -= cost * (1 + transaction_cost)  # 扣除交易成本
-                shares += shares_to_buy
-
-                trades.append({
-                    'date': date,
-                    'action': 'BUY',
-                    'price': current_price,
-                    'shares': shares_to_buy,
-                    'value': cost,
-                    'portfolio_value': cash + shares * current_price,
-                    'total_invested': total_invested
-                })
-
-        # 计算当前投资组合价值
-        current_value = cash + shares * current_price
-        portfolio_values.append(current_value)
+    # 每月第一个交易日投入本月资金
+    months = data.index.to_period('M')
+    new_month = np.r_[True, months[1:] != months[:-1]] if len(data) else np.zeros(0, dtype=bool)
+    deposits = np.where(new_month, float(monthly_investment), 0.0)
+    total_invested = monthly_investment * int(new_month.sum())
+
+    # 有现金就用可用现金买入股票（考虑交易成本）
+    close = data['Close'].values
+    result = run_portfolio(close, np.ones(len(data), dtype=bool), deposits=deposits, commission=transaction_cost,
+                           sizing='net', pyramiding=True)
+    trades = dated_records(data.index, close, result, deposits, 'MONTHLY_IN')
+    portfolio_values = list(result['equity'])
 
     # 回测结束，计算最终价值
-    final_value = cash + shares * data.iloc[-1]['Close']
+    final_value = result['final_value']
 
     # 计算回测指标
     total_return = (final_value - total_invested) / total_invested * 100 if total_invested > 0 else 0
 
     # 计算年化回报率
     years = len(data) / 252  # 假设一年有252个交易日
-    annual_return = (final_value / total_invested) ** (1 / years) - 1 if years > 0 and total_invested > 0 else 0
-    annual_return_pct = annual_return * 100
+    annual_return_pct = metrics.cagr(final_value / total_invested, years) if total_invested > 0 else 0
 
     # 计算最大回撤
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min() if not drawdowns.empty else 0
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
     return {
         'total_invested': total_invested,
@@ -318,13 +169,13 @@ def backtest_monthly_dca_strategy(data, monthly_investment=10000, transaction_co
         'annual_return': annual_return_pct,
         'max_drawdown': max_drawdown,
         'trades': trades,
-        'num_months': len(processed_months),
+        'num_months': len(months.unique()),
         'portfolio_values': portfolio_values,
         'monthly_investment': monthly_investment
     }
 
 
-def simple_stock_analysis():
+def simple_stock_analysis(provider=None):
     # 设置中文字体
     set_chinese_font()
 
@@ -338,7 +189,7 @@ def simple_stock_analysis():
     print(f"正在下载{stock_code}历史数据...")
     try:
         # 明确设置auto_adjust参数以避免警告
-        data = yf.download(stock_code, start=start_date, end=end_date, auto_adjust=True)
+        data = fetch_bars(stock_code, start_date, end_date, provider)
         print(f"成功下载 {len(data)} 条数据")
     except Exception as e:
         print(f"下载数据时出错: {e}")
@@ -513,34 +364,35 @@ def simple_stock_analysis():
              label='买入持有策略', color='red', linewidth=2)
 
     # 标记移动平均线策略的买卖点
-    buy_dates = [t['date'] for t in backtest_results['trades'] if t['action'] == 'BUY']
-    sell_dates = [t['date'] for t in backtest_results['trades'] if t['action'] == 'SELL']
+    ma_trades = backtest_results['trades']
+    buy_dates = ma_trades['date'][ma_trades['action'] == 'BUY']
+    sell_dates = ma_trades['date'][ma_trades['action'] == 'SELL']
 
     # 获取买卖点的资产价值
-    buy_values = [backtest_results['portfolio_values'][data.index.get_loc(date)] for date in buy_dates]
-    sell_values = [backtest_results['portfolio_values'][data.index.get_loc(date)] for date in sell_dates]
+    ma_values = np.asarray(backtest_results['portfolio_values'])
+    buy_values = ma_values[data.index.get_indexer(buy_dates)]
+    sell_values = ma_values[data.index.get_indexer(sell_dates)]
 
     plt.scatter(buy_dates, buy_values, marker='^', color='blue', s=100, label='移动平均线买入点', zorder=5)
     plt.scatter(sell_dates, sell_values, marker='v', color='blue', s=100, label='移动平均线卖出点', zorder=5)
 
     # 标记分批买入策略的投入点
-    phase_dates = [t['date'] for t in phased_results['trades'] if t['action'] == 'PHASE_IN']
-    phase_values = [phased_results['portfolio_values'][data.index.get_loc(date)] for date in phase_dates]
+    phased_trades = phased_results['trades']
+    phase_dates = phased_trades['date'][phased_trades['action'] == 'PHASE_IN']
+    phase_values = np.asarray(phased_results['portfolio_values'])[data.index.get_indexer(phase_dates)]
 
     plt.scatter(phase_dates, phase_values, marker='o', color='green', s=100, label='分批投入点', zorder=5)
 
     # 标记每月定投策略的投入点（每月显示一个点）
-    monthly_dates = [t['date'] for t in monthly_dca_results['trades'] if t['action'] == 'MONTHLY_IN']
-    monthly_values = [monthly_dca_results['portfolio_values'][data.index.get_loc(date)] for date in monthly_dates]
+    monthly_trades = monthly_dca_results['trades']
+    monthly_dates = monthly_trades['date'][monthly_trades['action'] == 'MONTHLY_IN']
+    monthly_values = np.asarray(monthly_dca_results['portfolio_values'])[data.index.get_indexer(monthly_dates)]
 
     # 为了避免图表过于拥挤，只显示部分月份的点
     if len(monthly_dates) > 24:  # 如果超过2年的点，只显示每年1月和7月的点
-        selected_monthly_dates = []
-        selected_monthly_values = []
-        for i, date in enumerate(monthly_dates):
-            if date.month in [1, 7]:  # 只显示1月和7月的点
-                selected_monthly_dates.append(date)
-                selected_monthly_values.append(monthly_values[i])
+        selected = pd.DatetimeIndex(monthly_dates).month.isin([1, 7])  # 只显示1月和7月的点
+        selected_monthly_dates = monthly_dates[selected]
+        selected_monthly_values = monthly_values[selected]
         plt.scatter(selected_monthly_dates, selected_monthly_values, marker='s', color='orange', s=80,
                     label='定投投入点(1月/7月)', zorder=5)
     else:
@@ -583,17 +435,15 @@ def simple_stock_analysis():
     print(
         f"每月定投策略: 收益率 {monthly_dca_results['total_return']:.2f}%, 最大回撤 {monthly_dca_results['max_drawdown']:.2f}%")
 
-    # 计算风险调整后收益 (夏普比率简化版)
-    def calculate_simple_sharpe(return_pct, max_drawdown):
-        # 简化版夏普比率：收益率/最大回撤（绝对值）
-        if max_drawdown == 0:
-            return float('inf')
-        return return_pct / abs(max_drawdown)
-
-    sharpe_bh = calculate_simple_sharpe(backtest_results['buy_hold_return'], backtest_results['buy_hold_max_drawdown'])
-    sharpe_ma = calculate_simple_sharpe(backtest_results['total_return'], backtest_results['max_drawdown'])
-    sharpe_phased = calculate_simple_sharpe(phased_results['total_return'], phased_results['max_drawdown'])
-    sharpe_monthly = calculate_simple_sharpe(monthly_dca_results['total_return'], monthly_dca_results['max_drawdown'])
+    # 计算风险调整后收益 (夏普比率简化版)：收益率/最大回撤（绝对值），没有回撤时为无穷大
+    sharpe_bh = metrics.return_drawdown_ratio(backtest_results['buy_hold_return'],
+                                              backtest_results['buy_hold_max_drawdown'], float('inf'))
+    sharpe_ma = metrics.return_drawdown_ratio(backtest_results['total_return'],
+                                              backtest_results['max_drawdown'], float('inf'))
+    sharpe_phased = metrics.return_drawdown_ratio(phased_results['total_return'],
+                                                  phased_results['max_drawdown'], float('inf'))
+    sharpe_monthly = metrics.return_drawdown_ratio(monthly_dca_results['total_return'],
+                                                   monthly_dca_results['max_drawdown'], float('inf'))
 
     print(f"\n风险调整后收益 (收益率/最大回撤):")
     print(f"买入持有策略: {sharpe_bh:.2f}")
@@ -624,38 +474,38 @@ def simple_stock_analysis():
         print("适合喜欢主动管理且能接受频繁交易的投资者")
 
     # 打印交易详情
-    if backtest_results['trades']:
+    if len(backtest_results['trades']):
         print(f"\n移动平均线策略交易详情 (前10笔):")
         print("-" * 100)
         print(f"{'日期':<12} {'操作':<6} {'价格':<8} {'股数':<10} {'金额':<12} {'组合价值':<12}")
         print("-" * 100)
 
         for i, trade in enumerate(backtest_results['trades'][:10]):
-            print(f"{trade['date'].strftime('%Y-%m-%d'):<12} {trade['action']:<6} {trade['price']:<8.2f} "
+            print(f"{pd.Timestamp(trade['date']).strftime('%Y-%m-%d'):<12} {trade['action']:<6} {trade['price']:<8.2f} "
                   f"{trade['shares']:<10.0f} {trade['value']:<12.0f} {trade['portfolio_value']:<12.0f}")
 
         if len(backtest_results['trades']) > 10:
             print(f"... 还有 {len(backtest_results['trades']) - 10} 笔交易未显示")
 
-    if monthly_dca_results['trades']:
+    if len(monthly_dca_results['trades']):
         print(f"\n每月定投策略投入详情 (前12个月和后12个月):")
         print("-" * 80)
         print(f"{'日期':<12} {'操作':<10} {'价格':<8} {'投入金额':<12} {'组合价值':<12}")
         print("-" * 80)
 
-        monthly_in_trades = [t for t in monthly_dca_results['trades'] if t['action'] == 'MONTHLY_IN']
+        monthly_in_trades = monthly_dca_results['trades'][monthly_dca_results['trades']['action'] == 'MONTHLY_IN']
 
         # 显示前12个月
         print("前12个月投入:")
         for i, trade in enumerate(monthly_in_trades[:12]):
-            print(f"{trade['date'].strftime('%Y-%m-%d'):<12} {trade['action']:<10} {trade['price']:<8.2f} "
+            print(f"{pd.Timestamp(trade['date']).strftime('%Y-%m-%d'):<12} {trade['action']:<10} {trade['price']:<8.2f} "
                   f"{trade['value']:<12.0f} {trade['portfolio_value']:<12.0f}")
 
         # 显示后12个月（如果足够多）
         if len(monthly_in_trades) > 24:
             print("\n后12个月投入:")
             for i, trade in enumerate(monthly_in_trades[-12:]):
-                print(f"{trade['date'].strftime('%Y-%m-%d'):<12} {trade['action']:<10} {trade['price']:<8.2f} "
+                print(f"{pd.Timestamp(trade['date']).strftime('%Y-%m-%d'):<12} {trade['action']:<10} {trade['price']:<8.2f} "
                       f"{trade['value']:<12.0f} {trade['portfolio_value']:<12.0f}")
 
         print(f"\n总投入月数: {len(monthly_in_trades)} 个月")
@@ -1,13 +1,23 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import numpy as np
+import metrics
+from data_provider import fetch_bars
+from indicators import calculate_technical_indicators, sma
+from monte_carlo import block_bootstrap, bootstrap_trades, confidence_intervals, prob_better
+from signal_kernel import cross_above, cross_below, crossover_signals
+from strategy_rules import STRATEGY_CONFIGS, filter_message, rule_signals, run_rule_strategies
+from trade_ledger import build_ledger, ledger_stats, mark_to_market
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Microsoft JhengHei', 'SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 重抽样次数和随机数种子（固定种子使置信区间与胜出概率可复现）
+N_BOOTSTRAP = 5000
+BOOTSTRAP_SEED = 42
+
 
 def fix_dataframe_columns(stock_data):
     """
@@ -18,65 +28,6 @@ def fix_dataframe_columns(stock_data):
     return stock_data
 
 
-def calculate_macd(data, fast_period=12, slow_period=26, signal_period=9):
-    """
-    计算MACD指标
-    """
-    fast_ema = data['Close'].ewm(span=fast_period, adjust=False).mean()
-    slow_ema = data['Close'].ewm(span=slow_period, adjust=False).mean()
-
-    macd_line = fast_ema - slow_ema
-    signal_line = macd_line.ewm(span=signal_period, adjust=False).mean()
-    macd_histogram = macd_line - signal_line
-
-    return macd_line, signal_line, macd_histogram
-
-
-def calculate_rsi(data, period=14):
-    """
-    计算RSI指标
-    """
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-
-    return rsi
-
-
-def calculate_technical_indicators(stock_data):
-    """
-    计算所有技术指标
-    """
-    df = fix_dataframe_columns(stock_data.copy())
-
-    # 计算移动平均线
-    df['MA5'] = df['Close'].rolling(window=5).mean()
-    df['MA20'] = df['Close'].rolling(window=20).mean()
-    df['MA60'] = df['Close'].rolling(window=60).mean()
-    df['MA200'] = df['Close'].rolling(window=200).mean()
-
-    # 计算MACD
-    df['MACD'], df['MACD_Signal'], df['MACD_Histogram'] = calculate_macd(df)
-
-    # 计算RSI
-    df['RSI'] = calculate_rsi(df)
-
-    # 计算布林带
-    df['BB_Middle'] = df['Close'].rolling(window=20).mean()
-    bb_std = df['Close'].rolling(window=20).std()
-    df['BB_Upper'] = df['BB_Middle'] + (bb_std * 2)
-    df['BB_Lower'] = df['BB_Middle'] - (bb_std * 2)
-
-    # 计算市场状态指标
-    df['Trend_Strength'] = abs(df['Close'] - df['MA200']) / df['MA200']
-    df['Volatility'] = df['Close'].rolling(20).std() / df['Close'].rolling(20).mean()
-
-    return df
-
-
 def no_filter_ma_signals(stock_data):
     """
     无过滤策略 - 原始策略
@@ -84,36 +35,15 @@ def no_filter_ma_signals(stock_data):
     df = fix_dataframe_columns(stock_data.copy())
 
     # 计算移动平均线
-    df['MA5'] = df['Close'].rolling(window=5).mean()
-    df['MA20'] = df['Close'].rolling(window=20).mean()
-    df['MA60'] = df['Close'].rolling(window=60).mean()
-    df['MA200'] = df['Close'].rolling(window=200).mean()
-
-    holding = False
-    buy_signals = []
-    sell_signals = []
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        if golden_cross_5_20 and close_price > ma200 and not holding:
-            buy_signals.append((date, close_price))
-            holding = True
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
+    df['MA5'] = sma(stock_data, 5)
+    df['MA20'] = sma(stock_data, 20)
+    df['MA60'] = sma(stock_data, 60)
+    df['MA200'] = sma(stock_data, 200)
+
+    golden_cross_5_20 = cross_above(df['MA5'], df['MA20'])
+    death_cross_20_60 = cross_below(df['MA20'], df['MA60'])
+    buy_signals, sell_signals = crossover_signals(
+        df, golden_cross_5_20 & (df['Close'].values > df['MA200'].values), death_cross_20_60)
 
     return df, buy_signals, sell_signals
 
@@ -122,227 +52,51 @@ def light_filter_ma_signals(stock_data):
     """
     轻量级过滤策略 - 只过滤明显差的信号
     """
-    df = calculate_technical_indicators(stock_data)
-
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    filtered_count = 0
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        bb_upper = df['BB_Upper'].iloc[i]
-        macd = df['MACD'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 轻量级过滤条件
-            extremely_overbought = rsi > 85
-            far_above_bb = close_price > bb_upper * 1.05
-            severe_macd_bearish = macd < -2
-            far_below_200ma = close_price < ma200 * 0.8
-
-            filter_conditions = [
-                not extremely_overbought,
-                not far_above_bb,
-                not severe_macd_bearish,
-                not far_below_200ma
-            ]
-
-            light_filter_passed = all(filter_conditions)
-
-            if light_filter_passed:
-                buy_signals.append((date, close_price))
-                holding = True
-            else:
-                filtered_count += 1
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    print(f"轻量级过滤：过滤掉了 {filtered_count} 个明显差的买入信号")
-    return df, buy_signals, sell_signals
+    result = run_rule_strategies(stock_data, ['light_filter'])['light_filter']
+    print(f"轻量级过滤：过滤掉了 {result['filtered_count']} 个明显差的买入信号")
+    return result['df'], result['buy_signals'], result['sell_signals']
 
 def optimized_light_filter_ma_signals(stock_data):
     """
     优化后的轻量级过滤策略 - 针对中信金特性调整
     """
-    df = calculate_technical_indicators(stock_data)
-
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    filtered_count = 0
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        bb_upper = df['BB_Upper'].iloc[i]
-        macd = df['MACD'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 针对中信金优化的过滤条件
-            extremely_overbought = rsi > 75  # 从85降低到75
-            moderately_overbought = rsi > 70  # 新增中等超买条件
-            above_bb = close_price > bb_upper  # 从5%降低到突破上轨
-            macd_bearish = macd < -0.5  # 从-2放宽到-0.5
-            below_200ma = close_price < ma200 * 0.95  # 从80%调整到95%
-
-            # 使用更灵活的过滤逻辑：满足任意2个条件就过滤
-            filter_conditions = [
-                extremely_overbought,
-                moderately_overbought and above_bb,  # 组合条件
-                macd_bearish and below_200ma,  # 组合条件
-            ]
-
-            # 如果满足任意条件就过滤
-            should_filter = any(filter_conditions)
-
-            if not should_filter:
-                buy_signals.append((date, close_price))
-                holding = True
-            else:
-                filtered_count += 1
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    print(f"优化轻量级过滤：过滤掉了 {filtered_count} 个买入信号")
-    return df, buy_signals, sell_signals
+    result = run_rule_strategies(stock_data, ['optimized_light_filter'])['optimized_light_filter']
+    print(f"优化轻量级过滤：过滤掉了 {result['filtered_count']} 个买入信号")
+    return result['df'], result['buy_signals'], result['sell_signals']
 
 
 def mean_reversion_strategy(stock_data):
     """
     均值回归策略 - 更适合金融股
     """
-    df = calculate_technical_indicators(stock_data)
+    df, buy_signals, sell_signals = rule_signals(stock_data, 'mean_reversion')
 
     # 添加均值回归指标
     df['Price_MA20_Ratio'] = df['Close'] / df['MA20']
     df['RSI_MA20'] = df['RSI'].rolling(20).mean()
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        price_ma20_ratio = df['Price_MA20_Ratio'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        rsi_ma20 = df['RSI_MA20'].iloc[i]
-
-        # 均值回归买入条件：价格低于20MA且RSI超卖
-        if not holding and price_ma20_ratio < 0.95 and rsi < 35:
-            buy_signals.append((date, close_price))
-            holding = True
+    return df, buy_signals, sell_signals
 
-        # 均值回归卖出条件：价格高于20MA且RSI超买
-        elif holding and price_ma20_ratio > 1.05 and rsi > 65:
-            sell_signals.append((date, close_price))
-            holding = False
 
-    return df, buy_signals, sell_signals
+def _print_filter_messages(key, result):
+    df = result['df']
+    for date, reasons in result['filtered']:
+        message = filter_message(STRATEGY_CONFIGS[key], reasons, df.loc[date])
+        if message is not None:
+            print(message)
 
 
 def strict_light_filter_ma_signals(stock_data):
     """
     严格的轻量级过滤策略
     """
-    df = calculate_technical_indicators(stock_data)
+    result = run_rule_strategies(stock_data, ['strict_light_filter'])['strict_light_filter']
+    df, buy_signals, sell_signals = result['df'], result['buy_signals'], result['sell_signals']
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    filtered_count = 0
-
-    for i in range(200, len(df)):
-        # ... 前面代码相同 ...
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        bb_upper = df['BB_Upper'].iloc[i]
-        macd = df['MACD'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-        if base_condition and not holding:
-            # 更严格的过滤条件
-            extremely_overbought = rsi > 70  # 收紧到70
-            moderately_overbought = rsi > 65  # 收紧到65
-            above_bb = close_price > bb_upper * 1.02  # 超过上轨2%
-            macd_bearish = macd < 0  # MACD为负
-            below_200ma = close_price < ma200 * 0.98  # 低于200MA 2%
-
-            # 使用更严格的组合条件
-            filter_conditions = [
-                extremely_overbought,
-                moderately_overbought and above_bb,
-                macd_bearish and below_200ma,
-                rsi < 30,  # 新增：避免在超卖时买入
-                macd < df['MACD_Signal'].iloc[i]  # 新增：MACD在信号线下方
-            ]
-
-            should_filter = any(filter_conditions)
-
-            if not should_filter:
-                buy_signals.append((date, close_price))
-                holding = True
-            else:
-                filtered_count += 1
-                # 打印被过滤的原因（调试用）
-                if extremely_overbought:
-                    print(f"过滤原因: RSI过高 {rsi:.1f}")
-                elif moderately_overbought and above_bb:
-                    print(f"过滤原因: RSI中等超买且突破布林带 RSI:{rsi:.1f}")
-                elif macd_bearish and below_200ma:
-                    print(f"过滤原因: MACD看跌且低于200MA MACD:{macd:.3f}")
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    print(f"严格轻量级过滤：过滤掉了 {filtered_count} 个买入信号")
+    # 打印被过滤的原因（调试用）
+    _print_filter_messages('strict_light_filter', result)
+
+    print(f"严格轻量级过滤：过滤掉了 {result['filtered_count']} 个买入信号")
     return df, buy_signals, sell_signals
 
 
@@ -350,67 +104,13 @@ def enhanced_light_filter_ma_signals(stock_data):
     """
     增强版轻量级过滤策略 - 基于回测结果优化
     """
-    df = calculate_technical_indicators(stock_data)
+    result = run_rule_strategies(stock_data, ['enhanced_light_filter'])['enhanced_light_filter']
+    df, buy_signals, sell_signals = result['df'], result['buy_signals'], result['sell_signals']
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    filtered_count = 0
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        bb_upper = df['BB_Upper'].iloc[i]
-        bb_lower = df['BB_Lower'].iloc[i]
-        macd = df['MACD'].iloc[i]
-        macd_signal = df['MACD_Signal'].iloc[i]
-        volume = df['Volume'].iloc[i]
-        avg_volume = df['Volume'].rolling(20).mean().iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 基于回测结果的优化条件
-            conditions = {
-                'rsi_overbought': rsi > 72,  # 适度超买
-                'rsi_oversold': rsi < 38,  # 适度超卖
-                'above_bb': close_price > bb_upper * 1.01,  # 略高于布林带上轨
-                'below_bb': close_price < bb_lower * 0.99,  # 略低于布林带下轨
-                'macd_bearish': macd < macd_signal,  # MACD在信号线下方
-                'low_volume': volume < avg_volume * 0.8,  # 成交量不足
-                'high_volatility': df['Volatility'].iloc[i] > 0.03,  # 高波动期
-                'weak_trend': df['Trend_Strength'].iloc[i] < 0.05,  # 趋势过弱
-            }
-
-            # 计分系统：满足2个以上条件就过滤
-            filter_score = sum(conditions.values())
-
-            if filter_score >= 2:
-                filtered_count += 1
-                if filtered_count <= 5:  # 只打印前5个过滤原因
-                    reasons = [key for key, value in conditions.items() if value]
-                    print(f"过滤原因: {', '.join(reasons)} (RSI: {rsi:.1f}, MACD: {macd:.3f})")
-            else:
-                buy_signals.append((date, close_price))
-                holding = True
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    print(f"增强版轻量级过滤：过滤掉了 {filtered_count} 个买入信号")
+    for date, reasons in result['filtered'][:5]:  # 只打印前5个过滤原因
+        print(f"过滤原因: {', '.join(reasons)} (RSI: {df.at[date, 'RSI']:.1f}, MACD: {df.at[date, 'MACD']:.3f})")
+
+    print(f"增强版轻量级过滤：过滤掉了 {result['filtered_count']} 个买入信号")
     return df, buy_signals, sell_signals
 
 
@@ -418,62 +118,12 @@ def conservative_filter_ma_signals(stock_data):
     """
     保守过滤策略 - 只过滤最危险的信号
     """
-    df = calculate_technical_indicators(stock_data)
+    result = run_rule_strategies(stock_data, ['conservative_filter'])['conservative_filter']
+    df, buy_signals, sell_signals = result['df'], result['buy_signals'], result['sell_signals']
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    filtered_count = 0
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        bb_upper = df['BB_Upper'].iloc[i]
-        macd = df['MACD'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 只过滤最危险的3种情况
-            extremely_overbought = rsi > 82  # 比之前更严格
-            extreme_breakout = close_price > bb_upper * 1.10  # 突破过多
-            severe_downtrend = close_price < ma200 * 0.80  # 严重下跌趋势
-
-            should_filter = any([
-                extremely_overbought,
-                extreme_breakout,
-                severe_downtrend
-            ])
-
-            if not should_filter:
-                buy_signals.append((date, close_price))
-                holding = True
-            else:
-                filtered_count += 1
-                if extremely_overbought:
-                    print(f"保守过滤: RSI极端超买({rsi:.1f})")
-                elif extreme_breakout:
-                    print(f"保守过滤: 突破过多({close_price:.2f} > {bb_upper:.2f})")
-                elif severe_downtrend:
-                    print(f"保守过滤: 严重下跌趋势({close_price:.2f} < {ma200:.2f})")
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    print(f"保守过滤：过滤掉了 {filtered_count} 个危险信号")
+    _print_filter_messages('conservative_filter', result)
+
+    print(f"保守过滤：过滤掉了 {result['filtered_count']} 个危险信号")
     return df, buy_signals, sell_signals
 
 
@@ -481,63 +131,13 @@ def pattern_based_filter_ma_signals(stock_data):
     """
     基于历史模式过滤 - 分析过去类似信号的表现
     """
-    df = calculate_technical_indicators(stock_data)
+    result = run_rule_strategies(stock_data, ['pattern_based_filter'])['pattern_based_filter']
+    df, buy_signals, sell_signals = result['df'], result['buy_signals'], result['sell_signals']
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    filtered_count = 0
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        bb_upper = df['BB_Upper'].iloc[i]
-        bb_lower = df['BB_Lower'].iloc[i]
-        macd = df['MACD'].iloc[i]
-        macd_signal = df['MACD_Signal'].iloc[i]
-        volume = df['Volume'].iloc[i]
-        avg_volume = df['Volume'].rolling(20).mean().iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 基于历史表现的模式过滤
-            conditions = {
-                'weak_volume_momentum': volume < avg_volume * 0.9 and df['Volume'].iloc[i - 1] < avg_volume * 0.9,
-                'rsi_divergence': rsi < 45 and close_price > df['Close'].iloc[i - 20] * 1.05,  # 价格新高但RSI不高
-                'macd_weakness': macd < 0 or macd < macd_signal,
-                'volatility_squeeze': (bb_upper - bb_lower) / bb_lower < 0.05,  # 布林带收窄
-                'distance_from_ma200': close_price > ma200 * 1.15,  # 离200MA太远
-            }
-
-            # 计分系统：2分以上过滤
-            filter_score = sum(conditions.values())
-
-            if filter_score >= 2:
-                filtered_count += 1
-                reasons = [key for key, value in conditions.items() if value]
-                print(f"模式过滤: {', '.join(reasons)} (分数: {filter_score})")
-            else:
-                buy_signals.append((date, close_price))
-                holding = True
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    print(f"模式过滤：过滤掉了 {filtered_count} 个信号")
+    for date, reasons in result['filtered']:
+        print(f"模式过滤: {', '.join(reasons)} (分数: {len(reasons)})")
+
+    print(f"模式过滤：过滤掉了 {result['filtered_count']} 个信号")
     return df, buy_signals, sell_signals
 
 
@@ -545,71 +145,13 @@ def risk_adjusted_position_strategy(stock_data):
     """
     风险调整仓位策略 - 不过滤信号，但根据风险调整仓位大小
     """
-    df = calculate_technical_indicators(stock_data)
+    result = run_rule_strategies(stock_data, ['risk_adjusted_position'])['risk_adjusted_position']
+    df, buy_signals, sell_signals = result['df'], result['buy_signals'], result['sell_signals']
+    position_sizes = [size for _, size, _ in result['entries']]
 
-    holding = False
-    buy_signals = []  # 存储(日期, 价格, 仓位权重)
-    sell_signals = []  # 存储(日期, 价格)
-    position_sizes = []  # 记录每次交易的仓位大小
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        volume = df['Volume'].iloc[i]
-        avg_volume = df['Volume'].rolling(20).mean().iloc[i]
-        macd = df['MACD'].iloc[i]
-        macd_signal = df['MACD_Signal'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 计算风险分数和推荐仓位
-            risk_factors = [
-                rsi > 70,  # 超买风险
-                volume < avg_volume * 0.8,  # 低成交量风险
-                close_price > ma200 * 1.15,  # 高位风险
-                macd < macd_signal,  # MACD弱势风险
-                df['Volatility'].iloc[i] > 0.03,  # 高波动风险
-            ]
-
-            risk_score = sum(risk_factors)
-
-            # 根据风险调整仓位（1.0 = 满仓，0.5 = 半仓，等等）
-            if risk_score == 0:
-                position_size = 1.0  # 无风险，满仓
-                risk_level = "低风险"
-            elif risk_score == 1:
-                position_size = 0.8  # 轻度风险，80%仓位
-                risk_level = "中低风险"
-            elif risk_score == 2:
-                position_size = 0.6  # 中度风险，60%仓位
-                risk_level = "中风险"
-            elif risk_score >= 3:
-                position_size = 0.4  # 高风险，40%仓位
-                risk_level = "高风险"
-
-            buy_signals.append((date, close_price, position_size))
-            position_sizes.append(position_size)
-            holding = True
-
-            print(f"仓位调整: {risk_level}, 仓位={position_size * 100}%, 风险分数={risk_score}")
-
-        elif death_cross_20_60 and holding:
-            # 卖出信号保持传统格式 (日期, 价格)
-            sell_signals.append((date, close_price))
-            holding = False
+    # 买入信号为 (日期, 价格, 仓位权重)，卖出信号保持传统格式 (日期, 价格)
+    for risk_score, position_size, risk_level in result['entries']:
+        print(f"仓位调整: {risk_level}, 仓位={position_size * 100}%, 风险分数={risk_score:.0f}")
 
     print(
         f"风险调整策略: 平均仓位大小 = {np.mean(position_sizes) * 100:.1f}%" if position_sizes else "风险调整策略: 无交易")
@@ -620,77 +162,12 @@ def refined_risk_adjusted_strategy(stock_data):
     """
     精细化风险调整策略 - 基于回测结果优化仓位映射
     """
-    df = calculate_technical_indicators(stock_data)
+    result = run_rule_strategies(stock_data, ['refined_risk_adjusted'])['refined_risk_adjusted']
+    df, buy_signals, sell_signals = result['df'], result['buy_signals'], result['sell_signals']
+    position_sizes = [size for _, size, _ in result['entries']]
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    position_sizes = []
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        volume = df['Volume'].iloc[i]
-        avg_volume = df['Volume'].rolling(20).mean().iloc[i]
-        macd = df['MACD'].iloc[i]
-        macd_signal = df['MACD_Signal'].iloc[i]
-        bb_upper = df['BB_Upper'].iloc[i]
-        bb_lower = df['BB_Lower'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 更精细的风险评估
-            risk_factors = {
-                'rsi_risk': max(0, (rsi - 50) / 30),  # RSI偏离度风险
-                'volume_risk': max(0, 0.8 - volume / avg_volume),  # 成交量不足风险
-                'position_risk': max(0, (close_price / ma200 - 1.1) / 0.5),  # 高位风险
-                'macd_risk': max(0, (macd_signal - macd) / 2),  # MACD弱势风险
-                'volatility_risk': min(1, df['Volatility'].iloc[i] / 0.04),  # 波动风险
-                'bb_position_risk': max(0, (close_price - bb_lower) / (bb_upper - bb_lower) - 0.8) * 5,  # 布林带位置风险
-            }
-
-            # 综合风险分数（0-1）
-            total_risk_score = min(1, sum(risk_factors.values()) / 3)
-
-            # 更平滑的仓位映射
-            if total_risk_score <= 0.2:
-                position_size = 1.0  # 极低风险，满仓
-                risk_level = "极低风险"
-            elif total_risk_score <= 0.4:
-                position_size = 0.9  # 低风险，90%仓位
-                risk_level = "低风险"
-            elif total_risk_score <= 0.6:
-                position_size = 0.75  # 中风险，75%仓位
-                risk_level = "中风险"
-            elif total_risk_score <= 0.8:
-                position_size = 0.6  # 高风险，60%仓位
-                risk_level = "高风险"
-            else:
-                position_size = 0.4  # 极高风险，40%仓位
-                risk_level = "极高风险"
-
-            buy_signals.append((date, close_price, position_size))
-            position_sizes.append(position_size)
-            holding = True
-
-            print(f"精细调整: {risk_level}, 仓位={position_size * 100}%, 风险分数={total_risk_score:.2f}")
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
+    for total_risk_score, position_size, risk_level in result['entries']:
+        print(f"精细调整: {risk_level}, 仓位={position_size * 100}%, 风险分数={total_risk_score:.2f}")
 
     avg_position = np.mean(position_sizes) * 100 if position_sizes else 0
     print(f"精细化风险调整: 平均仓位大小 = {avg_position:.1f}%")
@@ -701,68 +178,12 @@ def simplified_risk_adjustment(stock_data):
     """
     简化但有效的风险调整策略 - 基于历史表现优化
     """
-    df = calculate_technical_indicators(stock_data)
+    result = run_rule_strategies(stock_data, ['simplified_risk_adjustment'])['simplified_risk_adjustment']
+    df, buy_signals, sell_signals = result['df'], result['buy_signals'], result['sell_signals']
+    position_sizes = [size for _, size, _ in result['entries']]
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    position_sizes = []
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        volume = df['Volume'].iloc[i]
-        avg_volume = df['Volume'].rolling(20).mean().iloc[i]
-        macd = df['MACD'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 基于历史回测结果的简化调整
-            # 只使用最有效的3个风险因子
-            risk_factors = [
-                rsi > 70,  # RSI超买
-                volume < avg_volume * 0.85,  # 成交量不足
-                close_price > ma200 * 1.12,  # 位置过高
-            ]
-
-            risk_score = sum(risk_factors)
-
-            # 基于历史优化的仓位映射
-            if risk_score == 0:
-                position_size = 1.0  # 无风险，满仓
-                risk_level = "优质"
-            elif risk_score == 1:
-                position_size = 0.7  # 轻度风险，70%仓位
-                risk_level = "良好"
-            elif risk_score == 2:
-                position_size = 0.5  # 中度风险，50%仓位
-                risk_level = "谨慎"
-            else:  # risk_score == 3
-                position_size = 0.3  # 高度风险，30%仓位
-                risk_level = "高风险"
-
-            buy_signals.append((date, close_price, position_size))
-            position_sizes.append(position_size)
-            holding = True
-
-            print(f"简化调整: {risk_level}, 仓位={position_size * 100}%, 风险分数={risk_score}")
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
+    for risk_score, position_size, risk_level in result['entries']:
+        print(f"简化调整: {risk_level}, 仓位={position_size * 100}%, 风险分数={risk_score:.0f}")
 
     avg_position = np.mean(position_sizes) * 100 if position_sizes else 0
     print(f"简化风险调整: 平均仓位大小 = {avg_position:.1f}%")
@@ -773,346 +194,160 @@ def final_simplified_risk_strategy(stock_data):
     """
     最终版简化风险调整策略 - 实盘使用版本
     """
-    df = calculate_technical_indicators(stock_data)
-
-    holding = False
-    buy_signals = []
-    sell_signals = []
-    position_sizes = []
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        volume = df['Volume'].iloc[i]
-        avg_volume = df['Volume'].rolling(20).mean().iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        # 买入条件
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-        base_condition = golden_cross_5_20 and close_price > ma200
-
-        if base_condition and not holding:
-            # 风险评分
-            risk_factors = [
-                rsi > 72,  # RSI超买
-                volume < avg_volume * 0.8,  # 成交量不足
-                close_price > ma200 * 1.15,  # 位置过高
-            ]
-
-            risk_score = sum(risk_factors)
-
-            # 仓位调整
-            if risk_score == 0:
-                position_size = 1.0  # 优质信号，满仓
-            elif risk_score == 1:
-                position_size = 0.75  # 良好信号，75%仓位
-            elif risk_score == 2:
-                position_size = 0.5  # 谨慎信号，50%仓位
-            else:  # risk_score == 3
-                position_size = 0.25  # 高风险信号，25%仓位
-
-            buy_signals.append((date, close_price, position_size))
-            position_sizes.append(position_size)
-            holding = True
-
-        # 卖出条件
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    return df, buy_signals, sell_signals
+    return rule_signals(stock_data, 'final_simplified_risk')
 
 def adaptive_ma_signals(stock_data):
     """
     真正自适应的策略 - 确保与无过滤策略不同
     """
-    df = calculate_technical_indicators(stock_data)
-
-    holding = False
-    buy_signals = []
-    sell_signals = []
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        trend_strength = df['Trend_Strength'].iloc[i]
-        volatility = df['Volatility'].iloc[i]
-        macd = df['MACD'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        # 更严格的自适应条件
-        if golden_cross_5_20 and close_price > ma200 and not holding:
-            # 根据市场状态使用不同的过滤条件
-            strong_trend = trend_strength > 0.15
-            high_volatility = volatility > 0.02
-
-            if strong_trend:
-                # 强势市场：要求RSI不过热且MACD向上
-                if rsi < 70 and macd > df['MACD'].iloc[i - 1]:
-                    buy_signals.append((date, close_price))
-                    holding = True
-            elif high_volatility:
-                # 高波动市场：更严格的RSI和价格位置要求
-                if 40 < rsi < 65 and close_price > ma200 * 1.02:
-                    buy_signals.append((date, close_price))
-                    holding = True
-            else:
-                # 正常市场：适度过滤
-                if rsi < 75 and close_price > ma200 * 0.98:
-                    buy_signals.append((date, close_price))
-                    holding = True
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
-
-    return df, buy_signals, sell_signals
+    return rule_signals(stock_data, 'adaptive')
 
 
 def improved_adaptive_ma_signals(stock_data):
     """
     改进的自适应策略
     """
-    df = calculate_technical_indicators(stock_data)
+    return rule_signals(stock_data, 'improved_adaptive')
 
-    holding = False
-    buy_signals = []
-    sell_signals = []
-
-    for i in range(200, len(df)):
-        date = df.index[i]
-        close_price = df['Close'].iloc[i]
-        ma5 = df['MA5'].iloc[i]
-        ma20 = df['MA20'].iloc[i]
-        ma60 = df['MA60'].iloc[i]
-        ma200 = df['MA200'].iloc[i]
-        rsi = df['RSI'].iloc[i]
-        trend_strength = df['Trend_Strength'].iloc[i]
-        volatility = df['Volatility'].iloc[i]
-        macd = df['MACD'].iloc[i]
-        macd_signal = df['MACD_Signal'].iloc[i]
-
-        ma5_prev = df['MA5'].iloc[i - 1]
-        ma20_prev = df['MA20'].iloc[i - 1]
-        ma60_prev = df['MA60'].iloc[i - 1]
-
-        golden_cross_5_20 = (ma5 > ma20) and (ma5_prev <= ma20_prev)
-        death_cross_20_60 = (ma20 < ma60) and (ma20_prev >= ma60_prev)
-
-        if golden_cross_5_20 and close_price > ma200 and not holding:
-            # 改进的自适应逻辑
-            market_condition = "normal"
-
-            if trend_strength > 0.2:  # 强势趋势
-                market_condition = "strong_trend"
-                # 在强势趋势中，允许更高的RSI
-                if rsi < 75 and macd > macd_signal and close_price > ma200 * 1.02:
-                    buy_signals.append((date, close_price))
-                    holding = True
-
-            elif volatility > 0.025:  # 高波动
-                market_condition = "high_volatility"
-                # 高波动市场中要求更好的位置
-                if 35 < rsi < 65 and close_price > ma200 * 1.05:
-                    buy_signals.append((date, close_price))
-                    holding = True
-
-            else:  # 正常市场
-                market_condition = "normal"
-                # 正常市场适度过滤
-                if 40 < rsi < 70 and macd > -1.0:
-                    buy_signals.append((date, close_price))
-                    holding = True
-
-        elif death_cross_20_60 and holding:
-            sell_signals.append((date, close_price))
-            holding = False
 
-    return df, buy_signals, sell_signals
+# 全部信号函数：策略键 -> (显示名称, 函数)，strategy_runner按此批量运行
+SIGNAL_FUNCTIONS = {
+    'no_filter': ("无过滤策略", no_filter_ma_signals),
+    'light_filter': ("轻量级过滤策略", light_filter_ma_signals),
+    'optimized_light_filter': ("优化轻量级过滤策略", optimized_light_filter_ma_signals),
+    'mean_reversion': ("均值回归策略", mean_reversion_strategy),
+    'strict_light_filter': ("严格轻量级过滤策略", strict_light_filter_ma_signals),
+    'enhanced_light_filter': ("增强版轻量级过滤策略", enhanced_light_filter_ma_signals),
+    'conservative_filter': ("保守过滤策略", conservative_filter_ma_signals),
+    'pattern_based_filter': ("模式过滤策略", pattern_based_filter_ma_signals),
+    'risk_adjusted_position': ("风险调整仓位策略", risk_adjusted_position_strategy),
+    'refined_risk_adjusted': ("精细化风险调整策略", refined_risk_adjusted_strategy),
+    'simplified_risk_adjustment': ("简化风险调整策略", simplified_risk_adjustment),
+    'final_simplified_risk': ("最终版风险调整策略", final_simplified_risk_strategy),
+    'adaptive': ("自适应策略", adaptive_ma_signals),
+    'improved_adaptive': ("改进自适应策略", improved_adaptive_ma_signals),
+}
 
-def backtest_analysis(buy_signals, sell_signals, strategy_name="策略"):
+
+def backtest_analysis(buy_signals, sell_signals, strategy_name="策略", n_bootstrap=0, daily_returns=None,
+                      seed=None, stock_data=None):
     """
     回测分析和统计 - 支持带仓位权重的信号
+
+    给出stock_data（信号所用的行情）时按收盘价逐日盯市，最大回撤和持仓时间占比都由每日资产曲线计算，
+    否则最大回撤只能在每笔交易结束时计算（看不到持仓期间的回撤）
+    n_bootstrap > 0 时对交易收益率做重抽样，给出累计收益率、年化收益率、最大回撤的置信区间；
+    同时有每日收益率（daily_returns，或由逐日资产曲线得到）时，再做一次日收益的区块重抽样
+    返回 (统计指标, 交易账本trade_ledger, 逐笔累计收益率)
     """
     print(f"\n" + "=" * 60)
     print(f"{strategy_name} - 回测统计分析")
     print("=" * 60)
 
-    # 检查信号格式并提取基本信息
-    if len(buy_signals) > 0 and len(buy_signals[0]) == 3:
-        # 带仓位权重的信号格式 (日期, 价格, 仓位权重)
-        buy_dates = [signal[0] for signal in buy_signals]
-        buy_prices = [signal[1] for signal in buy_signals]
-        position_sizes = [signal[2] for signal in buy_signals]
-        has_position_sizing = True
-    else:
-        # 传统信号格式 (日期, 价格)
-        buy_dates = [signal[0] for signal in buy_signals]
-        buy_prices = [signal[1] for signal in buy_signals]
-        position_sizes = [1.0] * len(buy_signals)  # 默认满仓
-        has_position_sizing = False
-
-    # 确保买卖信号数量匹配
-    min_signals = min(len(buy_dates), len(sell_signals))
-    buy_dates = buy_dates[:min_signals]
-    buy_prices = buy_prices[:min_signals]
-    position_sizes = position_sizes[:min_signals]
-    sell_signals = sell_signals[:min_signals]
-
-    if min_signals == 0:
+    # 按买卖信号配对建账；信号可带仓位权重 (日期, 价格, 仓位权重)
+    has_position_sizing = len(buy_signals) > 0 and len(buy_signals[0]) == 3
+    ledger = build_ledger(buy_signals, sell_signals)
+
+    if len(ledger) == 0:
         print("没有完整的交易对进行回测分析")
         return None, None, None
 
-    # 计算每笔交易的收益率（考虑仓位权重）
-    trades = []
-    total_return = 1.0
-    cumulative_returns = []
-    total_investment = 0
-    total_profit = 0
-
-    for i in range(min_signals):
-        buy_date = buy_dates[i]
-        buy_price = buy_prices[i]
-        position_size = position_sizes[i]
-        sell_date, sell_price = sell_signals[i]
-
-        holding_days = (sell_date - buy_date).days
-        raw_return_rate = (sell_price - buy_price) / buy_price * 100
-        adjusted_return_rate = raw_return_rate * position_size  # 按仓位调整收益率
-        profit = (sell_price - buy_price) * position_size  # 按仓位调整盈亏
-
-        trade_info = {
-            '序号': i + 1,
-            '买入日期': buy_date.strftime('%Y-%m-%d'),
-            '买入价格': buy_price,
-            '仓位权重': position_size,
-            '卖出日期': sell_date.strftime('%Y-%m-%d'),
-            '卖出价格': sell_price,
-            '持有天数': holding_days,
-            '原始收益率%': raw_return_rate,
-            '调整后收益率%': adjusted_return_rate,
-            '盈亏金额': profit
-        }
-        trades.append(trade_info)
-
-        total_return *= (1 + adjusted_return_rate / 100)
-        cumulative_returns.append((total_return - 1) * 100)
-        total_investment += buy_price * position_size
-        total_profit += profit
-
-    # 计算统计指标
-    returns = [trade['调整后收益率%'] for trade in trades]
-    raw_returns = [trade['原始收益率%'] for trade in trades]
-    profits = [trade['盈亏金额'] for trade in trades]
-    holding_periods = [trade['持有天数'] for trade in trades]
-    position_weights = [trade['仓位权重'] for trade in trades]
-
-    # 基本统计
-    total_trades = len(trades)
-    winning_trades = len([r for r in returns if r > 0])
-    losing_trades = len([r for r in returns if r < 0])
-    win_rate = winning_trades / total_trades * 100 if total_trades > 0 else 0
-
-    avg_return = np.mean(returns) if returns else 0
-    max_return = np.max(returns) if returns else 0
-    min_return = np.min(returns) if returns else 0
-
-    avg_raw_return = np.mean(raw_returns) if raw_returns else 0
-    avg_position_size = np.mean(position_weights) if position_weights else 0
-    avg_holding_days = np.mean(holding_periods) if holding_periods else 0
-
-    # 年化收益率
-    if trades:
-        first_buy_date = datetime.strptime(trades[0]['买入日期'], '%Y-%m-%d')
-        last_sell_date = datetime.strptime(trades[-1]['卖出日期'], '%Y-%m-%d')
-        total_days = (last_sell_date - first_buy_date).days
-        total_years = total_days / 365.25
-        annualized_return = (total_return ** (1 / total_years) - 1) * 100 if total_years > 0 else 0
-    else:
-        annualized_return = 0
-
-    # 最大回撤计算
-    equity_curve = [1.0]
-    for ret in returns:
-        equity_curve.append(equity_curve[-1] * (1 + ret / 100))
-
-    if len(equity_curve) > 1:
-        running_max = np.maximum.accumulate(equity_curve)
-        drawdowns = (equity_curve - running_max) / running_max * 100
-        max_drawdown = np.min(drawdowns) if len(drawdowns) > 0 else 0
-    else:
-        max_drawdown = 0
+    # 收益率和盈亏都按仓位调整
+    summary = ledger_stats(ledger)
+    cumulative_returns = summary['cumulative_returns'].tolist()
+
+    # 逐日盯市的资产曲线：持仓掩码向量化得到，回撤包含持仓期间的浮亏
+    equity_curve = None
+    time_in_market = None
+    trade_max_drawdown = summary['max_drawdown']
+    if stock_data is not None:
+        values, positions = mark_to_market(ledger, stock_data['Close'].values, stock_data.index)
+        equity_curve = pd.Series(values, index=stock_data.index)
+        summary['max_drawdown'] = metrics.max_drawdown(values)
+        time_in_market = metrics.exposure(positions)
+        if daily_returns is None:
+            daily_returns = metrics.daily_returns(values)[1:]
 
     # 打印统计摘要
-    print(f"总交易次数: {total_trades}")
+    print(f"总交易次数: {summary['total_trades']}")
     if has_position_sizing:
-        print(f"平均仓位大小: {avg_position_size*100:.1f}%")
-    print(f"盈利交易: {winning_trades}次")
-    print(f"亏损交易: {losing_trades}次")
-    print(f"胜率: {win_rate:.2f}%")
-    print(f"平均持有天数: {avg_holding_days:.1f}天")
-    print(f"单次交易平均收益率: {avg_return:.2f}%")
+        print(f"平均仓位大小: {summary['avg_position_size']*100:.1f}%")
+    print(f"盈利交易: {summary['winning_trades']}次")
+    print(f"亏损交易: {summary['losing_trades']}次")
+    print(f"胜率: {summary['win_rate']:.2f}%")
+    print(f"平均持有天数: {summary['avg_holding_days']:.1f}天")
+    print(f"单次交易平均收益率: {summary['avg_return']:.2f}%")
     if has_position_sizing:
-        print(f"原始平均收益率: {avg_raw_return:.2f}%")
-    print(f"最佳单次收益率: {max_return:.2f}%")
-    print(f"最差单次收益率: {min_return:.2f}%")
-    print(f"累计总收益率: {(total_return - 1) * 100:.2f}%")
-    print(f"年化收益率: {annualized_return:.2f}%")
-    print(f"总盈亏金额: {total_profit:.2f} TWD")
-    print(f"平均每笔盈亏: {np.mean(profits):.2f} TWD" if profits else "平均每笔盈亏: 0.00 TWD")
-    print(f"最大回撤: {max_drawdown:.2f}%")
+        print(f"原始平均收益率: {summary['avg_raw_return']:.2f}%")
+    print(f"最佳单次收益率: {summary['max_return']:.2f}%")
+    print(f"最差单次收益率: {summary['min_return']:.2f}%")
+    print(f"累计总收益率: {summary['total_return']:.2f}%")
+    print(f"年化收益率: {summary['annualized_return']:.2f}%")
+    print(f"总盈亏金额: {summary['total_profit']:.2f} TWD")
+    print(f"平均每笔盈亏: {summary['avg_profit']:.2f} TWD")
+    if equity_curve is None:
+        print(f"最大回撤: {summary['max_drawdown']:.2f}%")
+    else:
+        print(f"最大回撤(逐日盯市): {summary['max_drawdown']:.2f}% (按交易结束计算: {trade_max_drawdown:.2f}%)")
+        print(f"持仓时间占比: {time_in_market:.1f}%")
+
+    # 重抽样置信区间
+    bootstrap = None
+    if n_bootstrap > 0:
+        bootstrap = {'trades': bootstrap_trades(ledger['adjusted_return'], summary['total_years'], n_bootstrap,
+                                                seed)}
+        if daily_returns is not None:
+            bootstrap['daily'] = block_bootstrap(daily_returns, n_bootstrap, seed=seed)
+
+        labels = {'total_return': '累计收益率', 'annualized_return': '年化收益率', 'max_drawdown': '最大回撤'}
+        for source, samples in bootstrap.items():
+            title = "交易重抽样" if source == 'trades' else "日收益区块重抽样"
+            print(f"{title}({n_bootstrap}次) 90%置信区间:")
+            for key, (low, median, high) in confidence_intervals(samples).items():
+                print(f"  {labels[key]}: {low:.2f}% ~ {high:.2f}% (中位数 {median:.2f}%)")
 
     # 返回统计信息
     stats = {
-        'total_trades': total_trades,
-        'win_rate': win_rate,
-        'total_return': (total_return - 1) * 100,
-        'annualized_return': annualized_return,
-        'max_drawdown': max_drawdown,
-        'avg_position_size': avg_position_size,
-        'has_position_sizing': has_position_sizing
+        'total_trades': summary['total_trades'],
+        'win_rate': summary['win_rate'],
+        'total_return': summary['total_return'],
+        'annualized_return': summary['annualized_return'],
+        'max_drawdown': summary['max_drawdown'],
+        'avg_position_size': summary['avg_position_size'],
+        'time_in_market': time_in_market,
+        'has_position_sizing': has_position_sizing,
+        'equity_curve': equity_curve,
+        'bootstrap': bootstrap
     }
 
-    return stats, trades, cumulative_returns
+    return stats, ledger, cumulative_returns
 
-def compare_strategies(stock_data):
+def compare_strategies(stock_data, n_bootstrap=0, seed=None):
     """
     比较不同策略的表现
+
+    n_bootstrap > 0 时每个策略附带重抽样置信区间，并估计模式过滤优于无过滤的概率；
+    各策略的随机数种子由seed派生（SeedSequence.spawn），重抽样彼此独立且结果可复现
     """
     print("正在比较不同策略...")
+    seeds = np.random.SeedSequence(seed).spawn(3)
+
+    def analyze(buy_signals, sell_signals, name, strategy_seed):
+        return backtest_analysis(buy_signals, sell_signals, name, n_bootstrap, seed=strategy_seed,
+                                 stock_data=stock_data)
 
     # 策略1: 无过滤策略
     df1, buy1, sell1 = no_filter_ma_signals(stock_data)
-    stats1, trades1, cum_ret1 = backtest_analysis(buy1, sell1, "无过滤策略")
+    stats1, trades1, cum_ret1 = analyze(buy1, sell1, "无过滤策略", seeds[0])
 
     # 策略2: 使用方案1的模式过滤策略
     df2, buy2, sell2 = pattern_based_filter_ma_signals(stock_data)
-    stats2, trades2, cum_ret2 = backtest_analysis(buy2, sell2, "模式过滤策略")
+    stats2, trades2, cum_ret2 = analyze(buy2, sell2, "模式过滤策略", seeds[1])
 
     # 策略3: 风险调整仓位策略
     #df3, buy3, sell3 = risk_adjusted_position_strategy(stock_data)
     df3, buy3, sell3 = final_simplified_risk_strategy(stock_data)
-    stats3, trades3, cum_ret3 = backtest_analysis(buy3, sell3, "风险调整策略")
+    stats3, trades3, cum_ret3 = analyze(buy3, sell3, "风险调整策略", seeds[2])
 
     # 策略比较总结
     print("\n" + "=" * 80)
@@ -1139,6 +374,12 @@ def compare_strategies(stock_data):
         best_strategy = max(strategies, key=lambda x: x[2])  # 按累计收益率排序
         print(f"\n🎯 最佳策略: {best_strategy[0]} (累计收益率: {best_strategy[2]:.2f}%)")
 
+    if stats1 and stats2 and stats1['bootstrap'] and stats2['bootstrap']:
+        for source, title in (('trades', '交易重抽样'), ('daily', '日收益区块重抽样')):
+            if source in stats1['bootstrap'] and source in stats2['bootstrap']:
+                better = prob_better(stats2['bootstrap'][source], stats1['bootstrap'][source])
+                print(f"{title}: 模式过滤累计收益率高于无过滤的概率 {better * 100:.1f}%")
+
     return {
         '无过滤': (df1, buy1, sell1, cum_ret1, stats1),
         '模式过滤': (df2, buy2, sell2, cum_ret2, stats2),
@@ -1173,7 +414,7 @@ def plot_comparison(strategy_results):
 
     # 策略指标雷达图
     ax2 = axes[0, 1]
-    metrics = ['累计收益率', '胜率', '年化收益', '风险控制']
+    radar_labels = ['累计收益率', '胜率', '年化收益', '风险控制']
     strategy_metrics = {}
 
     for name in strategy_names:
@@ -1189,7 +430,7 @@ def plot_comparison(strategy_results):
 
     # 绘制雷达图
     if strategy_metrics:
-        angles = np.linspace(0, 2 * np.pi, len(metrics), endpoint=False).tolist()
+        angles = np.linspace(0, 2 * np.pi, len(radar_labels), endpoint=False).tolist()
         angles += angles[:1]  # 闭合图形
 
         for name, metrics_values in strategy_metrics.items():
@@ -1200,7 +441,7 @@ def plot_comparison(strategy_results):
             ax2.fill(angles, values, alpha=0.1, color=color)
 
         ax2.set_xticks(angles[:-1])
-        ax2.set_xticklabels(metrics)
+        ax2.set_xticklabels(radar_labels)
         ax2.set_ylim(0, 1)
         ax2.set_title('策略综合指标雷达图')
         ax2.legend()
@@ -1351,9 +592,11 @@ def debug_strategy_performance(stock_data, stock_code):
 
     return df
 
-def main():
+def main(provider=None):
     """
     主函数
+
+    provider: 行情数据源，None时使用本地价格仓库；传入ReplayProvider/SyntheticProvider可离线回测
     """
     stack_code = "2345.TW"
     #stack_code = "2891.TW"
@@ -1364,7 +607,7 @@ def main():
     print(f"正在获取{stack_code}股价数据...")
 
     try:
-        stock = yf.download(stack_code, start=start_date, end=end_date, auto_adjust=True)
+        stock = fetch_bars(stack_code, start_date, end_date, provider)
 
         if stock.empty:
             print("无法获取数据，请检查网络连接或股票代码")
@@ -1376,7 +619,7 @@ def main():
         debug_df = debug_strategy_performance(stock, stack_code)
 
         # 比较多种策略
-        strategy_results = compare_strategies(stock)
+        strategy_results = compare_strategies(stock, n_bootstrap=N_BOOTSTRAP, seed=BOOTSTRAP_SEED)
 
         # 绘制策略比较图表
         print("\n正在生成策略比较图表...")
@@ -1,11 +1,19 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import warnings
 import numpy as np
-from backtesting import Backtest, Strategy
-from backtesting.lib import crossover
+try:
+    import backtesting
+    from backtesting import Backtest, Strategy
+    from backtesting.lib import crossover
+except ImportError:
+    # backtesting为可选依赖：未安装时 *_with_backtesting 退回手动计算
+    backtesting = Backtest = Strategy = crossover = None
+from data_provider import fetch_bars
+import metrics
+from portfolio_engine import dated_records, run_portfolio
+from signal_kernel import cross_above, cross_below
 
 # 过滤掉无害的警告
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -161,18 +169,15 @@ def calculate_buy_hold_manually(data, initial_cash=1000000):
     total_return = (final_value - initial_cash) / initial_cash * 100
 
     years = len(data) / 252
-    annual_return = (final_value / initial_cash) ** (1 / years) - 1 if years > 0 else 0
+    annual_return = metrics.cagr(final_value / initial_cash, years)
 
     # 计算最大回撤
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
     return {
         'final_value': final_value,
         'total_return': total_return,
-        'annual_return': annual_return * 100,
+        'annual_return': annual_return,
         'max_drawdown': max_drawdown,
         'portfolio_values': portfolio_values
     }
@@ -190,83 +195,41 @@ def backtest_ma_cross_optimized(data, initial_cash=1000000):
     # 添加趋势过滤器
     data['MA200'] = data['Close'].rolling(window=200).mean()
 
-    cash = initial_cash
-    shares = 0
-    portfolio_values = []
-    trades = []
-    position = 0
     commission = 0.0015
 
     print("优化移动平均线策略参数: MA20/MA60 with MA200 filter")
 
-    for i in range(len(data)):
-        current_price = data.iloc[i]['Close']
+    # 前200天等待足够的数据；趋势判断：价格在200日均线上方为牛市
+    close = data['Close'].values
+    ready = np.arange(len(data)) >= 200
+    bull_market = close > data['MA200'].values
 
-        if i < 200:  # 等待足够的数据
-            portfolio_values.append(cash + shares * current_price)
-            continue
-
-        ma20 = data.iloc[i]['MA20']
-        ma60 = data.iloc[i]['MA60']
-        ma200 = data.iloc[i]['MA200']
-        ma20_prev = data.iloc[i - 1]['MA20'] if i > 0 else ma20
-        ma60_prev = data.iloc[i - 1]['MA60'] if i > 0 else ma60
-
-        # 趋势判断：价格在200日均线上方为牛市
-        bull_market = current_price > ma200
-
-        # 金叉买入 - 只在牛市中使用全部资金
-        if bull_market and ma20_prev <= ma60_prev and ma20 > ma60 and position == 0:
-            shares_to_buy = int(cash // (current_price * (1 + commission)))
-            if shares_to_buy > 0:
-                cost = shares_to_buy * current_price * (1 + commission)
-                if cost <= cash:
-                    cash -= cost
-                    shares += shares_to_buy
-                    position = 1
-                    trades.append({
-                        'date': data.index[i],
-                        'action': 'BUY',
-                        'price': current_price,
-                        'shares': shares_to_buy
-                    })
-                    print(f"优化MA策略买入: {data.index[i].date()}, 价格: {current_price:.2f}, 股数: {shares_to_buy}")
-
-        # 死叉卖出
-        elif ma20_prev >= ma60_prev and ma20 < ma60 and position == 1:
-            if shares > 0:
-                proceeds = shares * current_price * (1 - commission)
-                cash += proceeds
-                trades.append({
-                    'date': data.index[i],
-                    'action': 'SELL',
-                    'price': current_price,
-                    'shares': shares
-                })
-                print(f"优化MA策略卖出: {data.index[i].date()}, 价格: {current_price:.2f}, 股数: {shares}")
-                shares = 0
-                position = 0
-
-        current_value = cash + shares * current_price
-        portfolio_values.append(current_value)
+    # 金叉买入 - 只在牛市中使用全部资金；死叉卖出
+    buy = ready & bull_market & cross_above(data['MA20'], data['MA60'])
+    sell = ready & cross_below(data['MA20'], data['MA60'])
+    result = run_portfolio(close, buy, sell, initial_cash=initial_cash, commission=commission, sizing='gross')
+
+    trades = dated_records(data.index, close, result)
+    for trade in trades:
+        action = "买入" if trade['action'] == 'BUY' else "卖出"
+        print(f"优化MA策略{action}: {pd.Timestamp(trade['date']).date()}, 价格: {trade['price']:.2f}, "
+              f"股数: {trade['shares']:.0f}")
 
-    final_value = cash + shares * data.iloc[-1]['Close']
+    portfolio_values = list(result['equity'])
+    final_value = result['final_value']
     total_return = (final_value - initial_cash) / initial_cash * 100
 
     years = len(data) / 252
-    annual_return = (final_value / initial_cash) ** (1 / years) - 1 if years > 0 else 0
+    annual_return = metrics.cagr(final_value / initial_cash, years)
 
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
     print(f"优化移动平均线策略交易次数: {len(trades)}")
 
     return {
         'final_value': final_value,
         'total_return': total_return,
-        'annual_return': annual_return * 100,
+        'annual_return': annual_return,
         'max_drawdown': max_drawdown,
         'num_trades': len(trades),
         'portfolio_values': portfolio_values,
@@ -280,79 +243,38 @@ def backtest_ma_cross_improved(data, initial_cash=1000000):
     data['MA50'] = data['Close'].rolling(window=50).mean()
     data['MA200'] = data['Close'].rolling(window=200).mean()
 
-    cash = initial_cash
-    shares = 0
-    portfolio_values = []
-    trades = []
-    position = 0
     commission = 0.0015
 
     print("改进移动平均线策略参数: MA50/MA200")
 
-    for i in range(len(data)):
-        current_price = data.iloc[i]['Close']
-
-        if i < 200:  # 等待足够的数据
-            portfolio_values.append(cash + shares * current_price)
-            continue
-
-        ma50 = data.iloc[i]['MA50']
-        ma200 = data.iloc[i]['MA200']
-        ma50_prev = data.iloc[i - 1]['MA50'] if i > 0 else ma50
-        ma200_prev = data.iloc[i - 1]['MA200'] if i > 0 else ma200
-
-        # 金叉买入 - 使用全部资金
-        if ma50_prev <= ma200_prev and ma50 > ma200 and position == 0:
-            shares_to_buy = int(cash // (current_price * (1 + commission)))
-            if shares_to_buy > 0:
-                cost = shares_to_buy * current_price * (1 + commission)
-                if cost <= cash:
-                    cash -= cost
-                    shares += shares_to_buy
-                    position = 1
-                    trades.append({
-                        'date': data.index[i],
-                        'action': 'BUY',
-                        'price': current_price,
-                        'shares': shares_to_buy
-                    })
-                    print(f"MA策略买入: {data.index[i].date()}, 价格: {current_price:.2f}, 股数: {shares_to_buy}")
-
-        # 死叉卖出
-        elif ma50_prev >= ma200_prev and ma50 < ma200 and position == 1:
-            if shares > 0:
-                proceeds = shares * current_price * (1 - commission)
-                cash += proceeds
-                trades.append({
-                    'date': data.index[i],
-                    'action': 'SELL',
-                    'price': current_price,
-                    'shares': shares
-                })
-                print(f"MA策略卖出: {data.index[i].date()}, 价格: {current_price:.2f}, 股数: {shares}")
-                shares = 0
-                position = 0
-
-        current_value = cash + shares * current_price
-        portfolio_values.append(current_value)
-
-    final_value = cash + shares * data.iloc[-1]['Close']
+    # 前200天等待足够的数据；金叉买入 - 使用全部资金，死叉卖出
+    close = data['Close'].values
+    ready = np.arange(len(data)) >= 200
+    buy = ready & cross_above(data['MA50'], data['MA200'])
+    sell = ready & cross_below(data['MA50'], data['MA200'])
+    result = run_portfolio(close, buy, sell, initial_cash=initial_cash, commission=commission, sizing='gross')
+
+    trades = dated_records(data.index, close, result)
+    for trade in trades:
+        action = "买入" if trade['action'] == 'BUY' else "卖出"
+        print(f"MA策略{action}: {pd.Timestamp(trade['date']).date()}, 价格: {trade['price']:.2f}, "
+              f"股数: {trade['shares']:.0f}")
+
+    portfolio_values = list(result['equity'])
+    final_value = result['final_value']
     total_return = (final_value - initial_cash) / initial_cash * 100
 
     years = len(data) / 252
-    annual_return = (final_value / initial_cash) ** (1 / years) - 1 if years > 0 else 0
+    annual_return = metrics.cagr(final_value / initial_cash, years)
 
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
     print(f"移动平均线策略交易次数: {len(trades)}")
 
     return {
         'final_value': final_value,
         'total_return': total_return,
-        'annual_return': annual_return * 100,
+        'annual_return': annual_return,
         'max_drawdown': max_drawdown,
         'num_trades': len(trades),
         'portfolio_values': portfolio_values,
@@ -360,8 +282,17 @@ def backtest_ma_cross_improved(data, initial_cash=1000000):
     }
 
 
+def _manual_fallback(result):
+    """标记为退回手动计算的结果"""
+    result['fallback'] = True
+    return result
+
+
 def backtest_ma_cross_with_backtesting(data, initial_cash=1000000):
     """使用backtesting库回测改进的移动平均线策略"""
+    if Backtest is None:
+        print("未安装backtesting库，使用手动计算")
+        return _manual_fallback(backtest_ma_cross_optimized(data, initial_cash))
     try:
         class ImprovedMAStrategy(Strategy):
             # 使用更长期的均线
@@ -395,7 +326,7 @@ def backtest_ma_cross_with_backtesting(data, initial_cash=1000000):
         if results['Return [%]'] < 100:  # 如果收益率低于100%，可能有问题
             print("移动平均线策略回测结果不理想，使用改进的手动计算")
             #return backtest_ma_cross_improved(data, initial_cash)
-            return backtest_ma_cross_optimized(data, initial_cash)
+            return _manual_fallback(backtest_ma_cross_optimized(data, initial_cash))
 
         return {
             'final_value': results['Equity Final [$]'],
@@ -409,11 +340,14 @@ def backtest_ma_cross_with_backtesting(data, initial_cash=1000000):
     except Exception as e:
         print(f"移动平均线策略回测错误，使用改进的手动计算: {e}")
         #return backtest_ma_cross_improved(data, initial_cash)
-        return backtest_ma_cross_optimized(data, initial_cash)
+        return _manual_fallback(backtest_ma_cross_optimized(data, initial_cash))
 
 
 def backtest_buy_hold_with_backtesting(data, initial_cash=1000000):
     """使用backtesting库回测买入持有策略"""
+    if Backtest is None:
+        print("未安装backtesting库，使用手动计算")
+        return _manual_fallback(calculate_buy_hold_manually(data, initial_cash))
     try:
         class FixedBuyAndHoldStrategy(Strategy):
             def init(self):
@@ -441,86 +375,61 @@ def backtest_buy_hold_with_backtesting(data, initial_cash=1000000):
         # 如果回测结果异常，使用手动计算
         if results['Equity Final [$]'] <= initial_cash * 1.01:  # 如果收益几乎为0
             print("买入持有策略回测结果异常，使用手动计算")
-            return calculate_buy_hold_manually(data, initial_cash)
+            return _manual_fallback(calculate_buy_hold_manually(data, initial_cash))
 
         return {
             'final_value': results['Equity Final [$]'],
             'total_return': results['Return [%]'],
             'annual_return': results['Return (Ann.) [%]'],
             'max_drawdown': results['Max. Drawdown [%]'],
-            'portfolio_values': portfolio_values
+            'portfolio_values': portfolio_values,
+            'backtest_results': results
         }
     except Exception as e:
         print(f"买入持有策略回测错误，使用手动计算: {e}")
-        return calculate_buy_hold_manually(data, initial_cash)
+        return _manual_fallback(calculate_buy_hold_manually(data, initial_cash))
 
 
 def backtest_phased_strategy(data, total_investment=1000000, phases=10, transaction_cost=0.0015):
     """分批买入策略"""
     phase_amount = total_investment / phases
 
-    cash = 0
-    shares = 0
-    trades = []
-    portfolio_values = []
-    phases_executed = 0
-    phase_dates = []
-
     total_days = len(data)
     days_between_phases = max(1, total_days // phases)
 
     print(f"\n分批买入策略详细执行:")
     print(f"总天数: {total_days}, 分期数: {phases}, 每期间隔: {days_between_phases}天")
 
-    for i, (date, row) in enumerate(data.iterrows()):
-        current_price = row['Close']
-
-        # 检查是否是投入日
-        if i % days_between_phases == 0 and phases_executed < phases:
-            cash += phase_amount
-            phases_executed += 1
-            phase_dates.append(date)
-
-            # 立即购买股票
-            available_cash = cash * (1 - transaction_cost)
-            shares_to_buy = int(available_cash // current_price)
-
-            if shares_to_buy > 0:
-                cost = shares_to_buy * current_price
-                transaction_fee = cost * transaction_cost
-                total_cost = cost + transaction_fee
-
-                if total_cost <= cash:
-                    cash -= total_cost
-                    shares += shares_to_buy
-
-                    trades.append({
-                        'date': date,
-                        'action': 'BUY',
-                        'price': current_price,
-                        'shares': shares_to_buy,
-                        'amount': cost
-                    })
-
-                    print(f"第{phases_executed}期投入: 日期={date.date()}, "
-                          f"股价={current_price:.2f}, 买入{shares_to_buy}股, "
-                          f"花费{cost:.0f}元, 手续费{transaction_fee:.0f}元")
-
-        # 计算当日资产
-        current_value = cash + shares * current_price
-        portfolio_values.append(current_value)
-
-    final_value = cash + shares * data.iloc[-1]['Close']
+    # 投入日：每隔days_between_phases天投入一期，投入后立即购买股票
+    phase_days = np.arange(0, total_days, days_between_phases)[:phases]
+    deposits = np.zeros(total_days)
+    deposits[phase_days] = phase_amount
+    buy = deposits > 0
+
+    result = run_portfolio(data['Close'].values, buy, deposits=deposits, commission=transaction_cost,
+                           sizing='net', pyramiding=True)
+    phases_executed = len(phase_days)
+    phase_dates = list(data.index[phase_days])
+
+    trades = dated_records(data.index, data['Close'].values, result)
+    phase_numbers = np.searchsorted(phase_days, result['trades']['index'], side='right')
+    for trade, fee, phase_number in zip(trades, result['trades']['fee'], phase_numbers):
+        print(f"第{phase_number}期投入: 日期={pd.Timestamp(trade['date']).date()}, "
+              f"股价={trade['price']:.2f}, 买入{trade['shares']:.0f}股, "
+              f"花费{trade['value']:.0f}元, 手续费{fee:.0f}元")
+
+    portfolio_values = list(result['equity'])
+    cash = result['cash'][-1]
+    shares = result['shares'][-1]
+
+    final_value = result['final_value']
     total_return = (final_value - total_investment) / total_investment * 100
 
     years = len(data) / 252
-    annual_return = (final_value / total_investment) ** (1 / years) - 1 if years > 0 else 0
+    annual_return = metrics.cagr(final_value / total_investment, years)
 
     # 计算最大回撤
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
     print(f"\n分批买入策略最终统计:")
     print(f"总投入资金: {total_investment:,.0f}元")
@@ -535,7 +444,7 @@ def backtest_phased_strategy(data, total_investment=1000000, phases=10, transact
         'total_investment': total_investment,
         'final_value': final_value,
         'total_return': total_return,
-        'annual_return': annual_return * 100,
+        'annual_return': annual_return,
         'max_drawdown': max_drawdown,
         'trades': trades,
         'num_phases': phases_executed,
@@ -546,71 +455,36 @@ def backtest_phased_strategy(data, total_investment=1000000, phases=10, transact
 
 def backtest_monthly_dca_strategy(data, monthly_investment=10000, transaction_cost=0.0015):
     """每月定投策略"""
-    cash = 0
-    shares = 0
-    trades = []
-    portfolio_values = []
-    total_invested = 0
-
-    # 创建月份标识
-    data_copy = data.copy()
-    data_copy['YearMonth'] = data_copy.index.to_period('M')
-    current_month = None
-
-    for date, row in data_copy.iterrows():
-        price = row['Close']
-        ym = row['YearMonth']
-
-        # 新月开始，投入资金
-        if ym != current_month:
-            cash += monthly_investment
-            total_invested += monthly_investment
-            current_month = ym
-
-            # 立即购买
-            if cash > 0:
-                available_cash = cash * (1 - transaction_cost)
-                shares_to_buy = int(available_cash // price)
-
-                if shares_to_buy > 0:
-                    cost = shares_to_buy * price
-                    fee = cost * transaction_cost
-                    cash -= (cost + fee)
-                    shares += shares_to_buy
-
-                    trades.append({
-                        'date': date,
-                        'action': 'BUY',
-                        'price': price,
-                        'shares': shares_to_buy,
-                        'amount': cost
-                    })
-
-        portfolio_values.append(cash + shares * price)
-
-    final_value = cash + shares * data_copy.iloc[-1]['Close']
+    # 每月第一个交易日投入资金并立即购买
+    months = data.index.to_period('M')
+    new_month = np.r_[True, months[1:] != months[:-1]] if len(data) else np.zeros(0, dtype=bool)
+    deposits = np.where(new_month, float(monthly_investment), 0.0)
+    total_invested = monthly_investment * int(new_month.sum())
+
+    result = run_portfolio(data['Close'].values, new_month, deposits=deposits, commission=transaction_cost,
+                           sizing='net', pyramiding=True)
+
+    portfolio_values = list(result['equity'])
+    final_value = result['final_value']
     total_return = (final_value - total_invested) / total_invested * 100
 
     years = len(data) / 252
-    annual_return = (final_value / total_invested) ** (1 / years) - 1 if years > 0 else 0
+    annual_return = metrics.cagr(final_value / total_invested, years)
 
-    portfolio_series = pd.Series(portfolio_values, index=data.index)
-    rolling_max = portfolio_series.expanding().max()
-    drawdowns = (portfolio_series - rolling_max) / rolling_max * 100
-    max_drawdown = drawdowns.min()
+    max_drawdown = metrics.max_drawdown(portfolio_values)
 
     return {
         'total_invested': total_invested,
         'final_value': final_value,
         'total_return': total_return,
-        'annual_return': annual_return * 100,
+        'annual_return': annual_return,
         'max_drawdown': max_drawdown,
         'portfolio_values': portfolio_values,
-        'num_months': len(data_copy['YearMonth'].unique())
+        'num_months': len(months.unique())
     }
 
 
-def simple_stock_analysis():
+def simple_stock_analysis(provider=None):
     set_chinese_font()
 
     stock_code = "2330.TW"
@@ -620,7 +494,7 @@ def simple_stock_analysis():
 
     print(f"正在下载{stock_code}历史数据...")
     try:
-        data = yf.download(stock_code, start=start_date, end=end_date, auto_adjust=True)
+        data = fetch_bars(stock_code, start_date, end_date, provider)
         print(f"成功下载 {len(data)} 条数据")
     except Exception as e:
         print(f"下载数据时出错: {e}")
@@ -723,14 +597,9 @@ def simple_stock_analysis():
     for name, result in strategies.items():
         print(f"{name}: 收益率 {result['total_return']:.2f}%, 最大回撤 {result['max_drawdown']:.2f}%")
 
-    # 计算风险调整后收益
-    def calculate_risk_adjusted_return(return_pct, max_drawdown):
-        if max_drawdown >= 0:  # 避免除零或正值
-            return return_pct
-        return return_pct / abs(max_drawdown)
-
+    # 计算风险调整后收益：收益率/最大回撤（绝对值）
     risk_adjusted = {
-        name: calculate_risk_adjusted_return(result['total_return'], result['max_drawdown'])
+        name: metrics.return_drawdown_ratio(result['total_return'], result['max_drawdown'])
         for name, result in strategies.items()
     }
 
@@ -6,6 +6,7 @@ import os
 import re
 from matplotlib import font_manager
 import warnings
+from screener_cache import cached_frame
 
 warnings.filterwarnings('ignore')
 
@@ -14,8 +15,13 @@ plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
 plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
 
 
-def read_and_process_data(file_path):
-    """读取并处理股票数据"""
+def read_and_process_data(file_path, refresh=False):
+    """读取并处理股票数据（清洗结果按文件路径、修改时间和大小缓存，refresh=True时强制重新解析）"""
+    return cached_frame(file_path, parse_stock_list, refresh=refresh)
+
+
+def parse_stock_list(file_path):
+    """解析Excel并清洗股票数据"""
     try:
         # 检查文件是否存在
         if not os.path.exists(file_path):
@@ -0,0 +1,460 @@
+import ast
+
+import numpy as np
+
+from indicators import calculate_technical_indicators
+from position_kernel import EXIT_REASONS, holding_mask, run_positions
+from signal_kernel import cross_above, cross_below, shift, signal_masks
+
+# 策略规则：用表达式字符串描述买入、过滤、卖出和仓位，编译成指标列上的NumPy布尔运算
+#
+# 表达式语法（Python子集）：
+#   指标列名         Close, MA5, MA20, MA60, MA200, RSI, MACD, MACD_Signal, BB_Upper, Volume_MA20 ...
+#   比较/连续比较    RSI > 85, 40 < RSI < 65
+#   逻辑运算         and / or / not（逐元素）
+#   算术运算         + - * /（布尔值按0/1参与计算）
+#   函数             shift(列, n)  前n天的值
+#                    cross_above(a, b) / cross_below(a, b)  黄金交叉 / 死亡交叉
+#                    abs(x), max(a, b), min(a, b)
+#
+# 策略配置字段：
+#   name              显示名称
+#   entry             基础买入条件，默认 5MA上穿20MA 且 收盘价在200MA之上
+#   exit              卖出条件，默认 20MA下穿60MA
+#   filters           {原因: 表达式}，满足的条件数 >= filter_threshold（默认1，即任意一个）时放弃买入
+#   filter_messages   {原因: 中文提示模板}，模板中的 {列名:格式} 用当天的指标值填充；
+#                     被过滤时按filters的顺序打印第一个有提示的原因（见filter_message）
+#   require           买入时必须满足的附加条件
+#   risk_factors      {因子: 表达式}，各因子之和为风险分数 score
+#   risk_score        由score换算最终风险分数的表达式（可选）
+#   position_sizes    [(风险分数上限, 仓位, 说明), ...]，按顺序匹配第一个 风险分数 <= 上限 的档位
+#   default_size      超出所有档位时的 (仓位, 说明)
+#   stop_loss / take_profit / cooldown / max_holding
+#                     依赖路径的规则（止损、止盈比例，卖出后冷却天数，最长持有天数），
+#                     设置了任意一项的策略改用position_kernel的状态机求解持仓
+
+PATH_RULES = ('stop_loss', 'take_profit', 'cooldown', 'max_holding')
+
+BASE_ENTRY = 'cross_above(MA5, MA20) and Close > MA200'
+BASE_EXIT = 'cross_below(MA20, MA60)'
+
+STRATEGY_CONFIGS = {
+    'no_filter': {
+        'name': '无过滤策略',
+    },
+    'light_filter': {
+        'name': '轻量级过滤策略',
+        'filters': {
+            'extremely_overbought': 'RSI > 85',
+            'far_above_bb': 'Close > BB_Upper * 1.05',
+            'severe_macd_bearish': 'MACD < -2',
+            'far_below_200ma': 'Close < MA200 * 0.8',
+        },
+    },
+    'optimized_light_filter': {
+        'name': '优化轻量级过滤策略',
+        'filters': {
+            'extremely_overbought': 'RSI > 75',
+            'overbought_above_bb': 'RSI > 70 and Close > BB_Upper',
+            'macd_bearish_below_200ma': 'MACD < -0.5 and Close < MA200 * 0.95',
+        },
+    },
+    'mean_reversion': {
+        'name': '均值回归策略',
+        'entry': 'Close / MA20 < 0.95 and RSI < 35',
+        'exit': 'Close / MA20 > 1.05 and RSI > 65',
+    },
+    'strict_light_filter': {
+        'name': '严格轻量级过滤策略',
+        'filters': {
+            'extremely_overbought': 'RSI > 70',
+            'overbought_above_bb': 'RSI > 65 and Close > BB_Upper * 1.02',
+            'macd_bearish_below_200ma': 'MACD < 0 and Close < MA200 * 0.98',
+            'rsi_oversold': 'RSI < 30',
+            'macd_below_signal': 'MACD < MACD_Signal',
+        },
+        'filter_messages': {
+            'extremely_overbought': '过滤原因: RSI过高 {RSI:.1f}',
+            'overbought_above_bb': '过滤原因: RSI中等超买且突破布林带 RSI:{RSI:.1f}',
+            'macd_bearish_below_200ma': '过滤原因: MACD看跌且低于200MA MACD:{MACD:.3f}',
+        },
+    },
+    'enhanced_light_filter': {
+        'name': '增强版轻量级过滤策略',
+        'filters': {
+            'rsi_overbought': 'RSI > 72',
+            'rsi_oversold': 'RSI < 38',
+            'above_bb': 'Close > BB_Upper * 1.01',
+            'below_bb': 'Close < BB_Lower * 0.99',
+            'macd_bearish': 'MACD < MACD_Signal',
+            'low_volume': 'Volume < Volume_MA20 * 0.8',
+            'high_volatility': 'Volatility > 0.03',
+            'weak_trend': 'Trend_Strength < 0.05',
+        },
+        'filter_threshold': 2,
+    },
+    'conservative_filter': {
+        'name': '保守过滤策略',
+        'filters': {
+            'extremely_overbought': 'RSI > 82',
+            'extreme_breakout': 'Close > BB_Upper * 1.10',
+            'severe_downtrend': 'Close < MA200 * 0.80',
+        },
+        'filter_messages': {
+            'extremely_overbought': '保守过滤: RSI极端超买({RSI:.1f})',
+            'extreme_breakout': '保守过滤: 突破过多({Close:.2f} > {BB_Upper:.2f})',
+            'severe_downtrend': '保守过滤: 严重下跌趋势({Close:.2f} < {MA200:.2f})',
+        },
+    },
+    'pattern_based_filter': {
+        'name': '模式过滤策略',
+        'filters': {
+            'weak_volume_momentum': 'Volume < Volume_MA20 * 0.9 and shift(Volume, 1) < Volume_MA20 * 0.9',
+            'rsi_divergence': 'RSI < 45 and Close > shift(Close, 20) * 1.05',
+            'macd_weakness': 'MACD < 0 or MACD < MACD_Signal',
+            'volatility_squeeze': '(BB_Upper - BB_Lower) / BB_Lower < 0.05',
+            'distance_from_ma200': 'Close > MA200 * 1.15',
+        },
+        'filter_threshold': 2,
+    },
+    'risk_adjusted_position': {
+        'name': '风险调整仓位策略',
+        'risk_factors': {
+            'rsi_overbought': 'RSI > 70',
+            'low_volume': 'Volume < Volume_MA20 * 0.8',
+            'high_position': 'Close > MA200 * 1.15',
+            'macd_weak': 'MACD < MACD_Signal',
+            'high_volatility': 'Volatility > 0.03',
+        },
+        'position_sizes': [(0, 1.0, '低风险'), (1, 0.8, '中低风险'), (2, 0.6, '中风险')],
+        'default_size': (0.4, '高风险'),
+    },
+    'risk_adjusted_stop_loss': {
+        'name': '风险调整仓位+止损策略',
+        'risk_factors': {
+            'rsi_overbought': 'RSI > 70',
+            'low_volume': 'Volume < Volume_MA20 * 0.8',
+            'high_position': 'Close > MA200 * 1.15',
+            'macd_weak': 'MACD < MACD_Signal',
+            'high_volatility': 'Volatility > 0.03',
+        },
+        'position_sizes': [(0, 1.0, '低风险'), (1, 0.8, '中低风险'), (2, 0.6, '中风险')],
+        'default_size': (0.4, '高风险'),
+        'stop_loss': 0.08,
+        'cooldown': 5,
+    },
+    'refined_risk_adjusted': {
+        'name': '精细化风险调整策略',
+        'risk_factors': {
+            'rsi_risk': 'max(0, (RSI - 50) / 30)',
+            'volume_risk': 'max(0, 0.8 - Volume / Volume_MA20)',
+            'position_risk': 'max(0, (Close / MA200 - 1.1) / 0.5)',
+            'macd_risk': 'max(0, (MACD_Signal - MACD) / 2)',
+            'volatility_risk': 'min(1, Volatility / 0.04)',
+            'bb_position_risk': 'max(0, (Close - BB_Lower) / (BB_Upper - BB_Lower) - 0.8) * 5',
+        },
+        'risk_score': 'min(1, score / 3)',
+        'position_sizes': [(0.2, 1.0, '极低风险'), (0.4, 0.9, '低风险'), (0.6, 0.75, '中风险'),
+                           (0.8, 0.6, '高风险')],
+        'default_size': (0.4, '极高风险'),
+    },
+    'simplified_risk_adjustment': {
+        'name': '简化风险调整策略',
+        'risk_factors': {
+            'rsi_overbought': 'RSI > 70',
+            'low_volume': 'Volume < Volume_MA20 * 0.85',
+            'high_position': 'Close > MA200 * 1.12',
+        },
+        'position_sizes': [(0, 1.0, '优质'), (1, 0.7, '良好'), (2, 0.5, '谨慎')],
+        'default_size': (0.3, '高风险'),
+    },
+    'final_simplified_risk': {
+        'name': '最终版风险调整策略',
+        'risk_factors': {
+            'rsi_overbought': 'RSI > 72',
+            'low_volume': 'Volume < Volume_MA20 * 0.8',
+            'high_position': 'Close > MA200 * 1.15',
+        },
+        'position_sizes': [(0, 1.0, '优质'), (1, 0.75, '良好'), (2, 0.5, '谨慎')],
+        'default_size': (0.25, '高风险'),
+    },
+    'adaptive': {
+        'name': '自适应策略',
+        'require': ('(Trend_Strength > 0.15 and RSI < 70 and MACD > shift(MACD, 1))'
+                    ' or (not Trend_Strength > 0.15 and Volatility > 0.02'
+                    ' and 40 < RSI < 65 and Close > MA200 * 1.02)'
+                    ' or (not Trend_Strength > 0.15 and not Volatility > 0.02'
+                    ' and RSI < 75 and Close > MA200 * 0.98)'),
+    },
+    'improved_adaptive': {
+        'name': '改进自适应策略',
+        'require': ('(Trend_Strength > 0.2 and RSI < 75 and MACD > MACD_Signal and Close > MA200 * 1.02)'
+                    ' or (not Trend_Strength > 0.2 and Volatility > 0.025'
+                    ' and 35 < RSI < 65 and Close > MA200 * 1.05)'
+                    ' or (not Trend_Strength > 0.2 and not Volatility > 0.025'
+                    ' and 40 < RSI < 70 and MACD > -1.0)'),
+    },
+}
+
+
+def _as_bool(value):
+    return np.asarray(value).astype(bool)
+
+
+def _as_number(value):
+    value = np.asarray(value)
+    return value.astype(np.float64) if value.dtype == bool else value
+
+
+def _py_max(a, b):
+    # 与内置max一致：只有b严格大于a时取b（NaN时保留a）
+    a, b = _as_number(a), _as_number(b)
+    return np.where(b > a, b, a)
+
+
+def _py_min(a, b):
+    a, b = _as_number(a), _as_number(b)
+    return np.where(b < a, b, a)
+
+
+_FUNCTIONS = {
+    'shift': lambda values, periods=1: shift(values, int(periods)),
+    'cross_above': cross_above,
+    'cross_below': cross_below,
+    'abs': lambda value: np.abs(_as_number(value)),
+    'max': _py_max,
+    'min': _py_min,
+}
+
+_BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+}
+
+_COMPARE_OPS = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_compiled = {}
+
+
+def _compile_node(node):
+    """
+    将AST节点编译为 fn(columns, memo)；memo按子表达式文本缓存结果，多个策略共享同一个子表达式时只算一次
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        value = node.value
+        return lambda columns, memo: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+
+        def load(columns, memo):
+            if name not in columns:
+                raise ValueError(f"未知的指标列: {name}")
+            return columns[name]
+        return load
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_node(node.operand)
+        compute = lambda columns, memo: ~_as_bool(operand(columns, memo))
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        operand = _compile_node(node.operand)
+        compute = lambda columns, memo: -_as_number(operand(columns, memo))
+    elif isinstance(node, ast.BoolOp):
+        operands = [_compile_node(value) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def compute(columns, memo):
+            result = _as_bool(operands[0](columns, memo))
+            for operand in operands[1:]:
+                result = combine(result, _as_bool(operand(columns, memo)))
+            return result
+    elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        op = _BINARY_OPS[type(node.op)]
+
+        def compute(columns, memo):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return op(_as_number(left(columns, memo)), _as_number(right(columns, memo)))
+    elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPS for op in node.ops):
+        operands = [_compile_node(node.left)] + [_compile_node(value) for value in node.comparators]
+        ops = [_COMPARE_OPS[type(op)] for op in node.ops]
+
+        def compute(columns, memo):
+            values = [operand(columns, memo) for operand in operands]
+            result = ops[0](values[0], values[1])
+            for k in range(1, len(ops)):
+                result = result & ops[k](values[k], values[k + 1])
+            return result
+    elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+          and node.func.id in _FUNCTIONS and not node.keywords):
+        func = _FUNCTIONS[node.func.id]
+        args = [_compile_node(arg) for arg in node.args]
+        compute = lambda columns, memo: func(*[arg(columns, memo) for arg in args])
+    else:
+        raise ValueError(f"规则中不支持的语法: {ast.unparse(node)}")
+
+    key = ast.unparse(node)
+
+    def cached(columns, memo):
+        if key not in memo:
+            memo[key] = compute(columns, memo)
+        return memo[key]
+    return cached
+
+
+def compile_rule(expression):
+    """
+    编译规则表达式，返回 fn(columns, memo=None)；同一表达式只解析一次
+    """
+    if expression not in _compiled:
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"规则表达式有误: {expression} ({e.msg})")
+        node = _compile_node(tree.body)
+        _compiled[expression] = lambda columns, memo=None: node(columns, {} if memo is None else memo)
+    return _compiled[expression]
+
+
+def evaluate_rule(expression, columns, memo=None):
+    """
+    在指标列上计算规则表达式，columns为 {列名: 数组}（DataFrame也可以）
+    """
+    return compile_rule(expression)(columns, memo)
+
+
+def _position_sizes(config, score):
+    """
+    按风险分数映射仓位，返回 (仓位数组, 档位说明数组)
+    """
+    steps = config.get('position_sizes', [])
+    default_size, default_label = config.get('default_size', (1.0, ''))
+    conditions = [score <= upper for upper, _, _ in steps]
+    sizes = np.select(conditions, [size for _, size, _ in steps], default=default_size)
+    labels = np.select(conditions, [label for _, _, label in steps], default=default_label)
+    return sizes, labels
+
+
+def run_rule_strategies(stock_data, keys=None, configs=STRATEGY_CONFIGS, start=200):
+    """
+    一次计算多个规则策略
+
+    指标只计算一次，相同的子表达式在策略间共享，所有策略的持仓状态在一个二维数组上同时求解。
+    返回 {策略键: 结果字典}，结果字典包含：
+      df, buy_signals, sell_signals, filtered_count,
+      filtered (被过滤的 (日期, [原因])), entries (每次买入的 (风险分数, 仓位, 档位说明)),
+      exit_reasons (每次卖出的原因)
+    有risk_factors的策略买入信号为 (日期, 价格, 仓位)，其余为 (日期, 价格)
+    """
+    df = calculate_technical_indicators(stock_data)
+    columns = {name: df[name].values for name in df.columns}
+    memo = {}
+    keys = list(configs) if keys is None else list(keys)
+
+    bases, passes, exits, details = [], [], [], []
+    for key in keys:
+        config = configs[key]
+        base = _as_bool(evaluate_rule(config.get('entry', BASE_ENTRY), columns, memo))
+        passed = np.ones(len(df), dtype=bool)
+        hits = {}
+
+        if 'filters' in config:
+            hits = {reason: _as_bool(evaluate_rule(expression, columns, memo))
+                    for reason, expression in config['filters'].items()}
+            filter_score = np.sum(list(hits.values()), axis=0)
+            passed &= ~(filter_score >= config.get('filter_threshold', 1))
+        if 'require' in config:
+            passed &= _as_bool(evaluate_rule(config['require'], columns, memo))
+
+        score = None
+        if 'risk_factors' in config:
+            score = np.sum([_as_number(evaluate_rule(expression, columns, memo))
+                            for expression in config['risk_factors'].values()], axis=0).astype(np.float64)
+            if 'risk_score' in config:
+                score = np.asarray(evaluate_rule(config['risk_score'], dict(columns, score=score)),
+                                   dtype=np.float64)
+
+        bases.append(base)
+        passes.append(passed)
+        exits.append(_as_bool(evaluate_rule(config.get('exit', BASE_EXIT), columns, memo)))
+        details.append((hits, score))
+
+    bases, passes, exits = np.array(bases), np.array(passes), np.array(exits)
+    buys, sells, holding = signal_masks(bases & passes, exits, start)
+
+    # 依赖路径的策略单独跑状态机，覆盖对应行
+    exit_reasons = {}
+    for row, key in enumerate(keys):
+        config = configs[key]
+        if not any(rule in config for rule in PATH_RULES):
+            continue
+        positions = run_positions(bases[row] & passes[row], exits[row], columns['Close'],
+                                  stop_loss=config.get('stop_loss', 0), take_profit=config.get('take_profit', 0),
+                                  cooldown=config.get('cooldown', 0), start=start,
+                                  max_holding=config.get('max_holding', 0))
+        buys[row] = False
+        buys[row, positions['entry_idx']] = True
+        sells[row] = False
+        sells[row, positions['exit_idx']] = True
+        holding[row, 1:] = holding_mask(len(df), positions['entry_idx'], positions['exit_idx'])[:-1]
+        exit_reasons[key] = [EXIT_REASONS[reason] for reason in positions['exit_reason']]
+
+    filtered = bases & ~passes & ~holding
+    filtered[:, :start] = False
+
+    dates = df.index
+    close = columns['Close']
+    results = {}
+    for row, key in enumerate(keys):
+        config = configs[key]
+        hits, score = details[row]
+        buy_idx = np.flatnonzero(buys[row])
+        sell_idx = np.flatnonzero(sells[row])
+        filtered_idx = np.flatnonzero(filtered[row])
+
+        entries = []
+        if score is not None:
+            sizes, labels = _position_sizes(config, score)
+            entries = [(score[i], float(sizes[i]), str(labels[i])) for i in buy_idx]
+            buy_signals = [(dates[i], close[i], size) for i, (_, size, _) in zip(buy_idx, entries)]
+        else:
+            buy_signals = [(dates[i], close[i]) for i in buy_idx]
+
+        results[key] = {
+            'df': df,
+            'buy_signals': buy_signals,
+            'sell_signals': [(dates[i], close[i]) for i in sell_idx],
+            'filtered_count': len(filtered_idx),
+            'filtered': [(dates[i], [reason for reason, hit in hits.items() if hit[i]]) for i in filtered_idx],
+            'entries': entries,
+            'exit_reasons': exit_reasons.get(key, [EXIT_REASONS[0]] * len(sell_idx)),
+        }
+    return results
+
+
+def filter_message(config, reasons, row):
+    """
+    被过滤信号的中文提示：按filters的顺序取第一个在filter_messages中有模板的原因，没有时返回None
+    """
+    messages = config.get('filter_messages', {})
+    for reason in config.get('filters', {}):
+        if reason in reasons and reason in messages:
+            return messages[reason].format(**row)
+    return None
+
+
+def rule_signals(stock_data, key, configs=STRATEGY_CONFIGS):
+    """
+    单个规则策略，返回与原信号函数相同的 (df, buy_signals, sell_signals)
+    """
+    result = run_rule_strategies(stock_data, [key], configs)[key]
+    return result['df'], result['buy_signals'], result['sell_signals']
@@ -0,0 +1,160 @@
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data_provider import fetch_bars
+from price_store import BAR_COLUMNS, normalize_bars
+from stock_advance_strategy_comparison import SIGNAL_FUNCTIONS, backtest_analysis
+
+# 多进程批量运行 策略 × 股票，行情只写入一次共享内存，各进程直接映射读取
+
+STATS_COLUMNS = ['total_trades', 'win_rate', 'total_return', 'annualized_return', 'max_drawdown',
+                 'time_in_market', 'avg_position_size']
+
+# 子进程中的共享内存和已还原的行情（每个进程只还原一次）
+_worker_state = {}
+
+
+def _pack_universe(frames):
+    """
+    将 {代码: DataFrame} 写入两块共享内存（OHLCV浮点矩阵、日期int64），返回 (共享内存, 布局)
+    """
+    frames = {code: normalize_bars(df) for code, df in frames.items()}
+    total = sum(len(df) for df in frames.values())
+
+    values_shm = shared_memory.SharedMemory(create=True, size=max(total * len(BAR_COLUMNS) * 8, 1))
+    dates_shm = shared_memory.SharedMemory(create=True, size=max(total * 8, 1))
+    values = np.ndarray((total, len(BAR_COLUMNS)), dtype=np.float64, buffer=values_shm.buf)
+    dates = np.ndarray(total, dtype=np.int64, buffer=dates_shm.buf)
+
+    layout = {}
+    offset = 0
+    for code, df in frames.items():
+        n = len(df)
+        values[offset:offset + n] = df.reindex(columns=BAR_COLUMNS).values
+        dates[offset:offset + n] = df.index.values.astype('datetime64[ns]').astype(np.int64)
+        layout[code] = (offset, n)
+        offset += n
+
+    return (values_shm, dates_shm), {'values': values_shm.name, 'dates': dates_shm.name,
+                                     'total': total, 'codes': layout}
+
+
+def _init_worker(layout):
+    values_shm = shared_memory.SharedMemory(name=layout['values'])
+    dates_shm = shared_memory.SharedMemory(name=layout['dates'])
+    _worker_state.clear()
+    _worker_state.update(layout=layout, shm=(values_shm, dates_shm), frames={})
+
+
+def _worker_frame(code):
+    frames = _worker_state['frames']
+    if code not in frames:
+        layout = _worker_state['layout']
+        values_shm, dates_shm = _worker_state['shm']
+        offset, n = layout['codes'][code]
+        values = np.ndarray((layout['total'], len(BAR_COLUMNS)), dtype=np.float64, buffer=values_shm.buf)
+        dates = np.ndarray(layout['total'], dtype=np.int64, buffer=dates_shm.buf)
+        # 复制出本股票的切片，之后不再依赖共享内存的生命周期
+        frames[code] = pd.DataFrame(values[offset:offset + n].copy(), columns=BAR_COLUMNS,
+                                    index=pd.DatetimeIndex(dates[offset:offset + n].astype('datetime64[ns]'),
+                                                           name='Date'))
+    return frames[code]
+
+
+def evaluate_code(code, stock_data, strategies):
+    """
+    在一只股票上运行多个策略，返回统计行列表（策略内部的打印输出被屏蔽）
+    """
+    rows = []
+    for key in strategies:
+        name, signal_function = SIGNAL_FUNCTIONS[key]
+        row = {'code': code, 'strategy': key, 'name': name}
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, buy_signals, sell_signals = signal_function(stock_data)
+                stats, _, _ = backtest_analysis(buy_signals, sell_signals, name, stock_data=stock_data)
+            row['error'] = None
+        except Exception as e:
+            stats = None
+            row['error'] = str(e)
+
+        stats = stats or {'total_trades': 0}
+        row.update({column: stats.get(column, np.nan) for column in STATS_COLUMNS})
+        rows.append(row)
+    return rows
+
+
+def _run_task(code, strategies):
+    return evaluate_code(code, _worker_frame(code), strategies)
+
+
+def run_strategies(universe, strategies=None, start=None, end=None, provider=None, max_workers=None):
+    """
+    批量运行 策略 × 股票，返回合并后的统计表
+
+    universe: 股票代码列表（用fetch_bars取数）或 {代码: DataFrame}
+    strategies: SIGNAL_FUNCTIONS中的策略键，None表示全部
+    max_workers: 进程数，1时在当前进程中顺序运行
+    """
+    strategies = list(SIGNAL_FUNCTIONS) if strategies is None else list(strategies)
+    unknown = [key for key in strategies if key not in SIGNAL_FUNCTIONS]
+    if unknown:
+        raise ValueError(f"未知的策略: {', '.join(unknown)}")
+
+    if isinstance(universe, dict):
+        frames = universe
+    else:
+        frames = {}
+        for code in universe:
+            df = fetch_bars(code, start, end, provider)
+            if df.empty:
+                print(f"{code}: 没有行情数据，跳过")
+                continue
+            frames[code] = df
+
+    rows = []
+    if max_workers == 1 or len(frames) <= 1:
+        for code, df in frames.items():
+            rows.extend(evaluate_code(code, normalize_bars(df), strategies))
+    else:
+        shms, layout = _pack_universe(frames)
+        try:
+            workers = min(max_workers or os.cpu_count() or 1, len(frames))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(layout,)) as executor:
+                futures = {executor.submit(_run_task, code, strategies): code for code in frames}
+                for future in as_completed(futures):
+                    rows.extend(future.result())
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+
+    results = pd.DataFrame(rows, columns=['code', 'strategy', 'name'] + STATS_COLUMNS + ['error'])
+    order = {key: i for i, key in enumerate(strategies)}
+    results['_order'] = results['strategy'].map(order)
+    return (results.sort_values(['code', '_order']).drop(columns='_order').reset_index(drop=True))
+
+
+if __name__ == "__main__":
+    import sys
+    from datetime import datetime, timedelta
+
+    # 用法: python strategy_runner.py 2345.TW 2891.TW [--strategies no_filter,pattern_based_filter]
+    args = sys.argv[1:]
+    selected = None
+    if '--strategies' in args:
+        k = args.index('--strategies')
+        selected = args[k + 1].split(',')
+        args = args[:k] + args[k + 2:]
+
+    end_date = datetime.now()
+    table = run_strategies(args or ['2345.TW'], selected, end_date - timedelta(days=365 * 10), end_date)
+    pd.set_option('display.width', 200)
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
@@ -0,0 +1,320 @@
+import json
+import math
+import os
+from collections import deque
+
+# 逐根K线更新的指标：每次 update(x) 为O(1)，返回最新值（数据不足时为nan）
+# 输出与indicators.py中的批量版本（pandas rolling/ewm）在浮点误差范围内一致
+
+
+class SMA:
+    """
+    简单移动平均，等同 rolling(window).mean()
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.updates = 0
+        self.value = math.nan
+
+    def update(self, x):
+        self.values.append(x)
+        self.total += x
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+            self.updates += 1
+            if self.updates % self.window == 0:
+                # 每滚动一个窗口重新求和一次（均摊O(1)），避免累加误差
+                self.total = math.fsum(self.values)
+        self.value = self.total / self.window if len(self.values) == self.window else math.nan
+        return self.value
+
+    def state(self):
+        return {'window': self.window, 'values': list(self.values), 'total': self.total,
+                'updates': self.updates, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(state['window'])
+        obj.values = deque(state['values'])
+        obj.total = state['total']
+        obj.updates = state['updates']
+        obj.value = state['value']
+        return obj
+
+
+class RollingStd:
+    """
+    滚动样本标准差（ddof=1），等同 rolling(window).std()
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+        self.value = math.nan
+
+    def update(self, x):
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+            self.updates += 1
+            if self.updates % self.window == 0:
+                self.total = math.fsum(self.values)
+                self.total_sq = math.fsum(v * v for v in self.values)
+
+        if len(self.values) == self.window and self.window > 1:
+            mean = self.total / self.window
+            variance = (self.total_sq - self.window * mean * mean) / (self.window - 1)
+            self.value = math.sqrt(max(variance, 0.0))
+        else:
+            self.value = math.nan
+        return self.value
+
+    def state(self):
+        return {'window': self.window, 'values': list(self.values), 'total': self.total,
+                'total_sq': self.total_sq, 'updates': self.updates, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(state['window'])
+        obj.values = deque(state['values'])
+        obj.total = state['total']
+        obj.total_sq = state['total_sq']
+        obj.updates = state['updates']
+        obj.value = state['value']
+        return obj
+
+
+class EMA:
+    """
+    指数移动平均，等同 ewm(span=span, adjust=False).mean()
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.value = math.nan
+
+    def update(self, x):
+        if math.isnan(self.value):
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+    def state(self):
+        return {'span': self.span, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(state['span'])
+        obj.value = state['value']
+        return obj
+
+
+class MACD:
+    """
+    MACD，update返回 (MACD线, 信号线, 柱状图)
+    """
+
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9):
+        self.fast = EMA(fast_period)
+        self.slow = EMA(slow_period)
+        self.signal = EMA(signal_period)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, x):
+        macd_line = self.fast.update(x) - self.slow.update(x)
+        signal_line = self.signal.update(macd_line)
+        self.value = (macd_line, signal_line, macd_line - signal_line)
+        return self.value
+
+    def state(self):
+        return {'fast': self.fast.state(), 'slow': self.slow.state(), 'signal': self.signal.state(),
+                'value': list(self.value)}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls()
+        obj.fast = EMA.from_state(state['fast'])
+        obj.slow = EMA.from_state(state['slow'])
+        obj.signal = EMA.from_state(state['signal'])
+        obj.value = tuple(state['value'])
+        return obj
+
+
+class RSI:
+    """
+    RSI
+
+    method='sma'：涨跌幅的简单移动平均，与calculate_rsi一致
+    method='wilder'：Wilder平滑（ewm(alpha=1/period, adjust=False)，首值为前period个涨跌幅的平均）
+    """
+
+    def __init__(self, period=14, method='sma'):
+        self.period = period
+        self.method = method
+        self.prev = math.nan
+        self.gain = SMA(period)
+        self.loss = SMA(period)
+        self.avg_gain = math.nan
+        self.avg_loss = math.nan
+        self.count = 0
+        self.value = math.nan
+
+    def update(self, x):
+        if math.isnan(self.prev):
+            self.prev = x
+            if self.method != 'wilder':
+                # 批量版本中第一天的diff为NaN，被where替换成0后参与了滚动平均
+                self.gain.update(0.0)
+                self.loss.update(0.0)
+            return self.value
+
+        delta = x - self.prev
+        self.prev = x
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+
+        if self.method == 'wilder':
+            self.count += 1
+            if self.count <= self.period:
+                self.gain.update(gain)
+                self.loss.update(loss)
+                if self.count == self.period:
+                    self.avg_gain, self.avg_loss = self.gain.value, self.loss.value
+            else:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+            avg_gain, avg_loss = self.avg_gain, self.avg_loss
+        else:
+            avg_gain, avg_loss = self.gain.update(gain), self.loss.update(loss)
+
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            self.value = math.nan
+        elif avg_loss == 0:
+            self.value = 100.0 if avg_gain > 0 else math.nan
+        else:
+            self.value = 100 - 100 / (1 + avg_gain / avg_loss)
+        return self.value
+
+    def state(self):
+        return {'period': self.period, 'method': self.method, 'prev': self.prev,
+                'gain': self.gain.state(), 'loss': self.loss.state(),
+                'avg_gain': self.avg_gain, 'avg_loss': self.avg_loss, 'count': self.count,
+                'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(state['period'], state['method'])
+        obj.prev = state['prev']
+        obj.gain = SMA.from_state(state['gain'])
+        obj.loss = SMA.from_state(state['loss'])
+        obj.avg_gain = state['avg_gain']
+        obj.avg_loss = state['avg_loss']
+        obj.count = state['count']
+        obj.value = state['value']
+        return obj
+
+
+class Bollinger:
+    """
+    布林带，update返回 (中轨, 上轨, 下轨)
+    """
+
+    def __init__(self, window=20, num_std=2):
+        self.num_std = num_std
+        self.middle = SMA(window)
+        self.std = RollingStd(window)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, x):
+        middle = self.middle.update(x)
+        std = self.std.update(x)
+        self.value = (middle, middle + std * self.num_std, middle - std * self.num_std)
+        return self.value
+
+    def state(self):
+        return {'num_std': self.num_std, 'middle': self.middle.state(), 'std': self.std.state(),
+                'value': list(self.value)}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(num_std=state['num_std'])
+        obj.middle = SMA.from_state(state['middle'])
+        obj.std = RollingStd.from_state(state['std'])
+        obj.value = tuple(state['value'])
+        return obj
+
+
+class IndicatorSet:
+    """
+    与calculate_technical_indicators对应的一组增量指标，update(close, volume) 返回当日指标字典
+    """
+
+    def __init__(self):
+        self.ma = {window: SMA(window) for window in (5, 20, 60, 200)}
+        self.macd = MACD()
+        self.rsi = RSI()
+        self.bollinger = Bollinger()
+        self.volume_ma20 = SMA(20)
+        self.last_date = None
+        self.value = {}
+
+    def update(self, close, volume=math.nan, date=None):
+        row = {f'MA{window}': sma.update(close) for window, sma in self.ma.items()}
+        row['MACD'], row['MACD_Signal'], row['MACD_Histogram'] = self.macd.update(close)
+        row['RSI'] = self.rsi.update(close)
+        row['BB_Middle'], row['BB_Upper'], row['BB_Lower'] = self.bollinger.update(close)
+        row['Trend_Strength'] = abs(close - row['MA200']) / row['MA200']
+        row['Volatility'] = self.bollinger.std.value / row['BB_Middle']
+        row['Volume_MA20'] = self.volume_ma20.update(volume)
+        if date is not None:
+            self.last_date = str(date)
+        self.value = row
+        return row
+
+    def state(self):
+        return {'ma': {str(window): sma.state() for window, sma in self.ma.items()},
+                'macd': self.macd.state(), 'rsi': self.rsi.state(),
+                'bollinger': self.bollinger.state(), 'volume_ma20': self.volume_ma20.state(),
+                'last_date': self.last_date, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls()
+        obj.ma = {int(window): SMA.from_state(s) for window, s in state['ma'].items()}
+        obj.macd = MACD.from_state(state['macd'])
+        obj.rsi = RSI.from_state(state['rsi'])
+        obj.bollinger = Bollinger.from_state(state['bollinger'])
+        obj.volume_ma20 = SMA.from_state(state['volume_ma20'])
+        obj.last_date = state['last_date']
+        obj.value = state['value']
+        return obj
+
+
+def save_state(indicator, path):
+    """
+    将指标状态保存为JSON（先写临时文件再替换）
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(indicator.state(), f)
+    os.replace(tmp_path, path)
+
+
+def load_state(cls, path):
+    """
+    从JSON恢复指标，例如 load_state(IndicatorSet, 'state/2330.json')
+    """
+    with open(path, encoding='utf-8') as f:
+        return cls.from_state(json.load(f))
@@ -1,20 +1,12 @@
 import mplfinance as mpf
-import yfinance as yf
+from price_store import load_bars
+from resample import load_resampled
 
 # 获取台积电（TSM）的历史数据
-data = yf.download('2330.TW', start='2005-01-01', end='2025-02-21')  # 调整结束日期为当前日期
-
-# 重置多级索引，将多级索引转换为单级索引
-data.columns = data.columns.get_level_values(0)  # 取第一层索引作为列名
+data = load_bars('2330.TW', start='2005-01-01', end='2025-02-21')  # 从本地价格仓库读取，只补抓缺少的日线
 
 # 将日线数据转换为季线数据
-quarterly_data = data.resample('QE').agg({
-    'Open': 'first',
-    'High': 'max',
-    'Low': 'min',
-    'Close': 'last',
-    'Volume': 'sum'
-}).dropna()
+quarterly_data = load_resampled('2330.TW', 'Q', start='2005-01-01', end='2025-02-21')  # 已保存的季线只重算最后一季
 
 # 确保列名正确（首字母大写）
 print("季度数据列名:", quarterly_data.columns)
@@ -0,0 +1,45 @@
+import pytest
+
+import bench_backtests
+import stock_backtesting_final_optimixed as final_optimixed
+from bench_backtests import bench_case, synthetic_bars
+
+
+def native(data):
+    return final_optimixed.calculate_buy_hold_manually(data)
+
+
+def library(data):
+    return dict(native(data), final_value=native(data)['final_value'] + 1.0, backtest_results={})
+
+
+def fallback(data):
+    return dict(native(data), fallback=True)
+
+
+def test_skipped_without_backtesting(monkeypatch):
+    monkeypatch.setattr(final_optimixed, 'Backtest', None)
+    row = bench_case('buy_hold', native, library, synthetic_bars(300))
+    assert row['library'] is None and 'skipped' in row
+
+
+def test_deltas_only_for_library_results(monkeypatch):
+    # 只替换可用性检查，library实现用本地函数代替
+    monkeypatch.setattr(final_optimixed, 'Backtest', object)
+    data = synthetic_bars(300)
+
+    row = bench_case('buy_hold', native, library, data)
+    assert row['library_fallback'] is False
+    assert row['deltas']['final_value'] == 1.0
+    assert row['speedup'] is not None
+
+    row = bench_case('buy_hold', native, fallback, data)
+    assert row['library_fallback'] is True
+    assert row['deltas'] is None and row['speedup'] is None
+
+
+@pytest.mark.skipif(final_optimixed.Backtest is not None, reason="backtesting已安装")
+def test_every_case_falls_back_without_backtesting():
+    data = synthetic_bars(300)
+    for name, _, library_function in bench_backtests.CASES:
+        assert bench_backtests._run(library_function, data)['fallback'], name
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from data_provider import SyntheticProvider
+from downloader import download_many
+
+
+def failing_provider(code, start, end):
+    raise ConnectionError(f"{code} unavailable")
+
+
+def test_store_path_reports_provider_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def progress(code, ok, done, total, seconds):
+        calls.append((code, ok))
+
+    results, errors = download_many(['2330.TW', '2317.TW'], start='2020-01-01', end='2020-03-01',
+                                    provider=failing_provider, max_retries=1, backoff=0, rate=0,
+                                    progress=progress)
+    assert results == {}
+    assert set(errors) == {'2330.TW', '2317.TW'}
+    assert all(isinstance(e, ConnectionError) for e in errors.values())
+    assert sorted(calls) == [('2317.TW', False), ('2330.TW', False)]
+    assert not (tmp_path / 'data' / 'store').exists() or not any((tmp_path / 'data' / 'store').iterdir())
+
+
+def test_store_path_returns_bars(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    provider = SyntheticProvider()
+    results, errors = download_many(['2330.TW'], start='2020-01-01', end='2020-03-01', provider=provider,
+                                    backoff=0, rate=0)
+    assert errors == {}
+    bars = results['2330.TW']
+    assert len(bars) > 0
+    assert bars.index[0] >= pd.Timestamp('2020-01-01') and bars.index[-1] < pd.Timestamp('2020-03-01')
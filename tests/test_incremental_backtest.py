@@ -0,0 +1,69 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+import incremental_backtest
+from data_provider import generate_gbm_bars
+from incremental_backtest import MACrossBacktest, _same_state, checkpoint_path
+from stock_backtesting_final_optimixed import backtest_ma_cross_optimized
+
+
+def bars(n=900, seed=3):
+    return generate_gbm_bars(pd.bdate_range('2012-01-01', periods=n, name='Date'), sigma=0.4, seed=seed)
+
+
+def run(*args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return incremental_backtest.incremental_backtest(*args, **kwargs)
+
+
+def test_resume_matches_fresh_run(tmp_path):
+    data = bars()
+    state_dir = str(tmp_path)
+    for end in (300, 301, 550, 551, len(data)):
+        result = run('TEST', data.iloc[:end], state_dir=state_dir)
+    fresh = MACrossBacktest()
+    fresh.advance(data)
+    resumed = incremental_backtest.load_state(MACrossBacktest, checkpoint_path('TEST', state_dir))
+    assert _same_state(resumed, fresh)
+    assert result == fresh.result()
+    assert result['bars'] == len(data)
+
+
+def test_check_mode_passes_after_resume(tmp_path):
+    data = bars()
+    run('TEST', data.iloc[:500], state_dir=str(tmp_path))
+    result = run('TEST', data, state_dir=str(tmp_path), check=True)
+    assert result['last_date'] == str(data.index[-1])
+
+
+def test_matches_vectorized_backtest():
+    data = bars(seed=5)
+    backtest = MACrossBacktest()
+    backtest.advance(data)
+    result = backtest.result()
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = backtest_ma_cross_optimized(data)
+    assert result['num_trades'] == expected['num_trades']
+    for key in ('final_value', 'total_return', 'annual_return', 'max_drawdown'):
+        assert result[key] == pytest.approx(expected[key], rel=1e-9)
+
+
+def test_revised_close_and_changed_params_rebuild(tmp_path):
+    data = bars()
+    state_dir = str(tmp_path)
+    run('TEST', data.iloc[:600], state_dir=state_dir)
+
+    revised = data.copy()
+    revised.iloc[599, revised.columns.get_loc('Close')] *= 1.01
+    result = run('TEST', revised, state_dir=state_dir)
+    fresh = MACrossBacktest()
+    fresh.advance(revised)
+    assert result == fresh.result()
+
+    result = run('TEST', data, state_dir=state_dir, fast=10, slow=30)
+    fresh = MACrossBacktest(fast=10, slow=30)
+    fresh.advance(data)
+    assert result == fresh.result()
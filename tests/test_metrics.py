@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import metrics
+
+
+def equity_curves(rows=3, n=600, seed=0):
+    returns = np.random.default_rng(seed).normal(0.0004, 0.015, (rows, n))
+    return 1e6 * np.cumprod(1 + returns, axis=1)
+
+
+def test_cagr():
+    assert metrics.cagr(2.0, 1.0) == pytest.approx(100.0)
+    assert metrics.cagr(1.21, 2.0) == pytest.approx(10.0)
+    assert metrics.cagr(1.5, 0) == 0.0
+    np.testing.assert_allclose(metrics.cagr(np.array([1.0, 4.0]), 2.0), [0.0, 100.0])
+
+
+def test_drawdown_matches_pandas_expanding():
+    for row in equity_curves():
+        series = pd.Series(row)
+        expected = ((series - series.expanding().max()) / series.expanding().max()).min() * 100
+        assert metrics.max_drawdown(row) == pytest.approx(expected)
+    np.testing.assert_allclose(metrics.max_drawdown(equity_curves()),
+                               [metrics.max_drawdown(row) for row in equity_curves()])
+    # 期初资金也算作最高点
+    assert metrics.max_drawdown([90.0, 95.0], initial=100.0) == pytest.approx(-10.0)
+
+
+def test_drawdown_duration_matches_loop():
+    for row in equity_curves():
+        peak, last_peak, longest = -np.inf, 0, 0
+        for i, value in enumerate(row):
+            if value >= peak:
+                peak, last_peak = value, i
+            longest = max(longest, i - last_peak)
+        assert metrics.drawdown_duration(row) == longest
+
+
+def test_rolling_max_drawdown_matches_loop_and_chunking():
+    equity = equity_curves(rows=2, n=300)
+    window = 40
+    expected = np.full(equity.shape, np.nan)
+    for row in range(len(equity)):
+        for end in range(window - 1, equity.shape[1]):
+            expected[row, end] = metrics.max_drawdown(equity[row, end - window + 1:end + 1])
+    np.testing.assert_allclose(metrics.rolling_max_drawdown(equity, window), expected, equal_nan=True)
+    for max_elements in (1, 97, 2 ** 22):
+        np.testing.assert_array_equal(metrics.rolling_max_drawdown(equity, window, max_elements),
+                                      metrics.rolling_max_drawdown(equity, window))
+    assert np.isnan(metrics.rolling_max_drawdown(equity[0], 301)).all()
+
+
+def test_rolling_ratios_match_pandas():
+    equity = equity_curves(rows=1)[0]
+    returns = pd.Series(equity).pct_change()
+    window = 60
+    expected = returns.rolling(window).mean() / returns.rolling(window).std() * np.sqrt(252)
+    result = metrics.rolling_sharpe(equity, window)
+    np.testing.assert_allclose(result[window:], expected.values[window:], rtol=1e-6)
+    assert np.isnan(result[:window]).all()
+
+
+def test_performance_summary_matches_single_metrics():
+    equity = equity_curves()
+    summary = metrics.performance_summary(equity)
+    np.testing.assert_allclose(summary['annualized_return'], metrics.annualized_return(equity))
+    np.testing.assert_allclose(summary['max_drawdown'], metrics.max_drawdown(equity))
+    np.testing.assert_allclose(summary['sharpe'], metrics.sharpe_ratio(equity))
+    np.testing.assert_allclose(summary['sortino'], metrics.sortino_ratio(equity))
+    np.testing.assert_allclose(summary['calmar'], metrics.calmar_ratio(equity))
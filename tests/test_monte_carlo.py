@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from monte_carlo import block_bootstrap, bootstrap_trades, confidence_intervals, path_stats, prob_better
+
+
+def test_path_stats_matches_loop():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.01, 0.05, (20, 30))
+    total, annual, drawdown = path_stats(returns, 2.0)
+    for row in range(len(returns)):
+        equity, peak, worst = 1.0, 1.0, 0.0
+        for r in returns[row]:
+            equity *= 1 + r
+            peak = max(peak, equity)
+            worst = min(worst, (equity - peak) / peak * 100)
+        assert total[row] == pytest.approx((equity - 1) * 100)
+        assert annual[row] == pytest.approx((equity ** 0.5 - 1) * 100)
+        assert drawdown[row] == pytest.approx(worst)
+
+
+def test_bootstrap_is_reproducible_and_spawned_seeds_differ():
+    trades = [5.0, -3.0, 8.0, -1.0, 2.0]
+    a = bootstrap_trades(trades, 1.0, 1000, seed=7, chunk_size=300)
+    b = bootstrap_trades(trades, 1.0, 1000, seed=7)
+    np.testing.assert_array_equal(a['total_return'], b['total_return'])
+
+    first, second = np.random.SeedSequence(7).spawn(2)
+    c = bootstrap_trades(trades, 1.0, 1000, seed=first)
+    d = bootstrap_trades(trades, 1.0, 1000, seed=second)
+    assert not np.array_equal(c['total_return'], d['total_return'])
+    # 同一组交易独立抽样，优劣概率应接近一半
+    assert 0.4 < prob_better(c, d) < 0.6
+
+
+def test_block_bootstrap_intervals_are_ordered():
+    daily = np.random.default_rng(1).normal(0.0005, 0.01, 500)
+    samples = block_bootstrap(daily, 400, block_size=20, seed=3)
+    assert all(len(values) == 400 for values in samples.values())
+    for low, median, high in confidence_intervals(samples).values():
+        assert low <= median <= high
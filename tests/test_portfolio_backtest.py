@@ -0,0 +1,42 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from data_provider import generate_gbm_bars
+from portfolio_backtest import portfolio_backtest, trend_signal
+from universe_indicators import universe_matrix
+
+
+def trending_universe():
+    dates = pd.bdate_range('2015-01-01', periods=500, name='Date')
+    frames = {code: generate_gbm_bars(dates, mu=0.3, sigma=0.1, seed=seed)
+              for seed, code in enumerate(['A', 'B', 'C'])}
+    # B在第300天停牌一天，C在第100天才上市
+    frames['B'] = frames['B'].drop(dates[300])
+    frames['C'] = frames['C'].iloc[100:]
+    return frames
+
+
+def test_trend_signal_keeps_halted_name():
+    frames = trending_universe()
+    codes, dates, close = universe_matrix(frames)
+    signal = trend_signal(close)
+    b, c = codes.index('B'), codes.index('C')
+
+    # 单独对B计算的结果在交易日上一致，停牌日沿用前一天
+    alone = trend_signal(frames['B']['Close'].values[np.newaxis, :])[0]
+    np.testing.assert_array_equal(signal[b, dates.get_indexer(frames['B'].index)], alone)
+    assert signal[b, 300] == signal[b, 299]
+    assert signal[b, 300:].mean() > 0.9
+    assert not signal[c, :299].any()
+
+
+def test_halt_does_not_change_holdings():
+    frames = trending_universe()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = portfolio_backtest(frames, rebalance=20)
+    b = result['codes'].index('B')
+    held = result['shares'][b, 280:]
+    assert (held > 0).all()
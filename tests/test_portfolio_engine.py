@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from data_provider import generate_gbm_bars
+from portfolio_engine import RECORD_DTYPE, TRADE_DTYPE, dated_records, run_portfolio
+
+
+def sample(n=400, seed=0):
+    data = generate_gbm_bars(pd.bdate_range('2018-01-01', periods=n, name='Date'), sigma=0.4, seed=seed)
+    rng = np.random.default_rng(seed)
+    return data, rng.random(n) < 0.05, rng.random(n) < 0.05
+
+
+def test_trades_match_orders():
+    data, buy, sell = sample()
+    close = data['Close'].values
+    result = run_portfolio(close, buy, sell, initial_cash=1e6)
+    trades = result['trades']
+    assert trades.dtype == TRADE_DTYPE and len(trades) > 2
+
+    orders = np.flatnonzero(result['orders'])
+    np.testing.assert_array_equal(trades['index'], orders)
+    np.testing.assert_array_equal(np.where(trades['action'] == 'BUY', 1, -1) * trades['shares'],
+                                  result['orders'][orders])
+    np.testing.assert_allclose(trades['amount'], trades['shares'] * close[orders])
+    np.testing.assert_allclose(trades['cash'], result['cash'][orders], rtol=1e-9)
+
+
+def test_dated_records_with_deposits():
+    data, _, _ = sample(n=120)
+    close = data['Close'].values
+    deposits = np.zeros(len(data))
+    deposits[::30] = 10000.0
+    result = run_portfolio(close, np.ones(len(data), dtype=bool), deposits=deposits, sizing='net', pyramiding=True)
+    records = dated_records(data.index, close, result, deposits, 'MONTHLY_IN')
+    assert records.dtype == RECORD_DTYPE
+    assert len(records) == len(result['trades']) + 4
+    assert (np.diff(records['date'].astype(np.int64)) >= 0).all()
+
+    # 投入记录排在当天的买入之前，买入后的组合价值等于当天资产
+    deposited = records[records['action'] == 'MONTHLY_IN']
+    np.testing.assert_array_equal(deposited['date'], data.index[::30].values)
+    np.testing.assert_allclose(deposited['value'], 10000.0)
+    bought = records[records['action'] == 'BUY']
+    days = data.index.get_indexer(bought['date'])
+    np.testing.assert_allclose(bought['portfolio_value'], result['equity'][days], rtol=1e-9)
+    assert records['action'][0] == 'MONTHLY_IN' and records['action'][1] == 'BUY'
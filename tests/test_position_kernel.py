@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import position_kernel
+from position_kernel import EXIT_MAX_HOLDING, EXIT_STOP_LOSS, holding_mask, run_positions
+
+
+def reference(entries, exits, close, stop_loss=0.0, take_profit=0.0, cooldown=0, start=0, max_holding=0):
+    # 未编译的逐日状态机作为参照
+    n = len(entries)
+    entry_idx = np.empty(n, dtype=np.int64)
+    exit_idx = np.empty(n, dtype=np.int64)
+    exit_reason = np.empty(n, dtype=np.int64)
+    n_entries, n_exits = position_kernel._state_machine(entries, exits, close, stop_loss, take_profit, cooldown,
+                                                        start, max_holding, entry_idx, exit_idx, exit_reason)
+    return entry_idx[:n_entries], exit_idx[:n_exits], exit_reason[:n_exits]
+
+
+def random_case(rng):
+    n = int(rng.integers(2, 400))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    entries = rng.random(n) < rng.uniform(0.01, 0.5)
+    exits = rng.random(n) < rng.uniform(0.0, 0.3)
+    params = {
+        'stop_loss': float(rng.choice([0.0, 0.03, 0.1])),
+        'take_profit': float(rng.choice([0.0, 0.05, 0.2])),
+        'cooldown': int(rng.integers(0, 5)),
+        'start': int(rng.integers(0, n)),
+        'max_holding': int(rng.choice([0, 1, 5, 20])),
+    }
+    return entries, exits, close, params
+
+
+def test_event_driven_matches_state_machine():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        entries, exits, close, params = random_case(rng)
+        expected = reference(entries, exits, close, **params)
+        result = position_kernel._event_driven(entries, exits, close, **params)
+        for got, want in zip(result, expected):
+            np.testing.assert_array_equal(got, want)
+
+
+def test_run_positions_matches_reference_and_sizes():
+    rng = np.random.default_rng(1)
+    entries, exits, close, params = random_case(rng)
+    sizes = rng.uniform(0.1, 1.0, len(entries))
+    result = run_positions(entries, exits, close, sizes=sizes, **params)
+    entry_idx, exit_idx, exit_reason = reference(entries, exits, close, **params)
+    np.testing.assert_array_equal(result['entry_idx'], entry_idx)
+    np.testing.assert_array_equal(result['exit_idx'], exit_idx)
+    np.testing.assert_array_equal(result['exit_reason'], exit_reason)
+    np.testing.assert_array_equal(result['sizes'], sizes[entry_idx])
+
+
+def test_stop_loss_and_max_holding_reasons():
+    close = np.array([100, 100, 95, 89, 90, 90, 90, 90], dtype=float)
+    entries = np.array([0, 1, 0, 0, 1, 0, 0, 0], dtype=bool)
+    exits = np.zeros(8, dtype=bool)
+    result = run_positions(entries, exits, close, stop_loss=0.1, max_holding=2)
+    assert result['entry_idx'].tolist() == [1, 4]
+    assert result['exit_idx'].tolist() == [3, 6]
+    assert result['exit_reason'].tolist() == [EXIT_STOP_LOSS, EXIT_MAX_HOLDING]
+    assert holding_mask(8, result['entry_idx'], result['exit_idx']).tolist() == [
+        False, True, True, False, True, True, False, False]
+
+
+def test_stop_loss_requires_close():
+    with pytest.raises(ValueError):
+        run_positions([True, False], [False, True], stop_loss=0.1)
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from data_provider import generate_gbm_bars
+from price_store import write_store
+from resample import load_resampled, resample_bars
+
+
+def assert_same(result, expected):
+    # 周期线读回后索引不带freq属性，只比较数值和日期
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+
+def daily_bars(start, end, seed=0):
+    return generate_gbm_bars(pd.bdate_range('2000-01-03', '2015-12-31', name='Date'), seed=seed).loc[start:end]
+
+
+def test_matches_resample_bars_with_end(tmp_path):
+    store = str(tmp_path)
+    daily = daily_bars('2010-01-01', '2012-12-31')
+    write_store('TEST', daily, store)
+    for freq in ('W', 'M', 'Q', 'Y'):
+        assert_same(load_resampled('TEST', freq, store_dir=store), resample_bars(daily, freq))
+        end = '2012-05-17'
+        assert_same(load_resampled('TEST', freq, end=end, store_dir=store),
+                                      resample_bars(daily[daily.index < end], freq))
+
+
+def test_rebuilds_after_head_backfill(tmp_path):
+    store = str(tmp_path)
+    write_store('TEST', daily_bars('2010-01-01', '2011-12-31'), store)
+    assert len(load_resampled('TEST', 'Q', store_dir=store)) == 8
+
+    backfilled = daily_bars('2005-01-01', '2011-12-31')
+    write_store('TEST', backfilled, store)
+    result = load_resampled('TEST', 'Q', store_dir=store)
+    assert len(result) == 28
+    assert_same(result, resample_bars(backfilled, 'Q'))
+
+
+def test_rebuilds_after_backfill_inside_first_period(tmp_path):
+    store = str(tmp_path)
+    write_store('TEST', daily_bars('2010-02-15', '2010-12-31'), store)
+    load_resampled('TEST', 'Q', store_dir=store)
+
+    backfilled = daily_bars('2010-01-01', '2010-12-31')
+    write_store('TEST', backfilled, store)
+    assert_same(load_resampled('TEST', 'Q', store_dir=store), resample_bars(backfilled, 'Q'))
+
+
+def test_appended_bars_update_last_period(tmp_path):
+    store = str(tmp_path)
+    write_store('TEST', daily_bars('2010-01-01', '2010-05-14'), store)
+    load_resampled('TEST', 'Q', store_dir=store)
+
+    extended = daily_bars('2010-01-01', '2010-11-30')
+    write_store('TEST', extended, store)
+    assert_same(load_resampled('TEST', 'Q', store_dir=store), resample_bars(extended, 'Q'))
@@ -0,0 +1,68 @@
+import os
+
+import pandas as pd
+
+import metrics
+import portfolio_engine
+from data_provider import generate_gbm_bars
+from result_cache import cache_key, cached_result, evict, strategy_version
+
+
+def bars(n=100, seed=0):
+    return generate_gbm_bars(pd.bdate_range('2020-01-01', periods=n, name='Date'), seed=seed)
+
+
+def counting(calls, fallback=False):
+    def backtest(data, scale=1):
+        calls.append(len(data))
+        result = {'final_value': float(data['Close'].iloc[-1]) * scale}
+        if fallback:
+            result['fallback'] = True
+        return result
+    return backtest
+
+
+def test_hit_and_invalidation(tmp_path):
+    calls = []
+    backtest = counting(calls)
+    data = bars()
+    first = cached_result(backtest, data, cache_dir=str(tmp_path))
+    assert cached_result(backtest, data, cache_dir=str(tmp_path)) == first
+    assert len(calls) == 1
+
+    # 参数、行情、version变动或refresh时重新计算
+    cached_result(backtest, data, cache_dir=str(tmp_path), scale=2)
+    cached_result(backtest, bars(101), cache_dir=str(tmp_path))
+    cached_result(backtest, data, version='1.0', cache_dir=str(tmp_path))
+    cached_result(backtest, data, refresh=True, cache_dir=str(tmp_path))
+    assert len(calls) == 5
+
+
+def test_dependencies_change_the_key():
+    data = bars()
+    backtest = counting([])
+    plain = cache_key(backtest, data, {})
+    assert cache_key(backtest, data, {}, dependencies=(portfolio_engine,)) != plain
+    assert cache_key(backtest, data, {}, dependencies=(portfolio_engine, metrics)) != \
+        cache_key(backtest, data, {}, dependencies=(portfolio_engine,))
+    assert strategy_version(backtest, dependencies=(metrics.cagr,)) != strategy_version(backtest)
+    assert strategy_version(backtest, dependencies=(metrics,)) == strategy_version(backtest, dependencies=(metrics,))
+
+
+def test_fallback_results_are_not_cached(tmp_path):
+    calls = []
+    backtest = counting(calls, fallback=True)
+    data = bars()
+    assert cached_result(backtest, data, cache_dir=str(tmp_path))['fallback']
+    cached_result(backtest, data, cache_dir=str(tmp_path))
+    assert len(calls) == 2
+    assert not tmp_path.exists() or not os.listdir(tmp_path)
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    for i in range(3):
+        path = tmp_path / f'{i}.pkl'
+        path.write_bytes(b'x' * 100)
+        os.utime(path, ns=(i * 10 ** 9, i * 10 ** 9))
+    assert evict(str(tmp_path), max_bytes=150) == 2
+    assert os.listdir(tmp_path) == ['2.pkl']
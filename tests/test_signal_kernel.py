@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from data_provider import generate_gbm_bars
+from signal_kernel import cross_above, cross_below, crossover_signals, resolve_holding, signal_masks
+
+
+def reference_loop(entries, exits, start):
+    """
+    原先的逐日循环：if 买入条件 and not holding: 买入 / elif 卖出条件 and holding: 卖出
+    """
+    holding = False
+    states, buys, sells = [], [], []
+    for i in range(len(entries)):
+        if i >= start:
+            if entries[i] and not holding:
+                holding = True
+                buys.append(i)
+            elif exits[i] and holding:
+                holding = False
+                sells.append(i)
+        states.append(holding)
+    return np.array(states), buys, sells
+
+
+def reference_cross(fast, slow):
+    above, below = [], []
+    for i in range(len(fast)):
+        prev = i > 0
+        above.append(bool(prev and fast[i] > slow[i] and fast[i - 1] <= slow[i - 1]))
+        below.append(bool(prev and fast[i] < slow[i] and fast[i - 1] >= slow[i - 1]))
+    return np.array(above), np.array(below)
+
+
+def test_resolve_holding_matches_loop_on_random_conditions():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        n = int(rng.integers(1, 300))
+        entries = rng.random(n) < rng.random()
+        exits = rng.random(n) < rng.random()
+        start = int(rng.integers(0, n + 1))
+        states, buys, sells = reference_loop(entries, exits, start)
+        np.testing.assert_array_equal(resolve_holding(entries, exits, start), states)
+        buy_mask, sell_mask, _ = signal_masks(entries, exits, start)
+        assert np.flatnonzero(buy_mask).tolist() == buys
+        assert np.flatnonzero(sell_mask).tolist() == sells
+
+
+def test_resolve_holding_2d_matches_rows():
+    rng = np.random.default_rng(1)
+    entries = rng.random((5, 200)) < 0.2
+    exits = rng.random((5, 200)) < 0.2
+    holding = resolve_holding(entries, exits, start=30)
+    for row in range(5):
+        np.testing.assert_array_equal(holding[row], reference_loop(entries[row], exits[row], 30)[0])
+
+
+def test_cross_matches_loop_with_nan_warmup():
+    close = generate_gbm_bars(pd.bdate_range('2015-01-01', periods=500), seed=2)['Close']
+    fast = close.rolling(20).mean().values
+    slow = close.rolling(60).mean().values
+    above, below = reference_cross(fast, slow)
+    np.testing.assert_array_equal(cross_above(fast, slow), above)
+    np.testing.assert_array_equal(cross_below(fast, slow), below)
+
+
+def test_crossover_signals_returns_dates_and_prices():
+    df = generate_gbm_bars(pd.bdate_range('2015-01-01', periods=600), seed=3)
+    fast = df['Close'].rolling(20).mean()
+    slow = df['Close'].rolling(60).mean()
+    entries, exits = cross_above(fast, slow), cross_below(fast, slow)
+    buys, sells = crossover_signals(df, entries, exits, start=200)
+    _, buy_idx, sell_idx = reference_loop(entries, exits, 200)
+    assert buys == [(df.index[i], df['Close'].iloc[i]) for i in buy_idx]
+    assert sells == [(df.index[i], df['Close'].iloc[i]) for i in sell_idx]
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy_rules import STRATEGY_CONFIGS, evaluate_rule, filter_message
+
+
+def test_evaluate_rule_operators():
+    columns = {'RSI': np.array([20.0, 50.0, 80.0, np.nan]), 'Close': np.array([1.0, 2.0, 3.0, 4.0])}
+    np.testing.assert_array_equal(evaluate_rule('40 < RSI < 65', columns), [False, True, False, False])
+    np.testing.assert_array_equal(evaluate_rule('RSI > 70 or not Close > 1', columns), [True, False, True, False])
+    np.testing.assert_array_equal(evaluate_rule('shift(Close, 1) < Close', columns), [False, True, True, True])
+    with pytest.raises(ValueError):
+        evaluate_rule('__import__("os")', columns)
+
+
+def test_filter_message_uses_first_labelled_reason():
+    row = pd.Series({'RSI': 72.345, 'MACD': -0.1234, 'Close': 10.0, 'BB_Upper': 9.0, 'MA200': 12.0})
+    config = STRATEGY_CONFIGS['strict_light_filter']
+    assert filter_message(config, ['overbought_above_bb', 'extremely_overbought'], row) == '过滤原因: RSI过高 72.3'
+    assert filter_message(config, ['macd_bearish_below_200ma', 'macd_below_signal'], row) == \
+        '过滤原因: MACD看跌且低于200MA MACD:-0.123'
+    # 原先的循环对这两个条件不打印原因
+    assert filter_message(config, ['rsi_oversold', 'macd_below_signal'], row) is None
+
+    config = STRATEGY_CONFIGS['conservative_filter']
+    assert filter_message(config, ['extreme_breakout'], row) == '保守过滤: 突破过多(10.00 > 9.00)'
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from data_provider import generate_gbm_bars
+from indicators import calculate_technical_indicators
+from streaming_indicators import EMA, RSI, SMA, IndicatorSet, RollingStd, load_state, save_state
+
+COLUMNS = ['MA5', 'MA20', 'MA60', 'MA200', 'MACD', 'MACD_Signal', 'MACD_Histogram', 'RSI',
+           'BB_Middle', 'BB_Upper', 'BB_Lower', 'Trend_Strength', 'Volatility', 'Volume_MA20']
+
+
+def bars(n=400, seed=1):
+    return generate_gbm_bars(pd.bdate_range('2015-01-01', periods=n, name='Date'), seed=seed)
+
+
+def stream(indicator, values):
+    return np.array([indicator.update(x) for x in values], dtype=float)
+
+
+def test_sma_std_ema_match_pandas():
+    close = bars()['Close']
+    values = close.tolist()
+    np.testing.assert_allclose(stream(SMA(20), values), close.rolling(20).mean(), rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(stream(RollingStd(20), values), close.rolling(20).std(), rtol=1e-8,
+                               equal_nan=True)
+    np.testing.assert_allclose(stream(EMA(12), values), close.ewm(span=12, adjust=False).mean(), rtol=1e-10)
+
+
+def test_wilder_rsi_matches_ewm():
+    close = bars()['Close']
+    delta = close.diff().iloc[1:]
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    # Wilder平滑：首值为前14个涨跌幅的平均，之后按alpha=1/14递推
+    seeded_gain = pd.concat([gain.iloc[:14].expanding().mean().iloc[-1:], gain.iloc[14:]])
+    seeded_loss = pd.concat([loss.iloc[:14].expanding().mean().iloc[-1:], loss.iloc[14:]])
+    avg_gain = seeded_gain.ewm(alpha=1 / 14, adjust=False).mean()
+    avg_loss = seeded_loss.ewm(alpha=1 / 14, adjust=False).mean()
+    expected = 100 - 100 / (1 + avg_gain / avg_loss)
+
+    result = stream(RSI(14, method='wilder'), close.tolist())
+    assert np.isnan(result[:14]).all()
+    np.testing.assert_allclose(result[14:], expected.values, rtol=1e-10)
+
+
+def test_indicator_set_matches_batch():
+    data = bars()
+    batch = calculate_technical_indicators(data)
+    indicators = IndicatorSet()
+    rows = [indicators.update(close, volume, date) for date, close, volume in
+            zip(data.index, data['Close'].tolist(), data['Volume'].tolist())]
+    streamed = pd.DataFrame(rows, index=data.index)
+    for column in COLUMNS:
+        np.testing.assert_allclose(streamed[column], batch[column], rtol=1e-8, atol=1e-10, equal_nan=True,
+                                   err_msg=column)
+
+
+def test_state_round_trip_continues_identically(tmp_path):
+    data = bars()
+    closes, volumes = data['Close'].tolist(), data['Volume'].tolist()
+    split = 250
+
+    full = IndicatorSet()
+    for close, volume in zip(closes, volumes):
+        full.update(close, volume)
+
+    head = IndicatorSet()
+    for close, volume in zip(closes[:split], volumes[:split]):
+        head.update(close, volume)
+    path = str(tmp_path / 'state.json')
+    save_state(head, path)
+    resumed = load_state(IndicatorSet, path)
+    for close, volume in zip(closes[split:], volumes[split:]):
+        resumed.update(close, volume)
+
+    assert resumed.value == full.value
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_provider import generate_gbm_bars
+from trade_ledger import build_ledger, ledger_stats, load_ledger, mark_to_market, save_ledger
+
+
+def sample_trades(seed=0):
+    data = generate_gbm_bars(pd.bdate_range('2015-01-01', periods=300), seed=seed)
+    close = data['Close']
+    rng = np.random.default_rng(seed)
+    days = np.sort(rng.choice(np.arange(5, 295), 12, replace=False))
+    buys = [(close.index[i], close.iloc[i], float(rng.uniform(0.3, 1.0))) for i in days[::2]]
+    sells = [(close.index[i], close.iloc[i]) for i in days[1::2]]
+    return data, buys, sells
+
+
+def naive_mark_to_market(data, buys, sells):
+    # 逐日循环：买入日收盘后持仓，之后按收盘价估值，卖出日结算
+    dates = list(data.index)
+    close = data['Close'].values
+    equity, positions = np.ones(len(close)), np.zeros(len(close))
+    cash = 1.0
+    trade = None
+    pairs = list(zip(buys, sells))
+    k = 0
+    for i, date in enumerate(dates):
+        if trade is not None:
+            entry_cash, entry_price, size, exit_date = trade
+            equity[i] = entry_cash * (1 + size * (close[i] / entry_price - 1))
+            positions[i] = size
+            if date == exit_date:
+                cash, trade = equity[i], None
+            continue
+        if k < len(pairs) and date == pairs[k][0][0]:
+            (_, price, size), (exit_date, _) = pairs[k]
+            trade = (cash, price, size, exit_date)
+            k += 1
+        equity[i] = cash
+    return equity, positions
+
+
+def test_build_ledger_and_stats():
+    _, buys, sells = sample_trades()
+    ledger = build_ledger(buys + [buys[0]], sells)
+    assert len(ledger) == len(sells)
+    raw = [(sell[1] - buy[1]) / buy[1] * 100 for buy, sell in zip(buys, sells)]
+    np.testing.assert_allclose(ledger['raw_return'], raw)
+    np.testing.assert_allclose(ledger['adjusted_return'], np.array(raw) * [buy[2] for buy in buys])
+
+    stats = ledger_stats(ledger)
+    growth = np.prod(1 + ledger['adjusted_return'] / 100)
+    assert stats['total_return'] == pytest.approx((growth - 1) * 100)
+    assert stats['winning_trades'] + stats['losing_trades'] <= stats['total_trades']
+    assert ledger_stats(build_ledger([], [])) == {'total_trades': 0}
+
+
+def test_mark_to_market_matches_naive_loop():
+    for seed in range(5):
+        data, buys, sells = sample_trades(seed)
+        ledger = build_ledger(buys, sells)
+        equity, positions = mark_to_market(ledger, data['Close'].values, data.index)
+        expected_equity, expected_positions = naive_mark_to_market(data, buys, sells)
+        np.testing.assert_allclose(equity, expected_equity, rtol=1e-12)
+        np.testing.assert_allclose(positions, expected_positions)
+        # 卖出后的资产等于逐笔复利的结果
+        assert equity[-1] == pytest.approx(np.prod(1 + ledger['adjusted_return'] / 100))
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_save_and_load_round_trip(tmp_path, suffix):
+    _, buys, sells = sample_trades()
+    ledger = build_ledger(buys, sells)
+    path = str(tmp_path / f'ledger{suffix}')
+    save_ledger(ledger, path)
+    loaded = load_ledger(path)
+    for name in ledger.dtype.names:
+        np.testing.assert_allclose(loaded[name].astype(float), ledger[name].astype(float))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from data_provider import generate_gbm_bars
+from indicators import calculate_technical_indicators
+from universe_indicators import calculate_universe_indicators, rolling_mean, universe_matrix
+
+
+def sample_universe():
+    dates = pd.bdate_range('2015-01-01', periods=400, name='Date')
+    full = generate_gbm_bars(dates, seed=0)
+    # 晚上市：前120天没有行情
+    late = generate_gbm_bars(dates, seed=1).iloc[120:]
+    # 中间停牌：第150~152天和第300天缺失
+    halted = generate_gbm_bars(dates, seed=2)
+    halted = halted.drop(halted.index[[150, 151, 152, 300]])
+    return {'FULL': full, 'LATE': late, 'HALTED': halted}
+
+
+def test_rows_match_single_stock_indicators():
+    universe = sample_universe()
+    codes, dates, close = universe_matrix(universe)
+    _, _, volume = universe_matrix(universe, 'Volume')
+    result = calculate_universe_indicators(close, volume)
+
+    for row, code in enumerate(codes):
+        expected = calculate_technical_indicators(universe[code])
+        on_trading_days = dates.get_indexer(expected.index)
+        for name, values in result.items():
+            np.testing.assert_allclose(values[row, on_trading_days], expected[name].values,
+                                       rtol=1e-8, atol=1e-10, equal_nan=True, err_msg=f'{code} {name}')
+
+
+def test_gaps_carry_forward_and_nan_before_listing():
+    universe = sample_universe()
+    codes, dates, close = universe_matrix(universe)
+    result = calculate_universe_indicators(close)
+    late, halted = codes.index('LATE'), codes.index('HALTED')
+
+    ma5 = result['MA5']
+    assert np.isnan(ma5[late, :120]).all()
+    assert not np.isnan(ma5[late, 124:]).any()
+    # 停牌后的窗口仍然有值，停牌日沿用停牌前一天
+    assert not np.isnan(ma5[halted, 4:]).any()
+    for day in (150, 151, 152):
+        assert ma5[halted, day] == ma5[halted, 149]
+    assert result['MA200'][halted, 300] == result['MA200'][halted, 299]
+
+
+def test_rolling_mean_counts_valid_observations():
+    values = np.array([[1.0, 2.0, np.nan, 3.0, 4.0, np.nan]])
+    expected = pd.Series([1.0, 2.0, 3.0, 4.0]).rolling(3).mean().values
+    np.testing.assert_allclose(rolling_mean(values, 3)[0],
+                               [np.nan, np.nan, np.nan, expected[2], expected[3], expected[3]], equal_nan=True)
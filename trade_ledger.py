@@ -0,0 +1,190 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# 成对交易的列式账本：NumPy结构化数组，日期为datetime64，价格/仓位为浮点
+# 统计全部对整列向量化计算；中文列名只在打印和导出带标签的表格时使用
+
+LEDGER_DTYPE = np.dtype([
+    ('entry_date', 'datetime64[ns]'),
+    ('entry_price', 'f8'),
+    ('size', 'f8'),
+    ('exit_date', 'datetime64[ns]'),
+    ('exit_price', 'f8'),
+    ('holding_days', 'i8'),
+    ('raw_return', 'f8'),
+    ('adjusted_return', 'f8'),
+    ('profit', 'f8'),
+])
+
+LABELS = {
+    'entry_date': '买入日期',
+    'entry_price': '买入价格',
+    'size': '仓位权重',
+    'exit_date': '卖出日期',
+    'exit_price': '卖出价格',
+    'holding_days': '持有天数',
+    'raw_return': '原始收益率%',
+    'adjusted_return': '调整后收益率%',
+    'profit': '盈亏金额',
+}
+
+
+def build_ledger(buy_signals, sell_signals):
+    """
+    由买卖信号配对建账，信号为 (日期, 价格) 或 (日期, 价格, 仓位权重)；多出的买入信号忽略
+    """
+    pairs = min(len(buy_signals), len(sell_signals))
+    ledger = np.zeros(pairs, dtype=LEDGER_DTYPE)
+    if pairs == 0:
+        return ledger
+
+    buys = buy_signals[:pairs]
+    sells = sell_signals[:pairs]
+    ledger['entry_date'] = pd.DatetimeIndex([signal[0] for signal in buys]).values
+    ledger['entry_price'] = [signal[1] for signal in buys]
+    ledger['size'] = [signal[2] if len(signal) == 3 else 1.0 for signal in buys]
+    ledger['exit_date'] = pd.DatetimeIndex([signal[0] for signal in sells]).values
+    ledger['exit_price'] = [signal[1] for signal in sells]
+
+    ledger['holding_days'] = (ledger['exit_date'] - ledger['entry_date']) // np.timedelta64(1, 'D')
+    ledger['raw_return'] = (ledger['exit_price'] - ledger['entry_price']) / ledger['entry_price'] * 100
+    ledger['adjusted_return'] = ledger['raw_return'] * ledger['size']
+    ledger['profit'] = (ledger['exit_price'] - ledger['entry_price']) * ledger['size']
+    return ledger
+
+
+def ledger_stats(ledger):
+    """
+    账本的统计指标（收益率类为百分比），cumulative_returns为每笔交易后的累计收益率数组
+    """
+    returns = ledger['adjusted_return']
+    total_trades = len(ledger)
+    if total_trades == 0:
+        return {'total_trades': 0}
+
+    equity = np.cumprod(1 + returns / 100)
+    total_return = equity[-1]
+
+    total_days = (ledger['exit_date'][-1].astype('datetime64[D]') -
+                  ledger['entry_date'][0].astype('datetime64[D]')) // np.timedelta64(1, 'D')
+    # 账本只有交易日期，年数按日历天数计算（见metrics中的年化约定）
+    total_years = total_days / 365.25
+    winning_trades = int((returns > 0).sum())
+    return {
+        'total_trades': total_trades,
+        'winning_trades': winning_trades,
+        'losing_trades': int((returns < 0).sum()),
+        'win_rate': winning_trades / total_trades * 100,
+        'avg_return': returns.mean(),
+        'max_return': returns.max(),
+        'min_return': returns.min(),
+        'avg_raw_return': ledger['raw_return'].mean(),
+        'avg_position_size': ledger['size'].mean(),
+        'avg_holding_days': ledger['holding_days'].mean(),
+        'total_return': (total_return - 1) * 100,
+        'total_years': total_years,
+        'annualized_return': metrics.cagr(total_return, total_years),
+        # 最大回撤：从初始资金1.0开始的逐笔资产曲线
+        'max_drawdown': metrics.max_drawdown(equity, initial=1.0),
+        'total_profit': ledger['profit'].sum(),
+        'avg_profit': ledger['profit'].mean(),
+        'cumulative_returns': (equity - 1) * 100,
+    }
+
+
+def mark_to_market(ledger, close, dates):
+    """
+    逐日盯市的资产曲线（初始资金1.0），返回 (资产数组, 每天的仓位权重数组)
+
+    close/dates为完整行情的收盘价和日期；持仓期间按收盘价估值（买入时的资产 × 仓位 × 涨跌幅），
+    卖出日按成交价结算，空仓期间资产不变。全部用持仓掩码向量化计算，不逐日循环
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    equity = np.ones(n)
+    positions = np.zeros(n)
+    if len(ledger) == 0 or n == 0:
+        return equity, positions
+
+    dates = np.asarray(pd.DatetimeIndex(dates).values)
+    entry = np.searchsorted(dates, ledger['entry_date'])
+    exit_ = np.searchsorted(dates, ledger['exit_date'])
+
+    after = np.cumprod(1 + ledger['adjusted_return'] / 100)
+    before = np.concatenate(([1.0], after[:-1]))
+
+    # 每天对应的最近一笔（买入日不晚于当天的）交易；买入日之后、卖出日之前（含）为持仓
+    days = np.arange(n)
+    trade = np.searchsorted(entry, days, side='right') - 1
+    index = np.maximum(trade, 0)
+    holding = (trade >= 0) & (days > entry[index]) & (days <= exit_[index])
+
+    size = ledger['size'][index]
+    marked = before[index] * (1 + size * (close / ledger['entry_price'][index] - 1))
+    equity = np.where(holding, marked, np.where(trade >= 0, after[index], 1.0))
+    # 买入日当天资产尚未变动；卖出日用成交价结算
+    equity[entry[entry < n]] = before[entry < n]
+    equity[exit_[exit_ < n]] = after[exit_ < n]
+    positions[holding] = size[holding]
+    return equity, positions
+
+
+def to_frame(ledger, labels=False):
+    """
+    转为DataFrame；labels=True时使用中文列名并加上从1开始的序号
+    """
+    frame = pd.DataFrame(ledger)
+    if labels:
+        frame = frame.rename(columns=LABELS)
+        frame.insert(0, '序号', np.arange(1, len(frame) + 1))
+    return frame
+
+
+def save_ledger(ledger, path, labels=False):
+    """
+    按扩展名导出为Parquet（.parquet）或CSV（其它）
+    """
+    frame = to_frame(ledger, labels)
+    if os.path.splitext(path)[1].lower() == '.parquet':
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def load_ledger(path):
+    """
+    读回save_ledger（labels=False）导出的账本
+    """
+    if os.path.splitext(path)[1].lower() == '.parquet':
+        frame = pd.read_parquet(path)
+    else:
+        frame = pd.read_csv(path, parse_dates=['entry_date', 'exit_date'])
+
+    ledger = np.zeros(len(frame), dtype=LEDGER_DTYPE)
+    for name in LEDGER_DTYPE.names:
+        ledger[name] = frame[name].values
+    return ledger
+
+
+def print_ledger(ledger, return_field='raw_return'):
+    """
+    打印彩色的逐笔交易明细（盈利绿色、亏损红色）
+    """
+    print(f"\n详细交易记录 (共{len(ledger)}笔交易):")
+    print("-" * 120)
+    print(
+        f"{'序号':<4} {'买入日期':<12} {'买入价':<8} {'卖出日期':<12} {'卖出价':<8} {'持有天数':<8} {'收益率%':<10} {'盈亏金额':<10}")
+    print("-" * 120)
+
+    entry_dates = np.datetime_as_string(ledger['entry_date'], unit='D')
+    exit_dates = np.datetime_as_string(ledger['exit_date'], unit='D')
+    for i, trade in enumerate(ledger):
+        color = '\033[92m' if trade[return_field] > 0 else '\033[91m'  # 绿色表示盈利，红色表示亏损
+        reset = '\033[0m'
+        print(f"{i + 1:<4} {entry_dates[i]:<12} {trade['entry_price']:<8.2f} "
+              f"{exit_dates[i]:<12} {trade['exit_price']:<8.2f} {trade['holding_days']:<8} "
+              f"{color}{trade[return_field]:<10.2f}{reset} {color}{trade['profit']:<10.2f}{reset}")
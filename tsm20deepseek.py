@@ -1,24 +1,16 @@
 import mplfinance as mpf
-import yfinance as yf
+from price_store import load_bars
+from resample import load_resampled
 import matplotlib.pyplot as plt
 
 # 1. 獲取數據（使用台積電美股代碼 TSM）
-data = yf.download('2330.TW', start='2005-01-01', end='2025-02-21')
-
-# 2. 重置多级索引，将多级索引转换为单级索引
-data.columns = data.columns.get_level_values(0)  # 取第一层索引作为列名
+data = load_bars('2330.TW', start='2005-01-01', end='2025-02-21')  # 從本地價格倉庫讀取，只補抓缺少的日線
 
 #檢查列名（無需重置索引）
 print("原始數據列名:", data.columns)
 
 # 3. 轉換日線數據為季線數據
-quarterly_data = data.resample('QE').agg({
-    'Open': 'first',
-    'High': 'max',
-    'Low': 'min',
-    'Close': 'last',
-    'Volume': 'sum'
-}).dropna()
+quarterly_data = load_resampled('2330.TW', 'Q', start='2005-01-01', end='2025-02-21')  # 已保存的季線只重算最後一季
 
 # 4. 檢查季度數據列名和內容
 print("季度數據列名:", quarterly_data.columns)
@@ -0,0 +1,109 @@
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+# 與stock1.py、stock_plot.py相同的表頭[日期 總成交股數 總成交金額 開 高 低 收 漲跌幅 成交量]
+TWSTOCK_COLUMNS = [
+    'Date', 'Capacity', 'Turnover', 'Open', 'High', 'Low', 'Close', 'Change',
+    'Transcation'
+]
+
+DEFAULT_DATA_DIR = './data'
+DEFAULT_START = (2023, 5)  # 沒有舊檔案時，從2023/05開始抓
+
+
+def twstock_fetcher(code, year, month):
+    """
+    預設資料來源：用twstock抓取 year/month 至今每天的交易資料
+    """
+    import twstock
+
+    return twstock.Stock(code).fetch_from(year, month)
+
+
+def csv_path(code, data_dir=DEFAULT_DATA_DIR):
+    """
+    回傳股票代號對應的csv檔案路徑
+    """
+    return os.path.join(data_dir, f'{code}.csv')
+
+
+def read_last_date(path):
+    """
+    讀取csv檔案中最後一筆的日期與筆數，檔案不存在時回傳 (None, 0)
+    """
+    if not os.path.exists(path):
+        return None, 0
+    dates = pd.read_csv(path, usecols=['Date'], parse_dates=['Date'])['Date']
+    if dates.empty:
+        return None, 0
+    return dates.max(), len(dates)
+
+
+def update_csv(code, data_dir=DEFAULT_DATA_DIR, fetcher=twstock_fetcher, start=DEFAULT_START):
+    """
+    增量更新 ./data/<code>.csv：只抓最後日期所在月份之後的資料，並以原子方式附加新的交易日
+
+    回傳新增的筆數
+    """
+    path = csv_path(code, data_dir)
+    last_date, row_count = read_last_date(path)
+
+    if last_date is None:
+        year, month = start
+    else:
+        year, month = last_date.year, last_date.month
+
+    df = pd.DataFrame(columns=TWSTOCK_COLUMNS, data=fetcher(code, year, month))
+    if df.empty:
+        return 0
+
+    df['Date'] = pd.to_datetime(df['Date'])
+    if last_date is not None:
+        df = df[df['Date'] > last_date]
+    if df.empty:
+        return 0
+
+    df = df.drop_duplicates('Date').sort_values('Date')
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    df.index = range(row_count, row_count + len(df))  # 延續原本的索引編號
+
+    # 先複製到暫存檔再附加，最後用os.replace替換，避免中途失敗留下不完整的檔案
+    os.makedirs(data_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    if last_date is not None:
+        shutil.copyfile(path, tmp_path)
+        df.to_csv(tmp_path, mode='a', header=False)
+    else:
+        df.to_csv(tmp_path)
+    os.replace(tmp_path, path)
+    return len(df)
+
+
+def update_many(codes, data_dir=DEFAULT_DATA_DIR, fetcher=twstock_fetcher, start=DEFAULT_START):
+    """
+    批次更新多檔股票，單檔失敗不影響其他股票
+
+    回傳 {代號: 新增筆數}，失敗的代號對應None
+    """
+    results = {}
+    for code in codes:
+        try:
+            results[code] = update_csv(code, data_dir, fetcher, start)
+            print(f'{code}: 新增 {results[code]} 筆 ({datetime.now():%H:%M:%S})')
+        except Exception as e:
+            print(f'{code}: 更新失敗 {e}')
+            results[code] = None
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+
+    # 用法: python twstock_updater.py 2330 2891 0050
+    if len(sys.argv) < 2:
+        print("請輸入股票代號")
+        sys.exit("程式結束")
+    update_many(sys.argv[1:])
@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+
+# 全市场批量指标：输入为 股票数 × 交易日数 的二维矩阵（未上市/停牌处为NaN），
+# 所有指标沿时间轴(axis=1)一次算完，结果与输入逐元素对齐。
+#
+# 每只股票只用自己的有效行情计算：先把每行的有效值按原顺序压缩到行首（compact），
+# 在压缩后的矩阵上计算，再放回原位置（expand）。因此每只股票在其交易日上的结果与对其单独调用
+# calculate_technical_indicators一致（停牌日、只有其它股票交易的日期不计入窗口）；
+# 中间缺失的日期沿用前一个交易日的指标值，只有上市之前为NaN。
+
+
+def universe_matrix(universe, column='Close'):
+    """
+    将 {代码: 行情} 对齐成二维矩阵，返回 (代码列表, 日期DatetimeIndex, 矩阵)
+
+    行情可以是DataFrame（如synthetic_universe、fetch_bars的结果），
+    也可以是bar_mmap.open_universe返回的结构化数组
+    """
+    codes = list(universe)
+    days = []
+    values = []
+    for code in codes:
+        bars = universe[code]
+        if isinstance(bars, pd.DataFrame):
+            days.append(bars.index.values.astype('datetime64[D]').astype(np.int64))
+            values.append(np.asarray(bars[column], dtype=np.float64))
+        else:
+            days.append(np.asarray(bars['day'], dtype=np.int64))
+            values.append(np.asarray(bars[column.lower()], dtype=np.float64))
+
+    all_days = np.unique(np.concatenate(days)) if days else np.array([], dtype=np.int64)
+    matrix = np.full((len(codes), len(all_days)), np.nan)
+    for row, (code_days, code_values) in enumerate(zip(days, values)):
+        matrix[row, np.searchsorted(all_days, code_days)] = code_values
+
+    dates = pd.DatetimeIndex(all_days.astype('datetime64[D]'), name='Date')
+    return codes, dates, matrix
+
+
+def compact(values):
+    """
+    把每行的有效值（非NaN）按原顺序移到行首，返回 (压缩后的矩阵, 原位置序号, 有效掩码)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis=1, kind='stable')
+    return np.take_along_axis(values, order, axis=1), order, valid
+
+
+def expand(compacted, order, valid):
+    """
+    compact的逆操作：结果放回原位置，缺失的日期沿用前一个有效日期的值（之前没有有效日期时为NaN）
+    """
+    result = np.full(compacted.shape, np.nan)
+    np.put_along_axis(result, order, compacted, axis=1)
+    n = valid.shape[1]
+    last = np.maximum.accumulate(np.where(valid, np.arange(n), -1), axis=1)
+    result = np.take_along_axis(result, np.maximum(last, 0), axis=1)
+    result[last < 0] = np.nan
+    return result
+
+
+def _on_valid(function, values, *args):
+    compacted, order, valid = compact(values)
+    outputs = function(compacted, *args)
+    if isinstance(outputs, tuple):
+        return tuple(expand(output, order, valid) for output in outputs)
+    return expand(outputs, order, valid)
+
+
+def _window_sums(values, window):
+    """
+    滑动窗口求和：返回 (窗口和, 窗口内NaN个数)，NaN按0累加
+    """
+    nan_mask = np.isnan(values)
+    filled = np.where(nan_mask, 0.0, values)
+
+    sums = np.cumsum(filled, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    nan_counts = np.cumsum(nan_mask, axis=1)
+    nan_counts[:, window:] = nan_counts[:, window:] - nan_counts[:, :-window]
+    return sums, nan_counts
+
+
+def _centered(values):
+    """
+    减去每只股票的均值，降低累加和相减时的精度损失
+    """
+    with np.errstate(all='ignore'):
+        offset = np.nanmean(values, axis=1, keepdims=True) if values.shape[1] else np.zeros((len(values), 1))
+    return values - np.nan_to_num(offset), np.nan_to_num(offset)
+
+
+def rolling_mean(values, window):
+    """
+    简单移动平均，等同对每行的有效值 rolling(window).mean()：有效值不满window个时为NaN
+    """
+    return _on_valid(_rolling_mean, values, window)
+
+
+def _rolling_mean(values, window):
+    # 压缩后的矩阵：NaN只在行尾，窗口含NaN时为NaN
+    values = np.asarray(values, dtype=np.float64)
+    centered, offset = _centered(values)
+    sums, nan_counts = _window_sums(centered, window)
+
+    result = sums / window + offset
+    result[:, :window - 1] = np.nan
+    result[nan_counts > 0] = np.nan
+    return result
+
+
+def rolling_std(values, window):
+    """
+    滚动样本标准差（ddof=1），等同对每行的有效值 rolling(window).std()
+    """
+    return _on_valid(_rolling_std, values, window)
+
+
+def _rolling_std(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    centered, _ = _centered(values)
+    sums, nan_counts = _window_sums(centered, window)
+    sq_sums, _ = _window_sums(centered ** 2, window)
+
+    variance = (sq_sums - sums ** 2 / window) / (window - 1)
+    result = np.sqrt(np.maximum(variance, 0.0))
+    result[:, :window - 1] = np.nan
+    result[nan_counts > 0] = np.nan
+    return result
+
+
+def ema(values, span):
+    """
+    指数移动平均（adjust=False），等同对每行的有效值 ewm(span=span, adjust=False).mean()
+    """
+    return _on_valid(_ema, values, span)
+
+
+def _ema(values, span):
+    # 按时间逐日推进、所有股票同时计算；每只股票从第一个有效值开始，NaN不更新状态
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2.0 / (span + 1)
+    result = np.full(values.shape, np.nan)
+    state = np.full(values.shape[0], np.nan)
+
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        valid = ~np.isnan(x)
+        updated = np.where(np.isnan(state), x, alpha * x + (1 - alpha) * state)
+        state = np.where(valid, updated, state)
+        result[valid, t] = state[valid]
+    return result
+
+
+def calculate_macd(close, fast_period=12, slow_period=26, signal_period=9):
+    """
+    计算MACD指标，返回 (MACD线, 信号线, 柱状图)
+    """
+    return _on_valid(_macd, close, fast_period, slow_period, signal_period)
+
+
+def _macd(close, fast_period=12, slow_period=26, signal_period=9):
+    macd_line = _ema(close, fast_period) - _ema(close, slow_period)
+    signal_line = _ema(macd_line, signal_period)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def calculate_rsi(close, period=14):
+    """
+    计算RSI指标（涨跌幅的简单移动平均）
+    """
+    return _on_valid(_rsi, close, period)
+
+
+def _rsi(close, period=14):
+    close = np.asarray(close, dtype=np.float64)
+    delta = np.full(close.shape, np.nan)
+    delta[:, 1:] = np.diff(close, axis=1)
+
+    # 与逐只计算一致：上市第一天的涨跌记为0，未上市的日期保持NaN
+    listed = ~np.isnan(close)
+    gain = np.where(listed, np.where(delta > 0, delta, 0.0), np.nan)
+    loss = np.where(listed, np.where(delta < 0, -delta, 0.0), np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = _rolling_mean(gain, period) / _rolling_mean(loss, period)
+        return 100 - (100 / (1 + rs))
+
+
+def calculate_bollinger(close, window=20, num_std=2):
+    """
+    计算布林带，返回 (中轨, 上轨, 下轨)
+    """
+    middle = rolling_mean(close, window)
+    std = rolling_std(close, window)
+    return middle, middle + std * num_std, middle - std * num_std
+
+
+def calculate_universe_indicators(close, volume=None):
+    """
+    计算全市场技术指标
+
+    返回 {指标名: 矩阵}，指标名与calculate_technical_indicators的列名一致；
+    成交量按收盘价的有效日期压缩，同一只股票的全部指标只压缩、展开各一次
+    """
+    close, order, valid = compact(close)
+    result = {}
+
+    for window in (5, 20, 60, 200):
+        result[f'MA{window}'] = _rolling_mean(close, window)
+
+    result['MACD'], result['MACD_Signal'], result['MACD_Histogram'] = _macd(close)
+    result['RSI'] = _rsi(close)
+
+    std20 = _rolling_std(close, 20)
+    result['BB_Middle'] = result['MA20']
+    result['BB_Upper'] = result['MA20'] + std20 * 2
+    result['BB_Lower'] = result['MA20'] - std20 * 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['Trend_Strength'] = np.abs(close - result['MA200']) / result['MA200']
+        result['Volatility'] = std20 / result['MA20']
+
+    if volume is not None:
+        volume = np.take_along_axis(np.asarray(volume, dtype=np.float64), order, axis=1)
+        result['Volume_MA20'] = _rolling_mean(volume, 20)
+
+    return {name: expand(values, order, valid) for name, values in result.items()}
@@ -0,0 +1,164 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics import cagr, max_drawdown
+from param_sweep import RESULT_COLUMNS, cross_masks, moving_averages, pair_results, trend_filter
+from portfolio_engine import run_portfolio
+from signal_kernel import resolve_holding
+
+# 均线交叉策略的滚动前推（walk-forward）优化
+#
+# 把行情切成若干 训练段 + 紧接着的测试段：
+#   rolling  训练段长度固定，整体向后滚动
+#   anchored 训练段都从第一天开始，逐段变长
+# 每个训练段上扫描参数网格选出最好的一组（各段并行），再用这组参数在下一个测试段上交易；
+# 各测试段依次接力（上一段的期末资产作为下一段的初始资金），拼成样本外资产曲线；
+# carry_position=True时，若该组参数在测试段前一天处于持仓状态，测试段第一天即买入，否则段首空仓。
+# 均线只依赖过去的价格，因此在整段行情上算一次，各段直接切片复用
+
+FOLD_COLUMNS = ['fold', 'train_start', 'train_end', 'test_start', 'test_end', 'fast', 'slow', 'trend',
+                'threshold', 'train_score', 'test_return', 'test_max_drawdown', 'test_trades']
+
+# 子进程中的收盘价、均线和网格（由进程池initializer设置一次）
+_walk_state = {}
+
+
+def walk_forward_splits(n, train_size, test_size, anchored=False, start=0):
+    """
+    返回 [(训练起点, 训练终点, 测试起点, 测试终点)]，区间左闭右开；最后一段测试可以不满test_size
+    """
+    if train_size <= 0 or test_size <= 0:
+        raise ValueError("训练段和测试段的长度必须大于0")
+
+    splits = []
+    train_end = start + train_size
+    while train_end < n:
+        train_start = start if anchored else train_end - train_size
+        splits.append((train_start, train_end, train_end, min(train_end + test_size, n)))
+        train_end += test_size
+    return splits
+
+
+def _init_walk(close, averages, grid, initial_cash, start):
+    _walk_state.clear()
+    _walk_state.update(close=close, averages=averages, grid=grid, initial_cash=initial_cash, start=start)
+
+
+def optimize_fold(lo, hi, sort_by='total_return'):
+    """
+    在子进程中扫描[lo, hi)训练段上的参数网格，返回最好的一行（dict）
+    """
+    grid = _walk_state['grid']
+    rows = []
+    for fast, slow in grid['pairs']:
+        rows.extend(pair_results(_walk_state['close'], _walk_state['averages'], fast, slow, grid['trends'],
+                                 grid['thresholds'], [grid['commission']], _walk_state['initial_cash'],
+                                 _walk_state['start'], lo, hi))
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    return results.loc[results[sort_by].idxmax()].to_dict()
+
+
+def walk_forward(data, train_years=3, test_years=1, anchored=False, fast_windows=range(5, 55, 5),
+                 slow_windows=range(20, 270, 10), trend_windows=(0, 200), thresholds=(0.0,), commission=0.0015,
+                 initial_cash=1000000, start=200, sort_by='total_return', carry_position=True, max_workers=None):
+    """
+    滚动前推优化，返回 {'folds', 'equity', 'final_value', 'total_return', 'annual_return', 'max_drawdown'}
+
+    data: 含Close列、以日期为索引的DataFrame；训练/测试长度按每年252个交易日换算
+    folds为每段选出的参数和样本外表现，equity为拼接后的样本外资产曲线（Series）
+    """
+    close = np.asarray(data['Close'], dtype=np.float64)
+    splits = walk_forward_splits(len(close), int(train_years * 252), int(test_years * 252), anchored, start)
+    if not splits:
+        raise ValueError("数据长度不足以切出训练段和测试段")
+
+    pairs = [(fast, slow) for fast, slow in itertools.product(fast_windows, slow_windows) if fast < slow]
+    grid = {'pairs': pairs, 'trends': list(trend_windows), 'thresholds': list(thresholds), 'commission': commission}
+    averages = moving_averages(close, list(fast_windows) + list(slow_windows) + list(trend_windows))
+
+    mode = '锚定' if anchored else '滚动'
+    print(f"滚动前推优化({mode}): {len(splits)}段, 每段参数组合数: "
+          f"{len(pairs) * len(grid['trends']) * len(grid['thresholds'])}")
+
+    train_bounds = [(train_start, train_end) for train_start, train_end, _, _ in splits]
+    if max_workers == 1:
+        _init_walk(close, averages, grid, initial_cash, start)
+        best = [optimize_fold(lo, hi, sort_by) for lo, hi in train_bounds]
+    else:
+        workers = min(max_workers or os.cpu_count() or 1, len(splits))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_walk,
+                                 initargs=(close, averages, grid, initial_cash, start)) as executor:
+            best = list(executor.map(optimize_fold, *zip(*train_bounds), itertools.repeat(sort_by)))
+
+    # 样本外：按各段选出的参数依次交易，资金接力
+    capital = initial_cash
+    equity_parts = []
+    folds = []
+    for k, ((train_start, train_end, test_start, test_end), params) in enumerate(zip(splits, best), 1):
+        fast, slow, trend = int(params['fast']), int(params['slow']), int(params['trend'])
+        golden, sell = cross_masks(averages, fast, slow, start, test_start, test_end)
+        buy = golden & trend_filter(close, averages, trend, params['threshold'], test_start, test_end)
+        if carry_position and not sell[0]:
+            buy[0] |= _holding_before(close, averages, fast, slow, trend, params['threshold'], start, test_start)
+        result = run_portfolio(close[test_start:test_end], buy, sell, initial_cash=capital, commission=commission,
+                               sizing='gross')
+        test_return = (result['final_value'] - capital) / capital * 100
+        capital = result['final_value']
+        equity_parts.append(result['equity'])
+
+        folds.append((k, data.index[train_start], data.index[train_end - 1], data.index[test_start],
+                      data.index[test_end - 1], fast, slow, trend, params['threshold'], params[sort_by],
+                      test_return, max_drawdown(result['equity']), len(result['trades'])))
+        print(f"第{k}段: 训练 {data.index[train_start].date()} ~ {data.index[train_end - 1].date()}, "
+              f"参数 MA{fast}/MA{slow}" + (f"/MA{trend}" if trend else "") +
+              f", 样本外收益率 {test_return:.2f}%")
+
+    test_start = splits[0][2]
+    equity = pd.Series(np.concatenate(equity_parts), index=data.index[test_start:splits[-1][3]])
+    final_value = equity.iloc[-1]
+
+    return {
+        'folds': pd.DataFrame(folds, columns=FOLD_COLUMNS),
+        'equity': equity,
+        'final_value': final_value,
+        'total_return': (final_value - initial_cash) / initial_cash * 100,
+        'annual_return': cagr(final_value / initial_cash, len(equity) / 252),
+        'max_drawdown': max_drawdown(equity.values),
+    }
+
+
+def _holding_before(close, averages, fast, slow, trend, threshold, start, day):
+    """
+    该组参数从头交易到day的前一天收盘时是否持仓
+    """
+    if day <= start:
+        return False
+    golden, sell = cross_masks(averages, fast, slow, start, 0, day)
+    buy = golden & trend_filter(close, averages, trend, threshold, 0, day)
+    return bool(resolve_holding(buy, sell, start)[-1])
+
+
+if __name__ == "__main__":
+    import sys
+    from datetime import datetime, timedelta
+
+    from data_provider import fetch_bars
+
+    # 用法: python walk_forward.py 2330.TW [--anchored]
+    args = sys.argv[1:]
+    anchored = '--anchored' in args
+    args = [a for a in args if a != '--anchored']
+    stock_code = args[0] if args else '2330.TW'
+
+    end_date = datetime.now()
+    stock_data = fetch_bars(stock_code, end_date - timedelta(days=365 * 10), end_date)
+    report = walk_forward(stock_data, anchored=anchored)
+
+    pd.set_option('display.width', 200)
+    print(report['folds'].to_string(index=False))
+    print(f"\n样本外总收益率: {report['total_return']:.2f}%, 年化: {report['annual_return']:.2f}%, "
+          f"最大回撤: {report['max_drawdown']:.2f}%")